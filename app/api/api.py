@@ -1,15 +1,24 @@
-from fastapi import FastAPI, UploadFile, File, Query, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Query, HTTPException, Request, Depends
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
 from app.core.doc_parser import DocParser
 from app.db.db_handler import PostgresHandler
-from app.core.chunker import DocChunker
-from app.core.gemini_client import GeminiClient
-from app.core.search import SearchEngine
+from app.core.ingest import ingest_document
+from app.core.gemini_client import GeminiClient, CHAT_ERROR_MESSAGE
+from app.core.admission import AdmissionRejected
+from app.core.embedding_service import EMBED_SERVICE, load_encoder, require_authkey
+from app.core.search import SEARCH_BACKEND, SEARCH_BACKENDS, SearchEngine, create_search_engine
+from app.utils.cache import SemanticCache
 from app.utils.logger import logger
+from app.utils.metrics import timed, collect_timings, render_metrics, HTTP_LATENCY, RETRIEVED_CHUNKS
 import os
-from typing import Optional
+import json
+import time
+import threading
+from datetime import date
+from typing import List, Optional
 import shutil
 from pydantic import BaseModel
 
@@ -17,21 +26,133 @@ from pydantic import BaseModel
 DOCX_DIR = os.path.join(os.getcwd(), "docx")
 os.makedirs(DOCX_DIR, exist_ok=True)
 
+CHUNKS_PAGE_SIZE = int(os.getenv("CHUNKS_PAGE_SIZE", "100"))
+CHUNKS_MAX_PAGE_SIZE = 1000
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "64"))
+
+# background: mở cổng ngay, nạp model/corpus ở thread nền (theo dõi qua /readyz)
+# blocking: nạp xong mới mở cổng như trước
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background").lower()
+# Lỗi tạm thời (DB chưa lên, ...): thử lại sau STARTUP_RETRY_SECONDS, gấp đôi mỗi lần, tối đa STARTUP_RETRY_MAX_SECONDS
+STARTUP_RETRY_SECONDS = float(os.getenv("STARTUP_RETRY_SECONDS", "5"))
+STARTUP_RETRY_MAX_SECONDS = float(os.getenv("STARTUP_RETRY_MAX_SECONDS", "300"))
+NOT_READY_RETRY_AFTER = "5"
+
+# Cache câu trả lời /chat theo độ tương đồng câu hỏi (0 = tắt)
+chat_cache = SemanticCache(
+    "chat",
+    maxsize=int(os.getenv("CHAT_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("CHAT_CACHE_TTL", "3600")),
+    threshold=float(os.getenv("CHAT_CACHE_THRESHOLD", "0.92")),
+    min_overlap=float(os.getenv("CHAT_CACHE_MIN_OVERLAP", "0.6")),
+)
+
 db = PostgresHandler()
 engine: Optional[SearchEngine] = None 
-gemini = GeminiClient()
+gemini: Optional[GeminiClient] = None
+
+
+class StartupConfigError(RuntimeError):
+    """Lỗi cấu hình (thiếu API key, giá trị env sai): thử lại không giúp gì, dừng khởi động."""
+
+
+def _load_services(app: FastAPI):
+    """
+    Khởi tạo LLM client, tạo bảng, nạp embedding model + corpus và warm-up encode.
+    Bước nào đã xong thì giữ lại: lần thử lại chỉ chạy các bước còn thiếu.
+    """
+    global gemini
+    timings = app.state.startup["timings"]
+    start = time.perf_counter()
+
+    # Phần chỉ phụ thuộc cấu hình chạy trước: rẻ, và lỗi cấu hình dừng ngay trước khi nạp model/corpus
+    if SEARCH_BACKEND not in SEARCH_BACKENDS:
+        raise StartupConfigError(f"SEARCH_BACKEND '{SEARCH_BACKEND}' không hợp lệ ({' | '.join(SEARCH_BACKENDS)})")
+    try:
+        if EMBED_SERVICE == "remote":
+            require_authkey()
+        if gemini is None:
+            gemini = GeminiClient()
+    except ValueError as e:
+        raise StartupConfigError(str(e)) from e
+
+    if not app.state.db_ready:
+        # Kết nối riêng cho thread nền, không dùng chung cursor với các request
+        step = time.perf_counter()
+        setup_db = PostgresHandler()
+        try:
+            setup_db.create_database()
+            setup_db.create_articles_table()
+            setup_db.create_chunks_table()
+        finally:
+            setup_db.close()
+        app.state.db_ready = True
+        timings["db_init_s"] = round(time.perf_counter() - step, 3)
+
+    if app.state.embed_model is None:
+        step = time.perf_counter()
+        app.state.embed_model = load_encoder()
+        timings["model_load_s"] = round(time.perf_counter() - step, 3)
+
+    step = time.perf_counter()
+    search_engine = create_search_engine(embed_model=app.state.embed_model)
+    timings["corpus_load_s"] = round(time.perf_counter() - step, 3)
+
+    step = time.perf_counter()
+    search_engine.encode_query("khởi động")
+    timings["warmup_s"] = round(time.perf_counter() - step, 3)
+
+    app.state.engine = search_engine
+    timings["total_s"] = round(time.perf_counter() - start, 3)
+    logger.info("✅ Đã khởi tạo cơ sở dữ liệu và search engine | {}", timings)
+
+
+def _background_startup(app: FastAPI):
+    delay = STARTUP_RETRY_SECONDS
+    while True:
+        try:
+            _load_services(app)
+            app.state.startup["status"] = "ready"
+            app.state.startup["error"] = None
+            return
+        except StartupConfigError as e:
+            logger.error(f"❌ Lỗi cấu hình, dừng khởi động (sửa cấu hình rồi khởi động lại): {e}")
+            app.state.startup["status"] = "error"
+            app.state.startup["error"] = str(e)
+            return
+        except Exception as e:
+            logger.exception(f"❌ Lỗi khởi tạo hệ thống, thử lại sau {delay:.0f}s: {e}")
+            app.state.startup["status"] = "error"
+            app.state.startup["error"] = str(e)
+            time.sleep(delay)
+            delay = min(delay * 2, STARTUP_RETRY_MAX_SECONDS)
+
+
+def _require_engine(request: Request) -> SearchEngine:
+    search_engine = getattr(request.app.state, "engine", None)
+    if search_engine is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Hệ thống đang khởi động, vui lòng thử lại sau",
+            headers={"Retry-After": NOT_READY_RETRY_AFTER},
+        )
+    return search_engine
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Khởi tạo và dọn dẹp tài nguyên (cách mới thay cho @app.on_event)."""
     logger.info("🚀 Khởi động dịch vụ API...")
+    app.state.engine = None
+    app.state.embed_model = None
+    app.state.db_ready = False
+    app.state.startup = {"status": "starting", "error": None, "timings": {}}
     try:
-        db.create_database()
-        db.create_articles_table()
-        db.create_chunks_table()
-        app.state.engine = SearchEngine()
-        logger.info("✅ Đã khởi tạo cơ sở dữ liệu và search engine.")
+        if STARTUP_MODE == "blocking":
+            _load_services(app)
+            app.state.startup["status"] = "ready"
+        else:
+            threading.Thread(target=_background_startup, args=(app,), name="startup", daemon=True).start()
         yield
     except Exception as e:
         logger.exception(f"❌ Lỗi khởi tạo hệ thống: {e}")
@@ -54,8 +175,64 @@ app.add_middleware(
     allow_headers=["*"],  # cho phép headers từ frontend
 )
 
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        HTTP_LATENCY.observe(time.perf_counter() - start, method=request.method, path=path, status=status)
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: tiến trình còn sống và nhận request."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz(request: Request):
+    """Readiness: model, corpus và LLM client đã sẵn sàng."""
+    startup = request.app.state.startup
+    status_code = 200 if startup["status"] == "ready" else 503
+    return JSONResponse(startup, status_code=status_code)
+
+
+@app.get("/search/cache")
+async def search_cache_stats(request: Request):
+    engine = _require_engine(request)
+    return {"corpus_version": engine.corpus_version, **engine.result_cache.stats()}
+
+
+@app.get("/chat/cache")
+async def chat_cache_stats(request: Request):
+    engine = _require_engine(request)
+    return {"corpus_version": engine.corpus_version, **chat_cache.stats()}
+
+
+@app.get("/chat/admission")
+async def chat_admission_stats(request: Request):
+    _require_engine(request)
+    return gemini.admission.stats()
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+# Các endpoint encode/tìm kiếm là `def` (FastAPI chạy trong threadpool): không chặn event loop và các
+# lời gọi encode đồng thời mới gom được batch trong BatchingEncoder
+
 @app.post("/upload/")
-async def upload_docx(request: Request, file: UploadFile = File(...)):
+def upload_docx(request: Request, file: UploadFile = File(...)):
+    engine = _require_engine(request)
     filename = file.filename
     saved_path = os.path.join(DOCX_DIR, filename)
     logger.info(f"📄 Nhận file upload: {filename}")
@@ -68,15 +245,17 @@ async def upload_docx(request: Request, file: UploadFile = File(...)):
 
         # Phân tích và lưu nội dung
         parser = DocParser(saved_path)
-        data = parser.to_dict()
-        logger.debug(f"📘 Đã phân tích tài liệu: {data.get('title', 'Không tiêu đề')}")
-
-        article_id = db.insert_article(data)
-        chunker = DocChunker(parser, doc_id=article_id)
-        chunks = chunker.get_chunks()
-        db.insert_chunks(article_id, chunks)
+        logger.debug(f"📘 Đã phân tích tài liệu: {parser.title or 'Không tiêu đề'}")
+
+        # Kết nối riêng: handler chạy trong threadpool, cursor của `db` dùng chung với các endpoint async
+        upload_db = PostgresHandler()
+        try:
+            article_id, chunks = ingest_document(upload_db, parser, engine.embed_model)
+        finally:
+            upload_db.close()
         logger.info(f"Đã lưu doc_id={article_id} với {len(chunks)} chunks.")
-        request.app.state.engine.refresh()
+        # Nạp lại corpus ngay trong threadpool, không chặn event loop
+        engine.refresh()
         return JSONResponse({
             "message": "File đã được upload và xử lý thành công.",
             "filename": filename,
@@ -88,7 +267,7 @@ async def upload_docx(request: Request, file: UploadFile = File(...)):
         logger.exception(f"❌ Lỗi xử lý file '{filename}': {e}")
         raise HTTPException(status_code=500, detail=f"Lỗi xử lý file: {str(e)}")
 @app.delete("/docs/{doc_id}")
-async def delete_doc(doc_id: int):
+async def delete_doc(request: Request, doc_id: int):
     logger.info(f"🗑 Yêu cầu xóa doc_id={doc_id}")
 
     try:
@@ -98,6 +277,9 @@ async def delete_doc(doc_id: int):
         if not deleted:
             raise HTTPException(status_code=404, detail="Không tìm thấy tài liệu cần xóa")
         logger.info(f"🗑 Đã xóa tài liệu doc_id={doc_id}")
+        search_engine = getattr(request.app.state, "engine", None)
+        if search_engine is not None:
+            await run_in_threadpool(search_engine.refresh)
         return {"message": "Đã xóa tài liệu thành công", "doc_id": doc_id}
 
     except HTTPException:
@@ -115,37 +297,98 @@ async def list_articles():
         logger.exception(f"❌ Lỗi khi lấy danh sách articles: {e}")
         raise HTTPException(status_code=500, detail="Không thể lấy danh sách tài liệu")
 
+def _parse_chunk_cursor(cursor: Optional[str]):
+    """Con trỏ phân trang có dạng 'doc_id:chunk_id' (khóa của chunk cuối cùng đã nhận)."""
+    if not cursor:
+        return None
+    try:
+        doc_id, chunk_id = cursor.split(":", 1)
+        return int(doc_id), int(chunk_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="cursor phải có dạng 'doc_id:chunk_id'")
+
+
+def _json_array(rows):
+    """Ghi một JSON list theo từng phần tử, không giữ toàn bộ danh sách trong bộ nhớ."""
+    yield "["
+    for i, row in enumerate(rows):
+        yield ("," if i else "") + json.dumps(row, ensure_ascii=False)
+    yield "]"
+
+
 @app.get("/chunks/")
 async def get_all_chunks(
     doc_id: Optional[int] = Query(None, description="ID tài liệu cần lấy chunks"),
-    limit: Optional[int] = Query(None, description="Giới hạn số lượng chunks trả về")
+    limit: Optional[int] = Query(None, ge=1, description="Giới hạn số lượng chunks trả về"),
+    cursor: Optional[str] = Query(None, description="Lấy các chunks sau con trỏ 'doc_id:chunk_id'"),
+    include_vector: bool = Query(False, description="Trả kèm vector embedding"),
+    stream: bool = Query(False, description="Trả về dạng NDJSON streaming"),
 ):
-    logger.info(f"📚 Truy vấn chunks | doc_id={doc_id} | limit={limit}")
+    """
+    Trả về JSON list các chunks, sắp theo (doc_id, chunk_id).
+
+    - Không có `limit`/`cursor`: toàn bộ chunks (như trước), ghi theo luồng.
+    - Có `cursor`, hoặc `limit` <= CHUNKS_MAX_PAGE_SIZE: một trang; nếu trang đầy, header `X-Next-Cursor`
+      chứa con trỏ 'doc_id:chunk_id' để lấy trang kế tiếp (`?cursor=...`). Không có header = trang cuối.
+    - `stream=true`: NDJSON, mỗi dòng một chunk.
+    """
+    logger.info(f"📚 Truy vấn chunks | doc_id={doc_id} | limit={limit} | cursor={cursor} | stream={stream}")
+    after = _parse_chunk_cursor(cursor)
 
     try:
-        chunks = []
-        if doc_id:
-            chunks = db.fetch_chunks_by_doc_id(doc_id)
-        else:
-            for article in db.fetch_all_articles():
-                chunks.extend(db.fetch_chunks_by_doc_id(article["id"]))
+        if stream:
+            rows = db.iter_chunks(doc_id=doc_id, after=after, limit=limit, include_vector=include_vector)
+            lines = (json.dumps(chunk, ensure_ascii=False) + "\n" for chunk in rows)
+            return StreamingResponse(lines, media_type="application/x-ndjson")
 
-        if limit:
-            chunks = chunks[:limit]
+        if after is None and (limit is None or limit > CHUNKS_MAX_PAGE_SIZE):
+            rows = db.iter_chunks(doc_id=doc_id, limit=limit, include_vector=include_vector)
+            return StreamingResponse(_json_array(rows), media_type="application/json")
 
-        return JSONResponse(chunks)
+        page_size = min(limit or CHUNKS_PAGE_SIZE, CHUNKS_MAX_PAGE_SIZE)
+        chunks = db.fetch_chunks_page(doc_id=doc_id, after=after, limit=page_size, include_vector=include_vector)
+
+        headers = {}
+        if len(chunks) == page_size:
+            last = chunks[-1]
+            headers["X-Next-Cursor"] = f"{last['doc_id']}:{last['chunk_id']}"
+        return JSONResponse(chunks, headers=headers)
 
     except Exception as e:
         logger.exception(f"❌ Lỗi khi lấy chunks: {e}")
         raise HTTPException(status_code=500, detail="Không thể truy xuất dữ liệu")
 
 
+class SearchFilter(BaseModel):
+    doc_ids: Optional[List[int]] = None  # chỉ tìm trong các tài liệu này
+    title: Optional[str] = None  # tiêu đề tài liệu chứa chuỗi (không phân biệt hoa thường)
+    date_from: Optional[date] = None  # ngày ban hành trong khoảng [date_from, date_to]
+    date_to: Optional[date] = None
+
+    def resolve(self, engine: SearchEngine):
+        return engine.resolve_doc_ids(self.doc_ids, self.title, self.date_from, self.date_to)
+
+
+def search_filter(
+    doc_ids: Optional[List[int]] = Query(None, description="Chỉ tìm trong các doc_id này"),
+    title: Optional[str] = Query(None, description="Tiêu đề tài liệu chứa chuỗi"),
+    date_from: Optional[date] = Query(None, description="Ngày tài liệu từ (YYYY-MM-DD)"),
+    date_to: Optional[date] = Query(None, description="Ngày tài liệu đến (YYYY-MM-DD)"),
+) -> SearchFilter:
+    return SearchFilter(doc_ids=doc_ids, title=title, date_from=date_from, date_to=date_to)
+
+
 @app.get("/search/vector/")
-async def vector_search(request: Request, query: str = Query(...), top_k: int = Query(5, ge=1, le=50)):
-    logger.info(f"🔍 Vector search: '{query}' | top_k={top_k}")
+def vector_search(
+    request: Request,
+    query: str = Query(...),
+    top_k: int = Query(5, ge=1, le=50),
+    filters: SearchFilter = Depends(search_filter),
+):
+    logger.info(f"🔍 Vector search: '{query}' | top_k={top_k} | filters={filters}")
+    engine = _require_engine(request)
     try:
-        engine: SearchEngine = request.app.state.engine
-        results = engine.vector_search(query, top_k=top_k)
+        results = engine.vector_search(query, top_k=top_k, doc_ids=filters.resolve(engine))
         return JSONResponse(results)
     except Exception as e:
         logger.exception(f"❌ Lỗi vector search: {e}")
@@ -153,11 +396,16 @@ async def vector_search(request: Request, query: str = Query(...), top_k: int =
 
 
 @app.get("/search/keyword/")
-async def keyword_search(request: Request, query: str = Query(...), top_k: int = Query(5, ge=1, le=50)):
-    logger.info(f"🔍 Keyword search: '{query}' | top_k={top_k}")
+def keyword_search(
+    request: Request,
+    query: str = Query(...),
+    top_k: int = Query(5, ge=1, le=50),
+    filters: SearchFilter = Depends(search_filter),
+):
+    logger.info(f"🔍 Keyword search: '{query}' | top_k={top_k} | filters={filters}")
+    engine = _require_engine(request)
     try:
-        engine: SearchEngine = request.app.state.engine
-        results = engine.keyword_search(query, top_k=top_k)
+        results = engine.keyword_search(query, top_k=top_k, doc_ids=filters.resolve(engine))
         return JSONResponse(results)
     except Exception as e:
         logger.exception(f"❌ Lỗi keyword search: {e}")
@@ -165,83 +413,265 @@ async def keyword_search(request: Request, query: str = Query(...), top_k: int =
 
 
 @app.get("/search/hybrid/")
-async def hybrid_search(
+def hybrid_search(
     request: Request,
     query: str = Query(...),
     top_k: int = Query(5, ge=1, le=50),
-    alpha: float = Query(0.5, ge=0.0, le=1.0)
+    alpha: float = Query(0.5, ge=0.0, le=1.0),
+    filters: SearchFilter = Depends(search_filter),
 ):
-    logger.info(f"🔍 Hybrid search: '{query}' | top_k={top_k} | alpha={alpha}")
+    logger.info(f"🔍 Hybrid search: '{query}' | top_k={top_k} | alpha={alpha} | filters={filters}")
+    engine = _require_engine(request)
     try:
-        engine: SearchEngine = request.app.state.engine
-        results = engine.hybrid_search(query, top_k=top_k, alpha=alpha)
+        results = engine.hybrid_search(query, top_k=top_k, alpha=alpha, doc_ids=filters.resolve(engine))
         return JSONResponse(results)
     except Exception as e:
         logger.exception(f"❌ Lỗi hybrid search: {e}")
         raise HTTPException(status_code=500, detail="Lỗi khi tìm kiếm hybrid")
 
 
-class ChatRequest(BaseModel):
+class BatchQuery(SearchFilter):
     query: str
     mode: str = "hybrid"
     top_k: int = 5
     alpha: float = 0.6
-    model_llm: Optional[str] = None  # thêm biến model LLM
-    prompt: Optional[str] = None
-
-@app.post("/chat")
-async def chat_with_gemini(request: Request, body: ChatRequest):
-    query = body.query
-    mode = body.mode
-    top_k = body.top_k
-    alpha = body.alpha
-    model_llm = body.model_llm
-    custom_prompt = body.prompt
 
-    logger.info(f"💬 Chat: '{query}' | mode={mode} | top_k={top_k} | alpha={alpha} | model={model_llm}")
 
-    try:
-        engine: SearchEngine = request.app.state.engine
-
-        # Chọn loại tìm kiếm
-        if mode == "vector":
-            search_results = engine.vector_search(query, top_k)
-        elif mode == "keyword":
-            search_results = engine.keyword_search(query, top_k)
-        elif mode == "hybrid":
-            search_results = engine.hybrid_search(query, top_k, alpha)
-        else:
-            raise HTTPException(status_code=400, detail="mode phải là: vector, keyword hoặc hybrid")
+class BatchSearchRequest(BaseModel):
+    queries: List[BatchQuery]
 
-        # Tạo prompt: nếu có prompt từ request thì dùng, ngược lại build từ gemini
-        
-        prompt = gemini.build_prompt(query, search_results,custom_instructions=custom_prompt)
 
-        # Chat với LLM: nếu có model_llm thì dùng model đó
-        if model_llm:
-            response = gemini.chat(prompt, model_llm=model_llm)
-        else:
-            response = gemini.chat(prompt)
+@app.post("/search/batch")
+def batch_search(request: Request, body: BatchSearchRequest):
+    logger.info(f"🔍 Batch search: {len(body.queries)} truy vấn")
+    if not body.queries or len(body.queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Số truy vấn phải từ 1 đến {BATCH_MAX_QUERIES}")
+    for q in body.queries:
+        if q.mode not in ("vector", "keyword", "hybrid"):
+            raise HTTPException(status_code=400, detail="mode phải là: vector, keyword hoặc hybrid")
+        if not 1 <= q.top_k <= 50 or not 0.0 <= q.alpha <= 1.0:
+            raise HTTPException(status_code=400, detail="top_k phải trong [1, 50] và alpha trong [0, 1]")
 
+    engine = _require_engine(request)
+    try:
+        queries = [
+            {"query": q.query, "mode": q.mode, "top_k": q.top_k, "alpha": q.alpha, "doc_ids": q.resolve(engine)}
+            for q in body.queries
+        ]
+        results = engine.batch_search(queries)
         return JSONResponse({
-            "query": query,
-            "mode": mode,
-            "top_k": top_k,
-            "alpha": alpha if mode == "hybrid" else None,
-            "model_llm": model_llm,
-            "prompt": prompt,
-            "answer": response,
-            "sources": [
+            "results": [
                 {
-                    "doc_id": r["doc_id"],
-                    "chunk_id": r["chunk_id"],
-                    "title": r["title"],
-                    "content": r["content"],
-                    "score": round(r["score"], 4),
-                    "type": r["type"]
-                } for r in search_results
+                    "query": q["query"],
+                    "mode": q["mode"],
+                    "top_k": q["top_k"],
+                    "alpha": q["alpha"] if q["mode"] == "hybrid" else None,
+                    "results": hits,
+                } for q, hits in zip(queries, results)
             ]
         })
+    except Exception as e:
+        logger.exception(f"❌ Lỗi batch search: {e}")
+        raise HTTPException(status_code=500, detail="Lỗi khi tìm kiếm batch")
+
+
+class ChatRequest(SearchFilter):
+    query: str
+    mode: str = "hybrid"
+    top_k: int = 5
+    alpha: float = 0.6
+    model_llm: Optional[str] = None  # thêm biến model LLM
+    prompt: Optional[str] = None
+    debug: bool = False  # trả kèm thời gian từng giai đoạn (ms)
+    use_cache: bool = True  # cho phép trả câu trả lời đã cache của câu hỏi tương tự
+
+
+def _admission_error(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=e.status_code,
+        detail=f"{e}, vui lòng thử lại sau {e.retry_after} giây",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+@app.post("/chat")
+async def chat_with_gemini(request: Request, body: ChatRequest):
+    logger.info(f"💬 Chat: '{body.query}' | mode={body.mode} | top_k={body.top_k} | alpha={body.alpha} | model={body.model_llm}")
+
+    engine = _require_engine(request)
+    try:
+        # Chạy ở threadpool: lời gọi LLM (và thời gian chờ admission) không chặn event loop
+        response_body = await run_in_threadpool(_chat_with_timings, engine, body)
+        return JSONResponse(response_body)
+    except AdmissionRejected as e:
+        raise _admission_error(e)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception(f"❌ Lỗi khi chat: {e}")
-        raise HTTPException(status_code=500, detail="Lỗi xử lý câu hỏi")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Lỗi xử lý câu hỏi")
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: Request, body: ChatRequest):
+    """Như /chat nhưng trả câu trả lời dần dần dạng NDJSON (meta, token..., done)."""
+    logger.info(f"💬 Chat (stream): '{body.query}' | mode={body.mode} | top_k={body.top_k} | model={body.model_llm}")
+
+    engine = _require_engine(request)
+    try:
+        events = await run_in_threadpool(_chat_stream, engine, body)
+        return StreamingResponse(events, media_type="application/x-ndjson")
+    except AdmissionRejected as e:
+        raise _admission_error(e)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception(f"❌ Lỗi khi chat (stream): {e}")
+        raise HTTPException(status_code=500, detail="Lỗi xử lý câu hỏi")
+
+
+def _chat_with_timings(engine: SearchEngine, body: ChatRequest) -> dict:
+    with collect_timings() as timings:
+        response_body = _chat(engine, body)
+    if body.debug:
+        response_body["timings"] = timings
+    return response_body
+
+
+def _retrieve(engine: SearchEngine, body: ChatRequest) -> dict:
+    """Tìm kiếm ngữ cảnh cho câu hỏi và tra cache câu trả lời; dùng chung cho /chat và /chat/stream."""
+    mode = body.mode
+    doc_ids = body.resolve(engine)
+    context = (mode, body.top_k, body.alpha if mode == "hybrid" else None, body.model_llm, body.prompt, doc_ids)
+    query_vec = engine.encode_query(body.query) if body.use_cache and chat_cache.maxsize > 0 else None
+
+    # Chọn loại tìm kiếm
+    if mode == "vector":
+        search_results = engine.vector_search(body.query, body.top_k, doc_ids=doc_ids)
+    elif mode == "keyword":
+        search_results = engine.keyword_search(body.query, body.top_k, doc_ids=doc_ids)
+    elif mode == "hybrid":
+        search_results = engine.hybrid_search(body.query, body.top_k, body.alpha, doc_ids=doc_ids)
+    else:
+        raise HTTPException(status_code=400, detail="mode phải là: vector, keyword hoặc hybrid")
+    RETRIEVED_CHUNKS.observe(len(search_results))
+
+    chunk_ids = [(r["doc_id"], r["chunk_id"]) for r in search_results]
+    cached = None
+    if query_vec is not None:
+        with timed("chat_cache"):
+            cached = chat_cache.lookup(query_vec[0], context, engine.corpus_version, chunk_ids)
+        if cached is not None:
+            logger.info("♻️ Dùng câu trả lời đã cache của '{}' (cosine={})", cached["query"], cached["similarity"])
+    return {
+        "results": search_results,
+        "context": context,
+        "query_vec": query_vec,
+        "chunk_ids": chunk_ids,
+        "cached": cached,
+    }
+
+
+def _cached_response(body: ChatRequest, cached: dict) -> dict:
+    return {
+        **cached["value"],
+        "query": body.query,
+        "cache": {"hit": True, "similarity": cached["similarity"], "cached_query": cached["query"]},
+    }
+
+
+def _chat_result(body: ChatRequest, prompt: str, answer: str, search_results: list) -> dict:
+    return {
+        "query": body.query,
+        "mode": body.mode,
+        "top_k": body.top_k,
+        "alpha": body.alpha if body.mode == "hybrid" else None,
+        "model_llm": body.model_llm,
+        "prompt": prompt,
+        "answer": answer,
+        "sources": [
+            {
+                "doc_id": r["doc_id"],
+                "chunk_id": r["chunk_id"],
+                "title": r["title"],
+                "content": r["content"],
+                "score": round(r["score"], 4),
+                "type": r["type"]
+            } for r in search_results
+        ]
+    }
+
+
+def _cache_answer(engine: SearchEngine, retrieved: dict, result: dict):
+    if retrieved["query_vec"] is not None and CHAT_ERROR_MESSAGE not in result["answer"]:
+        chat_cache.put(
+            retrieved["query_vec"][0], retrieved["context"], engine.corpus_version,
+            retrieved["chunk_ids"], result, result["query"],
+        )
+
+
+@timed("chat")
+def _chat(engine: SearchEngine, body: ChatRequest) -> dict:
+    retrieved = _retrieve(engine, body)
+    if retrieved["cached"] is not None:
+        return _cached_response(body, retrieved["cached"])
+
+    # Tạo prompt: nếu có prompt từ request thì dùng, ngược lại build từ gemini
+    prompt = gemini.build_prompt(body.query, retrieved["results"], custom_instructions=body.prompt)
+
+    # Chat với LLM: nếu có model_llm thì dùng model đó
+    if body.model_llm:
+        response = gemini.chat(prompt, model_llm=body.model_llm)
+    else:
+        response = gemini.chat(prompt)
+
+    result = _chat_result(body, prompt, response, retrieved["results"])
+    _cache_answer(engine, retrieved, result)
+    return {**result, "cache": {"hit": False}}
+
+
+def _ndjson(event: dict) -> str:
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+
+def _chat_stream(engine: SearchEngine, body: ChatRequest):
+    """
+    Tìm kiếm và xin slot LLM ngay (lỗi/quá tải trả về mã HTTP bình thường), rồi trả iterator NDJSON:
+    một dòng "meta" (kèm sources), các dòng "token" theo thứ tự sinh và dòng "done" cuối cùng.
+    """
+    start = time.perf_counter()
+    retrieved = _retrieve(engine, body)
+    if retrieved["cached"] is not None:
+        response = _cached_response(body, retrieved["cached"])
+        answer = response.pop("answer")
+        return iter([
+            _ndjson({"type": "meta", **response}),
+            _ndjson({"type": "token", "text": answer}),
+            _ndjson({"type": "done", "cache": response["cache"]}),
+        ])
+
+    prompt = gemini.build_prompt(body.query, retrieved["results"], custom_instructions=body.prompt)
+    tokens = gemini.stream(prompt, model_llm=body.model_llm) if body.model_llm else gemini.stream(prompt)
+    meta = _chat_result(body, prompt, "", retrieved["results"])
+    del meta["answer"]
+
+    def events():
+        parts = []
+        first_token_ms = None
+        try:
+            yield _ndjson({"type": "meta", **meta, "cache": {"hit": False}})
+            for text in tokens:
+                if first_token_ms is None:
+                    first_token_ms = round((time.perf_counter() - start) * 1000, 3)
+                parts.append(text)
+                yield _ndjson({"type": "token", "text": text})
+        finally:
+            tokens.close()
+        result = {**meta, "answer": "".join(parts)}
+        _cache_answer(engine, retrieved, result)
+        done = {"type": "done", "cache": {"hit": False}}
+        if body.debug:
+            done["timings"] = {"first_token": first_token_ms, "total": round((time.perf_counter() - start) * 1000, 3)}
+        yield _ndjson(done)
+
+    return events()
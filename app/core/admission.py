@@ -0,0 +1,259 @@
+"""
+Kiểm soát tải trước khi gọi LLM: giới hạn số lời gọi đồng thời và ngân sách token/phút (TPM)
+theo provider và theo model, kèm hàng đợi có giới hạn và hạn chờ.
+
+    LLM_CONCURRENCY=gemini=8,openai=8,gpt-4o=2     khóa là provider hoặc tên model; 0 = không giới hạn
+    LLM_TPM=gemini=1000000,openai=200000
+    LLM_QUEUE_SIZE=16                              số lời gọi được chờ cùng lúc (toàn tiến trình)
+    LLM_QUEUE_TIMEOUT_S=10                         chờ quá hạn thì trả 503
+
+Khi hàng đợi đầy hoặc ngân sách TPM không kịp hồi trong hạn chờ, yêu cầu bị từ chối ngay
+bằng AdmissionRejected (API trả 503/429 kèm Retry-After) thay vì dồn thêm lời gọi lên provider.
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from app.utils.logger import logger, should_log
+from app.utils.metrics import timed, LLM_ACTIVE, LLM_QUEUE_DEPTH, LLM_QUEUE_WAIT, LLM_REJECTED, LLM_TOKENS
+
+LLM_CONCURRENCY = os.getenv("LLM_CONCURRENCY", "gemini=8,openai=8")
+LLM_TPM = os.getenv("LLM_TPM", "")
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "16"))
+LLM_QUEUE_TIMEOUT_S = float(os.getenv("LLM_QUEUE_TIMEOUT_S", "10"))
+# Số token dự trù cho câu trả lời khi xin ngân sách; được trừ lại theo độ dài thật sau khi gọi xong
+LLM_OUTPUT_TOKENS = int(os.getenv("LLM_OUTPUT_TOKENS", "512"))
+
+# Ước lượng thô cho tiếng Việt khi chưa có số token thật từ provider
+CHARS_PER_TOKEN = 3
+TPM_WINDOW_S = 60.0
+
+
+def parse_limits(text: str) -> dict:
+    """'gemini=8,gpt-4o=2' -> {'gemini': 8, 'gpt-4o': 2}"""
+    limits = {}
+    for part in (text or "").split(","):
+        name, _, value = part.partition("=")
+        if name.strip() and value.strip():
+            limits[name.strip()] = int(value)
+    return limits
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+class AdmissionRejected(Exception):
+    """Lời gọi LLM bị từ chối; `status_code` là 429 (hết ngân sách TPM) hoặc 503 (quá tải)."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class _Budget:
+    """Giới hạn của một khóa (provider hoặc model): số lời gọi đang chạy và token đã dùng trong 60s gần nhất."""
+
+    def __init__(self, name: str, concurrency: int = 0, tpm: int = 0):
+        self.name = name
+        self.concurrency = concurrency
+        self.tpm = tpm
+        self.active = 0
+        self.waiters = deque()
+        self.window = deque()  # [thời điểm, số token, còn trong cửa sổ]
+        self.used = 0
+        # Thời gian giữ slot trung bình (EMA), dùng để ước lượng Retry-After
+        self.hold_s = 1.0
+
+    def _expire(self, now: float):
+        while self.window and self.window[0][0] <= now - TPM_WINDOW_S:
+            entry = self.window.popleft()
+            entry[2] = False
+            self.used -= entry[1]
+
+    def tpm_wait(self, tokens: int, now: float) -> float:
+        """Số giây tới khi ngân sách còn đủ `tokens`; 0 nếu dùng được ngay."""
+        if not self.tpm:
+            return 0.0
+        self._expire(now)
+        excess = self.used + tokens - self.tpm
+        if excess <= 0:
+            return 0.0
+        for ts, used, _ in self.window:
+            excess -= used
+            if excess <= 0:
+                return ts + TPM_WINDOW_S - now
+        return TPM_WINDOW_S
+
+    def has_slot(self) -> bool:
+        return not self.concurrency or self.active < self.concurrency
+
+    def queue_wait(self) -> float:
+        """Ước lượng thời gian chờ slot cho người đến sau cùng."""
+        slots = self.concurrency or 1
+        return self.hold_s * (len(self.waiters) + 1) / slots
+
+
+class Ticket:
+    __slots__ = ("provider", "model", "tokens", "budgets", "entries", "started")
+
+    def __init__(self, provider: str, model: str, tokens: int, budgets: list):
+        self.provider = provider
+        self.model = model
+        self.tokens = tokens
+        self.budgets = budgets
+        self.entries = []
+        self.started = 0.0
+
+
+class AdmissionController:
+    """
+    Cấp quyền gọi LLM theo thứ tự đến (FIFO trong từng khóa). Một lời gọi giữ đồng thời ngân sách
+    của provider và của model (nếu được cấu hình riêng).
+    """
+
+    def __init__(self, concurrency: dict = None, tpm: dict = None,
+                 queue_size: int = LLM_QUEUE_SIZE, timeout: float = LLM_QUEUE_TIMEOUT_S):
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._budgets = {}
+        self._waiting = 0
+        concurrency, tpm = concurrency or {}, tpm or {}
+        for name in set(concurrency) | set(tpm):
+            self._budgets[name] = _Budget(name, concurrency.get(name, 0), tpm.get(name, 0))
+
+    @classmethod
+    def from_env(cls):
+        controller = cls(parse_limits(LLM_CONCURRENCY), parse_limits(LLM_TPM))
+        logger.info(
+            "Giới hạn LLM: concurrency={} | tpm={} | hàng đợi={} | hạn chờ={}s",
+            LLM_CONCURRENCY or "-", LLM_TPM or "-", LLM_QUEUE_SIZE, LLM_QUEUE_TIMEOUT_S,
+        )
+        return controller
+
+    @contextmanager
+    def admit(self, provider: str, model: str, tokens: int):
+        """Chờ tới lượt rồi giữ slot trong khối `with`; gán `ticket.tokens` số token thật trước khi thoát."""
+        ticket = self.acquire(provider, model, tokens)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def _admissible(self, ticket: Ticket, now: float):
+        """(được vào ngay, số giây chờ ngân sách TPM)"""
+        tpm_wait = max((b.tpm_wait(ticket.tokens, now) for b in ticket.budgets), default=0.0)
+        ready = all(b.waiters[0] is ticket and b.has_slot() for b in ticket.budgets)
+        return ready and tpm_wait == 0, tpm_wait
+
+    def _reject(self, ticket: Ticket, status_code: int, reason: str, retry_after: float, message: str):
+        LLM_REJECTED.inc(provider=ticket.provider, reason=reason)
+        if should_log("admission.reject"):
+            logger.warning("Từ chối lời gọi LLM {} ({}): {} | Retry-After={}s", ticket.model, reason, message, retry_after)
+        return AdmissionRejected(status_code, reason, retry_after, message)
+
+    @timed("llm_queue")
+    def acquire(self, provider: str, model: str, tokens: int) -> Ticket:
+        with self._cond:
+            budgets = [self._budgets[name] for name in dict.fromkeys((provider, model)) if name in self._budgets]
+            ticket = Ticket(provider, model, tokens, budgets)
+            if not budgets:
+                return self._grant(ticket, 0.0)
+
+            now = time.monotonic()
+            for budget in budgets:
+                if budget.tpm and tokens > budget.tpm:
+                    raise self._reject(ticket, 429, "too_large", TPM_WINDOW_S, f"Prompt {tokens} token vượt TPM của {budget.name}")
+            for budget in budgets:
+                budget.waiters.append(ticket)
+            ready, tpm_wait = self._admissible(ticket, now)
+            if ready:
+                return self._grant(ticket, 0.0)
+
+            if tpm_wait > self.timeout:
+                self._leave(ticket)
+                raise self._reject(ticket, 429, "tpm", tpm_wait, "Hết ngân sách token/phút của LLM")
+            if self._waiting >= self.queue_size:
+                self._leave(ticket)
+                retry_after = max(b.queue_wait() for b in budgets)
+                raise self._reject(ticket, 503, "queue_full", retry_after, "Hàng đợi gọi LLM đã đầy")
+
+            self._waiting += 1
+            LLM_QUEUE_DEPTH.set(self._waiting)
+            deadline = now + self.timeout
+            try:
+                while True:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._leave(ticket)
+                        if tpm_wait > 0:
+                            raise self._reject(ticket, 429, "tpm", tpm_wait, "Hết ngân sách token/phút của LLM")
+                        retry_after = max(b.queue_wait() for b in budgets)
+                        raise self._reject(ticket, 503, "timeout", retry_after, "Quá hạn chờ gọi LLM")
+                    # Ngân sách TPM hồi theo thời gian nên không có ai notify: tự thức dậy khi dự kiến đủ
+                    self._cond.wait(min(remaining, tpm_wait) if tpm_wait > 0 else remaining)
+                    now = time.monotonic()
+                    ready, tpm_wait = self._admissible(ticket, now)
+                    if ready:
+                        return self._grant(ticket, self.timeout - (deadline - now))
+            finally:
+                self._waiting -= 1
+                LLM_QUEUE_DEPTH.set(self._waiting)
+
+    def _leave(self, ticket: Ticket):
+        for budget in ticket.budgets:
+            budget.waiters.remove(ticket)
+        # Người đứng sau có thể đã tới đầu hàng
+        self._cond.notify_all()
+
+    def _grant(self, ticket: Ticket, waited: float) -> Ticket:
+        now = time.monotonic()
+        for budget in ticket.budgets:
+            budget.waiters.remove(ticket)
+            budget.active += 1
+            if budget.tpm:
+                entry = [now, ticket.tokens, True]
+                budget.window.append(entry)
+                budget.used += ticket.tokens
+                ticket.entries.append((budget, entry))
+        ticket.started = now
+        LLM_QUEUE_WAIT.observe(waited, provider=ticket.provider)
+        LLM_ACTIVE.inc(provider=ticket.provider)
+        self._cond.notify_all()
+        return ticket
+
+    def release(self, ticket: Ticket):
+        with self._cond:
+            held = time.monotonic() - ticket.started
+            for budget in ticket.budgets:
+                budget.active -= 1
+                budget.hold_s = 0.8 * budget.hold_s + 0.2 * held
+            # Đổi số token dự trù sang số thật; entry đã hết hạn khỏi cửa sổ thì không cần sửa
+            for budget, entry in ticket.entries:
+                if entry[2]:
+                    budget.used += ticket.tokens - entry[1]
+                    entry[1] = ticket.tokens
+            LLM_TOKENS.inc(ticket.tokens, provider=ticket.provider)
+            LLM_ACTIVE.inc(-1, provider=ticket.provider)
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            now = time.monotonic()
+            budgets = {}
+            for name, budget in self._budgets.items():
+                budget._expire(now)
+                budgets[name] = {
+                    "active": budget.active,
+                    "concurrency": budget.concurrency,
+                    "waiting": len(budget.waiters),
+                    "tokens_last_minute": budget.used,
+                    "tpm": budget.tpm,
+                }
+            return {"waiting": self._waiting, "queue_size": self.queue_size, "timeout_s": self.timeout, "budgets": budgets}
@@ -0,0 +1,226 @@
+"""
+Kho chunks gọn cho SearchEngine: id nằm trong mảng numpy, title/markdown nằm trong một buffer UTF-8
+kèm bảng offset. Chuỗi Python chỉ được tạo khi đọc tới (kết quả trả về, kiểm tra cụm từ), thay vì giữ
+cả corpus dưới dạng list dict của psycopg2.
+
+Kho có thể lưu ra thư mục gồm các file .npy và mở lại bằng mmap để nhiều tiến trình dùng chung page cache.
+"""
+import os
+import shutil
+from array import array
+
+import numpy as np
+
+TEXT_COLUMNS = ("title", "markdown")
+
+
+def encode(text) -> bytes:
+    return (text or "").encode("utf-8")
+
+
+class TextColumn:
+    """Dãy chuỗi lưu liền trong một buffer UTF-8; chuỗi i là `data[offsets[i]:offsets[i + 1]]`."""
+
+    __slots__ = ("data", "offsets")
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        return cls.from_encoded(encode(text) for text in strings)
+
+    @classmethod
+    def from_encoded(cls, parts):
+        """Ghép các chuỗi đã mã hóa UTF-8 thành một buffer."""
+        parts = list(parts)
+        offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+        np.cumsum([len(part) for part in parts], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(parts), dtype=np.uint8), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.data[start:end].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + self.offsets.nbytes
+
+
+class ChunkView:
+    """Một chunk trong ChunkStore; đọc như dict (`chunk["title"]`, `chunk.get("markdown")`) nhưng không copy dữ liệu."""
+
+    __slots__ = ("store", "pos")
+
+    def __init__(self, store, pos: int):
+        self.store = store
+        self.pos = pos
+
+    @property
+    def doc_id(self) -> int:
+        return int(self.store.doc_ids[self.pos])
+
+    @property
+    def chunk_id(self) -> int:
+        return int(self.store.chunk_ids[self.pos])
+
+    @property
+    def title(self) -> str:
+        return self.store.titles[self.pos]
+
+    @property
+    def markdown(self) -> str:
+        return self.store.markdowns[self.pos]
+
+    def __getitem__(self, key: str):
+        if key not in ("doc_id", "chunk_id") + TEXT_COLUMNS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+class ChunkStore:
+    """Các chunks theo thứ tự nạp; vị trí trong kho là vị trí dùng trong doc_ranges, chỉ mục và `vector_rows`."""
+
+    def __init__(self, doc_ids=None, chunk_ids=None, titles=None, markdowns=None):
+        self.doc_ids = doc_ids if doc_ids is not None else np.zeros(0, dtype=np.int64)
+        self.chunk_ids = chunk_ids if chunk_ids is not None else np.zeros(0, dtype=np.int64)
+        self.titles = titles if titles is not None else TextColumn.from_strings([])
+        self.markdowns = markdowns if markdowns is not None else TextColumn.from_strings([])
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def __getitem__(self, pos: int) -> ChunkView:
+        if not -len(self) <= pos < len(self):
+            raise IndexError(pos)
+        return ChunkView(self, int(pos) % len(self))
+
+    def __iter__(self):
+        for pos in range(len(self)):
+            yield ChunkView(self, pos)
+
+    @property
+    def nbytes(self) -> int:
+        return self.doc_ids.nbytes + self.chunk_ids.nbytes + self.titles.nbytes + self.markdowns.nbytes
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "doc_ids.npy"), self.doc_ids)
+        np.save(os.path.join(directory, "chunk_ids.npy"), self.chunk_ids)
+        for name, column in (("title", self.titles), ("markdown", self.markdowns)):
+            np.save(os.path.join(directory, f"{name}.npy"), column.data)
+            np.save(os.path.join(directory, f"{name}_offsets.npy"), column.offsets)
+
+    @classmethod
+    def open(cls, directory: str, mmap: bool = True):
+        """Mở kho đã `save`; với mmap, dữ liệu chỉ được đọc từ đĩa khi truy cập và dùng chung giữa các tiến trình."""
+        mode = "r" if mmap else None
+
+        def load(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode)
+
+        return cls(
+            load("doc_ids"),
+            load("chunk_ids"),
+            TextColumn(load("title"), load("title_offsets")),
+            TextColumn(load("markdown"), load("markdown_offsets")),
+        )
+
+
+class ChunkStoreBuilder:
+    """Gom chunks theo từng tài liệu khi nạp từ DB; text được mã hóa ngay nên dict gốc bỏ được sau `extend`."""
+
+    def __init__(self):
+        self.doc_ids = array("q")
+        self.chunk_ids = array("q")
+        self.titles = []
+        self.markdowns = []
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def extend(self, chunks):
+        for chunk in chunks:
+            self.doc_ids.append(chunk["doc_id"])
+            self.chunk_ids.append(chunk["chunk_id"])
+            self.titles.append(encode(chunk.get("title")))
+            self.markdowns.append(encode(chunk.get("markdown")))
+
+    def build(self) -> ChunkStore:
+        return ChunkStore(
+            np.frombuffer(self.doc_ids, dtype=np.int64),
+            np.frombuffer(self.chunk_ids, dtype=np.int64),
+            TextColumn.from_encoded(self.titles),
+            TextColumn.from_encoded(self.markdowns),
+        )
+
+
+class NpyStreamWriter:
+    """Ghi một mảng .npy theo từng khối khi chưa biết trước số dòng: dữ liệu ghi vào file tạm, header ghi khi `close`."""
+
+    def __init__(self, path: str, dtype, row_shape: tuple = ()):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.row_shape = tuple(row_shape)
+        self.rows = 0
+        self._part = open(path + ".part", "wb")
+
+    def write(self, block):
+        block = np.ascontiguousarray(block, dtype=self.dtype).reshape((-1,) + self.row_shape)
+        self._part.write(block.tobytes())
+        self.rows += len(block)
+
+    def close(self):
+        self._part.close()
+        header = {"descr": np.lib.format.dtype_to_descr(self.dtype), "fortran_order": False,
+                  "shape": (self.rows,) + self.row_shape}
+        with open(self.path, "wb") as out, open(self._part.name, "rb") as data:
+            np.lib.format.write_array_header_1_0(out, header)
+            shutil.copyfileobj(data, out, 1 << 20)
+        os.remove(self._part.name)
+
+
+class ChunkStoreWriter:
+    """Như ChunkStoreBuilder nhưng ghi thẳng ra thư mục theo định dạng của `ChunkStore.save`, bộ nhớ không tăng theo corpus."""
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.ids = {name: NpyStreamWriter(os.path.join(directory, f"{name}.npy"), np.int64)
+                    for name in ("doc_ids", "chunk_ids")}
+        self.texts = {name: NpyStreamWriter(os.path.join(directory, f"{name}.npy"), np.uint8) for name in TEXT_COLUMNS}
+        self.ends = {name: 0 for name in TEXT_COLUMNS}
+        self.offsets = {name: NpyStreamWriter(os.path.join(directory, f"{name}_offsets.npy"), np.int64)
+                        for name in TEXT_COLUMNS}
+        for writer in self.offsets.values():
+            writer.write([0])
+
+    def __len__(self):
+        return self.ids["doc_ids"].rows
+
+    def add(self, chunk):
+        self.ids["doc_ids"].write([chunk["doc_id"]])
+        self.ids["chunk_ids"].write([chunk["chunk_id"]])
+        for name in TEXT_COLUMNS:
+            data = encode(chunk.get(name))
+            self.texts[name].write(np.frombuffer(data, dtype=np.uint8))
+            self.ends[name] += len(data)
+            self.offsets[name].write([self.ends[name]])
+
+    def close(self):
+        for writer in (*self.ids.values(), *self.texts.values(), *self.offsets.values()):
+            writer.close()
@@ -1,15 +1,18 @@
 import re
 import json
 from app.core.doc_parser import DocParser
-from sentence_transformers import SentenceTransformer
-from app.utils.logger import logger  
+from app.utils.logger import logger, should_log
 
 class DocChunker:
-    def __init__(self, parser: DocParser, doc_id: int):
+    def __init__(self, parser: DocParser, doc_id: int, embed_model=None):
+        """`embed_model`: encoder dùng chung (vd. embedding service của API); không truyền thì tự nạp model."""
         self.paragraphs = parser._convert_to_markdown_structured().split('\n')
         self.doc_id = doc_id
-        self.embed_model = SentenceTransformer('AITeamVN/Vietnamese_Embedding')
-        self.embed_model.max_seq_length = 512
+        if embed_model is None:
+            from sentence_transformers import SentenceTransformer
+            embed_model = SentenceTransformer('AITeamVN/Vietnamese_Embedding')
+            embed_model.max_seq_length = 512
+        self.embed_model = embed_model
         logger.info("Khởi tạo DocChunker cho doc_id={}", doc_id)
         self.chunks = self._chunk_by_article()
 
@@ -35,15 +38,11 @@ class DocChunker:
 
         logger.info("Tổng số chunks được tạo: {}", len(chunks))
 
-        result = []
-        for idx, chunk in enumerate(chunks, start=1):
-            markdown = chunk["title"] + "\n" + "\n".join(chunk["markdown"])
-            try:
-                embedding = self.embed_model.encode(markdown).tolist()
-            except Exception as e:
-                logger.exception("Lỗi khi encode embedding cho chunk_id {}: {}", idx, e)
-                embedding = []
+        markdowns = [chunk["title"] + "\n" + "\n".join(chunk["markdown"]) for chunk in chunks]
+        embeddings = self._encode_all(markdowns)
 
+        result = []
+        for idx, (chunk, markdown, embedding) in enumerate(zip(chunks, markdowns, embeddings), start=1):
             result.append({
                 "doc_id": self.doc_id,
                 "chunk_id": idx,
@@ -52,10 +51,29 @@ class DocChunker:
                 "vector": embedding
             })
 
-            logger.debug("Chunk {} - {} ký tự", idx, len(markdown))
+            if should_log("chunker.chunk"):
+                logger.debug("Chunk {} - {} ký tự", idx, len(markdown))
 
         return result
 
+    def _encode_all(self, markdowns):
+        """Encode mọi chunk trong một lời gọi (được gom batch); lỗi thì encode lại từng chunk như trước."""
+        if not markdowns:
+            return []
+        try:
+            return [vector.tolist() for vector in self.embed_model.encode(markdowns)]
+        except Exception as e:
+            logger.exception("Lỗi khi encode {} chunks theo batch, encode lại từng chunk: {}", len(markdowns), e)
+
+        embeddings = []
+        for idx, markdown in enumerate(markdowns, start=1):
+            try:
+                embeddings.append(self.embed_model.encode(markdown).tolist())
+            except Exception as e:
+                logger.exception("Lỗi khi encode embedding cho chunk_id {}: {}", idx, e)
+                embeddings.append([])
+        return embeddings
+
     def save_to_json(self, filename="chunks_by_article.json"):
         try:
             with open(filename, "w", encoding="utf-8") as f:
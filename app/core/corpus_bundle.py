@@ -0,0 +1,180 @@
+"""
+Export/import toàn bộ corpus (articles, chunks, embeddings) theo luồng, để seed node mới hoặc sao lưu.
+
+    <dir>/manifest.json            định dạng, số dòng, dim, nén; ghi sau cùng (thiếu = bản export dở dang)
+    <dir>/articles.ndjson[.gz]     mỗi dòng một article
+    <dir>/chunks.ndjson[.gz]       mỗi dòng một chunk; "v" là số hàng trong vectors.f32 (null nếu không có vector)
+    <dir>/vectors.f32[.gz]         float32 little-endian, liền nhau theo hàng, ghi theo từng khối
+
+Số chiều của corpus là số chiều của model (--dim) hoặc, nếu không truyền, số chiều phổ biến nhất trong DB; vector khác
+số chiều (hiếm, vd. của model cũ) được giữ nguyên trong dòng chunk ("vector") thay vì trong file nhị phân.
+Chạy qua: python -m scripts.corpus_bundle export|import|snapshot ...
+"""
+import gzip
+import json
+import os
+import time
+
+import numpy as np
+
+from app.core.index_snapshot import SnapshotWriter
+from app.utils.logger import logger
+
+BUNDLE_FORMAT = "chatbot-corpus"
+BUNDLE_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+VECTOR_DTYPE = np.dtype("<f4")
+# Số vector mỗi khối khi ghi/đọc file nhị phân
+VECTOR_BLOCK_ROWS = 1024
+
+
+def _paths(directory: str, compress: bool) -> dict:
+    suffix = ".gz" if compress else ""
+    return {name: os.path.join(directory, f"{name}{suffix}")
+            for name in ("articles.ndjson", "chunks.ndjson", "vectors.f32")}
+
+
+def _open(path: str, mode: str, compress: bool, level: int = 6):
+    if compress:
+        return gzip.open(path, mode, compresslevel=level) if "w" in mode else gzip.open(path, mode)
+    return open(path, mode)
+
+
+def _dumps(row: dict) -> bytes:
+    return json.dumps(row, ensure_ascii=False, default=str).encode("utf-8") + b"\n"
+
+
+def export_corpus(db, directory: str, compress: bool = True, level: int = 6, batch_size: int = 1000, dim: int = None) -> dict:
+    """
+    Ghi corpus từ `db.iter_corpus()` ra `directory`; trả về manifest. `dim`: số chiều vector của model (None: số chiều
+    có nhiều chunk nhất, không lấy theo dòng đầu tiên vì dòng đó có thể là vector cũ).
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    paths = _paths(directory, compress)
+    start = time.perf_counter()
+    counts = {"articles": 0, "chunks": 0, "vectors": 0, "inline_vectors": 0}
+    if dim is None:
+        dims = db.vector_dims()
+        dim = max(dims, key=dims.get) if dims else None
+    pending = []
+
+    with _open(paths["articles.ndjson"], "wb", compress, level) as articles, \
+            _open(paths["chunks.ndjson"], "wb", compress, level) as chunks, \
+            _open(paths["vectors.f32"], "wb", compress, level) as vectors:
+
+        def flush():
+            vectors.write(np.asarray(pending, dtype=VECTOR_DTYPE).tobytes())
+            pending.clear()
+
+        for kind, row in db.iter_corpus(batch_size=batch_size):
+            if kind == "article":
+                articles.write(_dumps(row))
+                counts["articles"] += 1
+                continue
+            vector = row.pop("vector", None)
+            row["v"] = None
+            if vector and isinstance(vector, list):
+                if len(vector) == dim:
+                    row["v"] = counts["vectors"]
+                    counts["vectors"] += 1
+                    pending.append(vector)
+                    if len(pending) >= VECTOR_BLOCK_ROWS:
+                        flush()
+                else:
+                    row["vector"] = vector
+                    counts["inline_vectors"] += 1
+            chunks.write(_dumps(row))
+            counts["chunks"] += 1
+        if pending:
+            flush()
+
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "version": BUNDLE_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "compress": compress,
+        "dim": dim or 0,
+        "vector_dtype": VECTOR_DTYPE.str,
+        **counts,
+        "bytes": sum(os.path.getsize(path) for path in paths.values()),
+    }
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    logger.info("Đã export {} articles, {} chunks, {} vectors ra {} ({:.1f} MB, {:.1f}s)",
+                counts["articles"], counts["chunks"], counts["vectors"], directory,
+                manifest["bytes"] / 2**20, time.perf_counter() - start)
+    return manifest
+
+
+def read_manifest(directory: str) -> dict:
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Không có {MANIFEST_FILE} trong {directory} (export chưa xong?)")
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != BUNDLE_FORMAT or manifest.get("version") != BUNDLE_VERSION:
+        raise ValueError(f"{directory} không phải bản export corpus version {BUNDLE_VERSION}")
+    return manifest
+
+
+def iter_articles(directory: str, manifest: dict):
+    with _open(_paths(directory, manifest["compress"])["articles.ndjson"], "rb", manifest["compress"]) as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def iter_chunks(directory: str, manifest: dict):
+    """Từng (chunk, vector): vector là mảng float32 `dim` chiều đọc từ file nhị phân, hoặc None."""
+    paths = _paths(directory, manifest["compress"])
+    dim = manifest["dim"]
+    block = np.zeros((0, dim), dtype=VECTOR_DTYPE)
+    block_start = 0
+    with _open(paths["chunks.ndjson"], "rb", manifest["compress"]) as chunks, \
+            _open(paths["vectors.f32"], "rb", manifest["compress"]) as vectors:
+        for line in chunks:
+            chunk = json.loads(line)
+            row = chunk.pop("v", None)
+            vector = None
+            if row is not None:
+                if row >= block_start + len(block):
+                    block_start += len(block)
+                    data = vectors.read(VECTOR_BLOCK_ROWS * dim * VECTOR_DTYPE.itemsize)
+                    block = np.frombuffer(data, dtype=VECTOR_DTYPE).reshape(-1, dim)
+                vector = block[row - block_start]
+            yield chunk, vector
+
+
+def import_corpus(db, directory: str, replace: bool = False) -> dict:
+    """Nạp bản export vào DB qua `db.copy_corpus` (COPY, một transaction)."""
+    manifest = read_manifest(directory)
+    start = time.perf_counter()
+
+    def chunks():
+        for chunk, vector in iter_chunks(directory, manifest):
+            if vector is not None:
+                chunk["vector"] = vector.tolist()
+            yield chunk
+
+    # Kiểm tra số dòng trong cùng transaction: bản export thiếu/hỏng thì rollback, DB giữ nguyên
+    expected = {"articles": manifest["articles"], "chunks": manifest["chunks"]}
+    counts = db.copy_corpus(iter_articles(directory, manifest), chunks(), replace=replace, expected=expected)
+    logger.info("Đã import {} vào DB trong {:.1f}s", directory, time.perf_counter() - start)
+    return counts
+
+
+def write_snapshot(directory: str, snapshot_dir: str) -> dict:
+    """Dựng snapshot chỉ mục (app.core.index_snapshot) trực tiếp từ bản export, không cần DB."""
+    manifest = read_manifest(directory)
+    start = time.perf_counter()
+    writer = SnapshotWriter(snapshot_dir, manifest["dim"])
+    for article in iter_articles(directory, manifest):
+        writer.add_article(article)
+    for chunk, vector in iter_chunks(directory, manifest):
+        writer.add_chunk(chunk, vector)
+    counts = writer.close()
+    logger.info("Đã ghi snapshot {} ({} chunks, {} vectors) trong {:.1f}s",
+                snapshot_dir, counts["chunks"], counts["vectors"], time.perf_counter() - start)
+    return counts
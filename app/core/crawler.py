@@ -0,0 +1,331 @@
+"""
+Crawler văn bản luật: frontier URL, tải bất đồng bộ qua một connection pool (httpx), giới hạn theo từng host
+(số kết nối, khoảng cách giữa hai request, robots.txt) và GET có điều kiện (ETag/Last-Modified) để bỏ qua
+trang không đổi. Trang mới/đã đổi đi qua cùng luồng nạp với upload DOCX (app.core.ingest).
+
+Trạng thái (frontier + metadata từng trang) lưu trong SQLite nên dừng giữa chừng rồi chạy lại sẽ tiếp tục
+từ các URL còn pending. Chạy qua: python -m scripts.crawler --seed URL ...
+"""
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urldefrag, urlsplit
+from urllib.robotparser import RobotFileParser
+
+from app.core.html_parser import HtmlParser
+from app.core.ingest import prepare_chunks, store_document
+from app.utils.logger import logger, should_log
+
+CRAWL_STATE = os.getenv("CRAWL_STATE", "crawl_state.sqlite")
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "8"))
+CRAWL_PER_HOST = int(os.getenv("CRAWL_PER_HOST", "2"))
+CRAWL_DELAY_S = float(os.getenv("CRAWL_DELAY_S", "1.0"))
+CRAWL_TIMEOUT_S = float(os.getenv("CRAWL_TIMEOUT_S", "20"))
+CRAWL_RETRIES = int(os.getenv("CRAWL_RETRIES", "3"))
+CRAWL_USER_AGENT = os.getenv("CRAWL_USER_AGENT", "chatbot-luat-crawler/1.0")
+# Số tài liệu chia chunk + encode song song; encoder gom batch nên các tài liệu dùng chung lượt forward
+CRAWL_INGEST_WORKERS = int(os.getenv("CRAWL_INGEST_WORKERS", "2"))
+
+SKIP_EXTENSIONS = re.compile(r"\.(pdf|docx?|xlsx?|zip|rar|jpe?g|png|gif|svg|css|js|ico|mp4|mp3)$", re.IGNORECASE)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def normalize_url(url: str):
+    """Bỏ fragment, chữ thường scheme/host; None nếu không phải http(s)."""
+    url, _ = urldefrag(url.strip())
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        return None
+    return parts._replace(scheme=parts.scheme.lower(), netloc=parts.netloc.lower(), path=parts.path or "/").geturl()
+
+
+class CrawlState:
+    """Frontier và metadata trang lưu trong SQLite; chỉ dùng từ event loop của crawler (một thread)."""
+
+    def __init__(self, path: str = CRAWL_STATE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                depth INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                doc_id INTEGER,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                fetched_at REAL,
+                error TEXT
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS pages_status ON pages (status)")
+        self.conn.commit()
+
+    def add(self, url: str, depth: int) -> bool:
+        cursor = self.conn.execute("INSERT OR IGNORE INTO pages (url, depth) VALUES (?, ?)", (url, depth))
+        self.conn.commit()
+        return cursor.rowcount > 0
+
+    def get(self, url: str):
+        row = self.conn.execute("SELECT * FROM pages WHERE url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    def pending(self):
+        return [(row["url"], row["depth"]) for row in
+                self.conn.execute("SELECT url, depth FROM pages WHERE status = 'pending' ORDER BY rowid")]
+
+    def update(self, url: str, **fields):
+        fields["fetched_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self.conn.execute(f"UPDATE pages SET {assignments} WHERE url = ?", (*fields.values(), url))
+        self.conn.commit()
+
+    def requeue(self, include_failed: bool = True):
+        """Đưa các trang đã xong về pending để crawl lại (trang không đổi sẽ được bỏ qua nhờ GET có điều kiện)."""
+        statuses = ("done", "failed") if include_failed else ("done",)
+        self.conn.execute(
+            f"UPDATE pages SET status = 'pending', attempts = 0 WHERE status IN ({','.join('?' * len(statuses))})",
+            statuses,
+        )
+        self.conn.commit()
+
+    def counts(self) -> dict:
+        return {row["status"]: row["n"] for row in
+                self.conn.execute("SELECT status, COUNT(*) AS n FROM pages GROUP BY status")}
+
+    def close(self):
+        self.conn.close()
+
+
+class HostLimiter:
+    """Mỗi host tối đa `per_host` request đồng thời, hai request bắt đầu cách nhau ít nhất `delay` giây."""
+
+    def __init__(self, per_host: int, delay: float):
+        self.per_host = per_host
+        self.delay = delay
+        self._slots = {}
+        self._next_start = {}
+        self._delays = {}
+
+    def set_delay(self, host: str, delay: float):
+        self._delays[host] = max(self.delay, delay)
+
+    def slot(self, host: str):
+        return _HostSlot(self, host)
+
+
+class _HostSlot:
+    def __init__(self, limiter: HostLimiter, host: str):
+        self.limiter = limiter
+        self.host = host
+        self.semaphore = limiter._slots.setdefault(host, asyncio.Semaphore(limiter.per_host))
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        limiter = self.limiter
+        loop = asyncio.get_running_loop()
+        # Giữ chỗ thời điểm bắt đầu trước khi ngủ để các request sau xếp hàng phía sau
+        start = max(loop.time(), limiter._next_start.get(self.host, 0.0))
+        limiter._next_start[self.host] = start + limiter._delays.get(self.host, limiter.delay)
+        await asyncio.sleep(start - loop.time())
+
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+        return False
+
+
+class Crawler:
+    """
+    Crawl từ `seeds` trong phạm vi các host của seeds (lọc thêm bằng regex `allow`), tối đa `max_depth` bước
+    link. Tải trang chạy trên event loop; parse, chia chunk + encode chạy ở thread pool, ghi DB ở một thread
+    riêng (PostgresHandler không dùng chung được giữa các thread).
+    """
+
+    def __init__(self, db, embed_model, state: CrawlState, seeds, allow: str = None, max_depth: int = 2,
+                 max_pages: int = None, concurrency: int = CRAWL_CONCURRENCY, per_host: int = CRAWL_PER_HOST,
+                 delay: float = CRAWL_DELAY_S, timeout: float = CRAWL_TIMEOUT_S, retries: int = CRAWL_RETRIES,
+                 ingest_workers: int = CRAWL_INGEST_WORKERS, respect_robots: bool = True,
+                 user_agent: str = CRAWL_USER_AGENT):
+        self.db = db
+        self.embed_model = embed_model
+        self.state = state
+        self.seeds = [url for url in (normalize_url(s) for s in seeds) if url]
+        # Chạy tiếp không cần seed: phạm vi gồm cả các host đã có trong frontier
+        self.hosts = {urlsplit(url).netloc for url in self.seeds} | {urlsplit(url).netloc for url, _ in state.pending()}
+        self.allow = re.compile(allow) if allow else None
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.limiter = HostLimiter(per_host, delay)
+        self.timeout = timeout
+        self.retries = retries
+        self.respect_robots = respect_robots
+        self.user_agent = user_agent
+        self._ingest_pool = ThreadPoolExecutor(ingest_workers, thread_name_prefix="crawl-ingest")
+        self._db_pool = ThreadPoolExecutor(1, thread_name_prefix="crawl-db")
+        self._robots = {}
+        self._budget = max_pages
+        self.stats = {"fetched": 0, "not_modified": 0, "unchanged": 0, "ingested": 0, "chunks": 0,
+                      "skipped": 0, "failed": 0, "discovered": 0}
+
+    def _in_scope(self, url: str) -> bool:
+        parts = urlsplit(url)
+        if parts.netloc not in self.hosts or SKIP_EXTENSIONS.search(parts.path):
+            return False
+        return self.allow is None or bool(self.allow.search(url))
+
+    async def _allowed_by_robots(self, client, url: str) -> bool:
+        if not self.respect_robots:
+            return True
+        parts = urlsplit(url)
+        # Giữ Task thay vì kết quả để các worker đến cùng lúc chỉ tải robots.txt một lần
+        if parts.netloc not in self._robots:
+            self._robots[parts.netloc] = asyncio.ensure_future(self._load_robots(client, parts.scheme, parts.netloc))
+        robots = await self._robots[parts.netloc]
+        return robots.can_fetch(self.user_agent, url)
+
+    async def _load_robots(self, client, scheme: str, host: str) -> RobotFileParser:
+        robots = RobotFileParser()
+        try:
+            response = await client.get(f"{scheme}://{host}/robots.txt")
+            robots.parse(response.text.splitlines() if response.status_code == 200 else [])
+        except Exception as e:
+            logger.warning("Không tải được robots.txt của {}: {}", host, e)
+            robots.parse([])
+        delay = robots.crawl_delay(self.user_agent)
+        if delay:
+            self.limiter.set_delay(host, float(delay))
+        return robots
+
+    async def run(self) -> dict:
+        import httpx
+
+        for url in self.seeds:
+            self.state.add(url, 0)
+        queue = asyncio.Queue()
+        for item in self.state.pending():
+            queue.put_nowait(item)
+        logger.info("🕷 Bắt đầu crawl: {} URL pending | concurrency={} | state={}",
+                    queue.qsize(), self.concurrency, self.state.path)
+
+        start = time.perf_counter()
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(
+            limits=limits, timeout=self.timeout, follow_redirects=True, headers={"User-Agent": self.user_agent}
+        ) as client:
+            workers = [asyncio.create_task(self._worker(client, queue)) for _ in range(self.concurrency)]
+            await queue.join()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        self._ingest_pool.shutdown()
+        self._db_pool.shutdown()
+        self.stats["elapsed_s"] = round(time.perf_counter() - start, 3)
+        self.stats["state"] = self.state.counts()
+        logger.info("✅ Crawl xong: {}", self.stats)
+        return self.stats
+
+    async def _worker(self, client, queue: asyncio.Queue):
+        while True:
+            url, depth = await queue.get()
+            try:
+                if self._budget is not None:
+                    if self._budget <= 0:
+                        continue
+                    self._budget -= 1
+                await self._crawl(client, queue, url, depth)
+            except Exception as e:
+                logger.exception("Lỗi khi crawl {}: {}", url, e)
+                self.stats["failed"] += 1
+                self.state.update(url, status="failed", error=str(e)[:500])
+            finally:
+                queue.task_done()
+
+    async def _fetch(self, client, url: str, page: dict):
+        headers = {}
+        if page.get("etag"):
+            headers["If-None-Match"] = page["etag"]
+        if page.get("last_modified"):
+            headers["If-Modified-Since"] = page["last_modified"]
+
+        import httpx
+
+        host = urlsplit(url).netloc
+        for attempt in range(1, self.retries + 1):
+            try:
+                async with self.limiter.slot(host):
+                    response = await client.get(url, headers=headers)
+            except httpx.TransportError as e:
+                if attempt == self.retries:
+                    raise
+                reason, wait = type(e).__name__, 2 ** attempt
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    return response
+                retry_after = response.headers.get("Retry-After", "")
+                reason = f"HTTP {response.status_code}"
+                wait = float(retry_after) if retry_after.isdigit() else 2 ** attempt
+            if should_log("crawler.retry"):
+                logger.warning("{} lỗi {}, thử lại sau {}s (lần {})", url, reason, wait, attempt)
+            await asyncio.sleep(wait)
+
+    async def _crawl(self, client, queue: asyncio.Queue, url: str, depth: int):
+        if not await self._allowed_by_robots(client, url):
+            self.stats["skipped"] += 1
+            self.state.update(url, status="skipped", error="robots.txt")
+            return
+
+        page = self.state.get(url) or {}
+        response = await self._fetch(client, url, page)
+        self.stats["fetched"] += 1
+        validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+
+        if response.status_code == 304:
+            self.stats["not_modified"] += 1
+            self.state.update(url, status="done", error=None)
+            return
+        if response.status_code != 200:
+            self.stats["failed"] += 1
+            self.state.update(url, status="failed", error=f"HTTP {response.status_code}")
+            return
+        if "html" not in response.headers.get("Content-Type", "html"):
+            self.stats["skipped"] += 1
+            self.state.update(url, status="skipped", error=response.headers.get("Content-Type"))
+            return
+
+        loop = asyncio.get_running_loop()
+        parser = await loop.run_in_executor(self._ingest_pool, HtmlParser, str(response.url), response.text)
+        if depth < self.max_depth:
+            for link in parser.links:
+                link = normalize_url(link)
+                if link and self._in_scope(link) and self.state.add(link, depth + 1):
+                    self.stats["discovered"] += 1
+                    queue.put_nowait((link, depth + 1))
+
+        # Máy chủ không hỗ trợ ETag/Last-Modified: so nội dung đã parse để không nạp lại trang không đổi
+        content_hash = hashlib.sha256(parser.markdown.encode("utf-8")).hexdigest()
+        if content_hash == page.get("content_hash") and page.get("doc_id") is not None:
+            self.stats["unchanged"] += 1
+            self.state.update(url, status="done", error=None, **validators)
+            return
+        if not re.search(r"^##?\s*Điều\s+\d+", parser.markdown, re.MULTILINE):
+            # Trang mục lục/danh sách: chỉ dùng để mở rộng frontier
+            self.state.update(url, status="done", error=None, content_hash=content_hash, **validators)
+            return
+
+        chunks = await loop.run_in_executor(self._ingest_pool, prepare_chunks, parser, self.embed_model)
+        doc_id = await loop.run_in_executor(
+            self._db_pool, store_document, self.db, parser, chunks, page.get("doc_id")
+        )
+        self.stats["ingested"] += 1
+        self.stats["chunks"] += len(chunks)
+        self.state.update(url, status="done", error=None, content_hash=content_hash, doc_id=doc_id, **validators)
+        logger.info("📥 {} -> doc_id={} ({} chunks)", url, doc_id, len(chunks))
@@ -9,7 +9,7 @@ class DocParser:
         self.filepath = filepath
         logger.info("Bắt đầu phân tích tài liệu: {}", filepath)
 
-        self.paragraphs = self._read_docx_text()
+        self.paragraphs = self._read_paragraphs()
         self.title = self._extract_title()
         self.date = self._extract_date()
         self.text = "\n".join(self.paragraphs)
@@ -19,6 +19,10 @@ class DocParser:
 
         logger.info("Đã phân tích xong tài liệu | title='{}' | tổng đoạn={}", self.title, len(self.paragraphs))
 
+    def _read_paragraphs(self):
+        """Các đoạn văn bản (đã strip, bỏ đoạn rỗng) theo thứ tự; lớp con đọc từ nguồn khác (vd. HTML) ghi đè hàm này."""
+        return self._read_docx_text()
+
     def _read_docx_text(self):
         try:
             doc = Document(self.filepath)
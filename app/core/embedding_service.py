@@ -0,0 +1,220 @@
+"""
+Dịch vụ embedding gom batch: các lời gọi encode đồng thời (truy vấn /chat, /search, chunk khi upload)
+được gom trong vài ms hoặc tới N câu rồi chạy một lượt forward, trả kết quả qua Future.
+
+    EMBED_SERVICE=inprocess   gom batch trong tiến trình API (mặc định)
+    EMBED_SERVICE=remote      gửi tới worker riêng, dùng chung cho mọi uvicorn worker:
+                              python -m app.core.embedding_service
+    EMBED_SERVICE=direct      gọi model trực tiếp như trước
+"""
+import argparse
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from app.utils.logger import logger
+from app.utils.metrics import timed, EMBED_BATCH
+
+EMBED_SERVICE = os.getenv("EMBED_SERVICE", "inprocess").lower()
+EMBED_SERVICE_ADDRESS = os.getenv("EMBED_SERVICE_ADDRESS", "127.0.0.1:8601")
+# Khóa xác thực kết nối tới worker (bắt buộc với remote): giao thức dùng pickle, ai kết nối được là chạy được code
+EMBED_SERVICE_AUTHKEY = os.getenv("EMBED_SERVICE_AUTHKEY", "").encode()
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "5"))
+# Giới hạn của DocChunker cho chunk; truy vấn luôn ngắn hơn nên dùng chung một model được
+EMBED_MAX_SEQ_LENGTH = 512
+
+# Truy vấn ưu tiên hơn các lô lớn (chunk khi upload) để không phải chờ sau cả tài liệu
+PRIORITY_QUERY, PRIORITY_BULK, _STOP = 0, 1, 2
+
+
+def require_authkey(authkey: bytes = EMBED_SERVICE_AUTHKEY) -> bytes:
+    """Khóa của worker embedding; ném ValueError nếu chưa cấu hình (không có khóa mặc định)."""
+    if not authkey:
+        raise ValueError("Thiếu EMBED_SERVICE_AUTHKEY (bắt buộc khi dùng embedding worker)")
+    return authkey
+
+
+def _as_batch(sentences):
+    single = isinstance(sentences, str)
+    return single, [sentences] if single else list(sentences)
+
+
+class BatchingEncoder:
+    """
+    Bọc một model có `encode(list[str])`, cùng giao diện `encode` với SentenceTransformer
+    (str -> (d,), list -> (n, d)). Một thread nền gom các yêu cầu đang chờ thành batch
+    tối đa `max_batch` câu, chờ thêm tối đa `max_wait_ms` sau yêu cầu đầu tiên.
+    """
+
+    def __init__(self, model, max_batch: int = EMBED_BATCH_SIZE, max_wait_ms: float = EMBED_BATCH_WAIT_MS):
+        self.model = model
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: list):
+        """Đưa `texts` vào hàng đợi, trả về list Future (mỗi phần tối đa `max_batch` câu)."""
+        priority = PRIORITY_QUERY if len(texts) <= self.max_batch else PRIORITY_BULK
+        futures = []
+        for start in range(0, len(texts), self.max_batch):
+            future = Future()
+            self._queue.put((priority, next(self._seq), texts[start:start + self.max_batch], future))
+            futures.append(future)
+        return futures
+
+    def encode(self, sentences, **kwargs):
+        single, texts = _as_batch(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        parts = [future.result() for future in self.submit(texts)]
+        vectors = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        return vectors[0] if single else vectors
+
+    def close(self):
+        self._queue.put((_STOP, next(self._seq), None, None))
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item[0] == _STOP:
+                return
+            batch, size = [item], len(item[2])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item[0] == _STOP or size + len(item[2]) > self.max_batch:
+                    self._queue.put(item)
+                    break
+                batch.append(item)
+                size += len(item[2])
+            self._encode_batch(batch)
+
+    def _encode_batch(self, batch):
+        texts = [text for _, _, item_texts, _ in batch for text in item_texts]
+        try:
+            with timed("embed_batch"):
+                vectors = np.asarray(self.model.encode(texts), dtype=np.float32).reshape(len(texts), -1)
+        except Exception as e:
+            logger.exception("Lỗi khi encode batch {} câu: {}", len(texts), e)
+            for _, _, _, future in batch:
+                future.set_exception(e)
+            return
+        EMBED_BATCH.observe(len(texts))
+        offset = 0
+        for _, _, item_texts, future in batch:
+            future.set_result(vectors[offset:offset + len(item_texts)])
+            offset += len(item_texts)
+
+
+class RemoteEncoder:
+    """Client của worker embedding dùng chung; mỗi thread giữ một kết nối riêng."""
+
+    def __init__(self, address: str = EMBED_SERVICE_ADDRESS, authkey: bytes = EMBED_SERVICE_AUTHKEY):
+        host, port = address.rsplit(":", 1)
+        self.address = (host, int(port))
+        self.authkey = require_authkey(authkey)
+        self._local = threading.local()
+
+    def _request(self, texts):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = Client(self.address, authkey=self.authkey)
+        try:
+            conn.send(texts)
+            return conn.recv()
+        except (EOFError, OSError):
+            self._local.conn = None
+            conn.close()
+            raise
+
+    def encode(self, sentences, **kwargs):
+        single, texts = _as_batch(sentences)
+        try:
+            ok, payload = self._request(texts)
+        except (EOFError, OSError):
+            # Worker khởi động lại: kết nối lại một lần
+            ok, payload = self._request(texts)
+        if not ok:
+            raise RuntimeError(f"Embedding worker lỗi: {payload}")
+        return payload[0] if single else payload
+
+
+def load_encoder(mode: str = EMBED_SERVICE):
+    """Encoder dùng cho SearchEngine và DocChunker theo EMBED_SERVICE."""
+    if mode == "remote":
+        logger.info("Dùng embedding worker tại {}", EMBED_SERVICE_ADDRESS)
+        return RemoteEncoder()
+
+    from app.core.search import load_embed_model
+    model = load_embed_model()
+    model.max_seq_length = EMBED_MAX_SEQ_LENGTH
+    if mode == "inprocess":
+        logger.info("Bật gom batch embedding: tối đa {} câu / {} ms", EMBED_BATCH_SIZE, EMBED_BATCH_WAIT_MS)
+        return BatchingEncoder(model)
+    return model
+
+
+def _handle(conn, encoder: BatchingEncoder):
+    with conn:
+        while True:
+            try:
+                texts = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                conn.send((True, encoder.encode(texts)))
+            except Exception as e:
+                conn.send((False, str(e)))
+
+
+def serve(address: str, encoder: BatchingEncoder, authkey: bytes = EMBED_SERVICE_AUTHKEY):
+    host, port = address.rsplit(":", 1)
+    authkey = require_authkey(authkey)
+    # backlog mặc định của Listener là 1: nhiều uvicorn worker/thread kết nối cùng lúc sẽ bị treo
+    with Listener((host, int(port)), backlog=128, authkey=authkey) as listener:
+        logger.info("🚀 Embedding worker lắng nghe tại {}", address)
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                logger.warning("Từ chối kết nối tới embedding worker: {}", e)
+                continue
+            threading.Thread(target=_handle, args=(conn, encoder), daemon=True).start()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--address", default=EMBED_SERVICE_ADDRESS)
+    ap.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    ap.add_argument("--wait-ms", type=float, default=EMBED_BATCH_WAIT_MS)
+    args = ap.parse_args(argv)
+    try:
+        authkey = require_authkey()
+    except ValueError as e:
+        ap.error(str(e))
+
+    from app.core.search import load_embed_model
+    model = load_embed_model()
+    model.max_seq_length = EMBED_MAX_SEQ_LENGTH
+    serve(args.address, BatchingEncoder(model, args.batch_size, args.wait_ms), authkey)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import os
+import random
+import time
+from app.utils.logger import logger
+
+FAKE_ANSWER = (
+    "Theo quy định tại tài liệu được cung cấp, người sử dụng đất có quyền và nghĩa vụ "
+    "thực hiện thủ tục tại cơ quan nhà nước có thẩm quyền trong thời hạn luật định. "
+)
+
+
+class FakeLLM:
+    """
+    Provider LLM giả lập chạy cục bộ để load test mà không tốn tiền hay dính rate limit.
+
+    Độ trễ tới token đầu theo phân phối log-normal (trung vị `latency_ms`, độ lệch `latency_sigma`),
+    sau đó sinh `answer_tokens` token với tốc độ `tokens_per_sec`; `error_rate` là xác suất lỗi.
+    """
+
+    def __init__(self, latency_ms=800.0, latency_sigma=0.5, tokens_per_sec=50.0,
+                 answer_tokens=120, error_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens_per_sec = tokens_per_sec
+        self.answer_tokens = answer_tokens
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._words = FAKE_ANSWER.split()
+
+    @classmethod
+    def from_env(cls):
+        seed = os.getenv("FAKE_LLM_SEED")
+        return cls(
+            latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", "800")),
+            latency_sigma=float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5")),
+            tokens_per_sec=float(os.getenv("FAKE_LLM_TOKENS_PER_SEC", "50")),
+            answer_tokens=int(os.getenv("FAKE_LLM_ANSWER_TOKENS", "120")),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            seed=int(seed) if seed else None,
+        )
+
+    def _first_token_delay(self) -> float:
+        if self.latency_ms <= 0:
+            return 0.0
+        return self._rng.lognormvariate(0.0, self.latency_sigma) * self.latency_ms / 1000
+
+    def stream(self, prompt: str):
+        """Sinh câu trả lời theo từng token với độ trễ giả lập."""
+        time.sleep(self._first_token_delay())
+        if self._rng.random() < self.error_rate:
+            raise RuntimeError("Fake LLM: lỗi giả lập")
+
+        interval = 1.0 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+        for i in range(self.answer_tokens):
+            if interval:
+                time.sleep(interval)
+            yield self._words[i % len(self._words)] + " "
+
+    def generate(self, prompt: str) -> str:
+        answer = "".join(self.stream(prompt)).strip()
+        logger.debug("Fake LLM trả lời {} ký tự cho prompt {} ký tự", len(answer), len(prompt))
+        return answer
@@ -1,13 +1,38 @@
 import os
-import openai
+import time
 from dotenv import load_dotenv
-import google.generativeai as genai
 from app.utils.logger import logger  
+from app.utils.metrics import timed, PROMPT_SIZE, STAGE_LATENCY
+from app.core.fake_llm import FakeLLM
+from app.core.admission import AdmissionController, CHARS_PER_TOKEN, LLM_OUTPUT_TOKENS, estimate_tokens
 
 load_dotenv()
 
+# Câu trả lời khi gọi LLM lỗi; không được lưu vào cache câu trả lời
+CHAT_ERROR_MESSAGE = "Tôi xin lỗi, đã xảy ra lỗi khi xử lý câu hỏi của bạn. Vui lòng thử lại sau."
+
+
+def provider_of(model_llm: str) -> str:
+    """Provider của model, là khóa giới hạn chung cho mọi model của provider đó."""
+    if model_llm.startswith("gemini"):
+        return "gemini"
+    if model_llm.startswith("gpt"):
+        return "openai"
+    if model_llm.startswith("fake"):
+        return "fake"
+    return "other"
+
 class GeminiClient:
     def __init__(self):
+        # LLM_PROVIDER=fake: mọi lời gọi đi qua FakeLLM (load test), không cần API key
+        self.provider = os.getenv("LLM_PROVIDER", "remote").lower()
+        self.fake = FakeLLM.from_env()
+        self.admission = AdmissionController.from_env()
+        if self.provider == "fake":
+            self.GPT_client = None
+            logger.warning("GeminiClient đang dùng provider giả lập (LLM_PROVIDER=fake)")
+            return
+
         api_key = os.getenv("GEMINI_API_KEY")
         api_key_openai = os.getenv("OPENAI_API_KEY")  # Lấy API key từ biến môi trường
         if not api_key:
@@ -17,14 +42,88 @@ class GeminiClient:
             logger.error(" Không tìm thấy OPENAI_API_KEY trong file .env")
             raise ValueError("Missing OPENAI_API_KEY in .env")
         
+        # Import muộn: openai/google.generativeai làm chậm import app.api.api
+        import openai
+        import google.generativeai as genai
+
         self.GPT_client = openai.OpenAI(api_key=api_key_openai)
+        self.genai = genai
         genai.configure(api_key=api_key)
         logger.info("Đã khởi tạo GeminiClient")
 
     def chat(self, prompt: str, model_llm: str = "gemini-2.0-flash") -> str:
+        """Gọi LLM khi được admission cho phép; ném AdmissionRejected nếu quá tải."""
+        provider = "fake" if self.provider == "fake" else provider_of(model_llm)
+        prompt_tokens = estimate_tokens(prompt)
+        with self.admission.admit(provider, model_llm, prompt_tokens + LLM_OUTPUT_TOKENS) as ticket:
+            answer = self._generate(prompt, model_llm)
+            ticket.tokens = prompt_tokens + estimate_tokens(answer)
+        return answer
+
+    def stream(self, prompt: str, model_llm: str = "gemini-2.0-flash"):
+        """
+        Như `chat` nhưng trả về iterator các đoạn text theo thứ tự sinh. Slot admission được giữ ngay khi gọi
+        (ném AdmissionRejected trước khi trả iterator) và trả lại khi iterator chạy hết hoặc bị đóng.
+        """
+        provider = "fake" if self.provider == "fake" else provider_of(model_llm)
+        prompt_tokens = estimate_tokens(prompt)
+        ticket = self.admission.acquire(provider, model_llm, prompt_tokens + LLM_OUTPUT_TOKENS)
+        tokens = self._stream(ticket, prompt, model_llm, prompt_tokens)
+        # Chạy tới `yield` đầu tiên để khối finally (trả slot) luôn chạy khi iterator bị đóng hoặc thu hồi
+        next(tokens)
+        return tokens
+
+    def _stream(self, ticket, prompt: str, model_llm: str, prompt_tokens: int):
+        chars = 0
         try:
-            if model_llm.startswith("gemini"):
-                model = genai.GenerativeModel(model_llm)
+            yield None
+            # Không dùng `timed` ở đây: iterator có thể được đọc tiếp từ các thread khác nhau
+            start = time.perf_counter()
+            for text in self._generate_stream(prompt, model_llm):
+                chars += len(text)
+                yield text
+            STAGE_LATENCY.observe(time.perf_counter() - start, stage="llm")
+        except Exception as e:
+            logger.exception("Lỗi khi gọi API (stream): {}", e)
+            yield ("\n\n" if chars else "") + CHAT_ERROR_MESSAGE
+        finally:
+            ticket.tokens = prompt_tokens + max(1, chars // CHARS_PER_TOKEN)
+            self.admission.release(ticket)
+
+    def _generate_stream(self, prompt: str, model_llm: str):
+        if self.provider == "fake" or model_llm.startswith("fake"):
+            yield from self.fake.stream(prompt)
+
+        elif model_llm.startswith("gemini"):
+            model = self.genai.GenerativeModel(model_llm)
+            for chunk in model.generate_content(prompt, stream=True):
+                if chunk.text:
+                    yield chunk.text
+            logger.debug("Đã nhận đủ phản hồi stream từ Gemini")
+
+        elif model_llm.startswith("gpt"):
+            response = self.GPT_client.chat.completions.create(
+                model=model_llm,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.7,
+                stream=True,
+            )
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+            logger.debug("Đã nhận đủ phản hồi stream từ OpenAI GPT")
+
+        else:
+            raise ValueError(f"Model '{model_llm}' không được hỗ trợ")
+
+    @timed("llm")
+    def _generate(self, prompt: str, model_llm: str) -> str:
+        try:
+            if self.provider == "fake" or model_llm.startswith("fake"):
+                return self.fake.generate(prompt)
+
+            elif model_llm.startswith("gemini"):
+                model = self.genai.GenerativeModel(model_llm)
                 response = model.generate_content(prompt)
                 logger.debug("Đã nhận phản hồi từ Gemini")
                 return response.text
@@ -43,10 +142,11 @@ class GeminiClient:
 
         except Exception as e:
             logger.exception("Lỗi khi gọi API: %s", e)
-            return "Tôi xin lỗi, đã xảy ra lỗi khi xử lý câu hỏi của bạn. Vui lòng thử lại sau."
+            return CHAT_ERROR_MESSAGE
 
             
 
+    @timed("build_prompt")
     def build_prompt(self, query: str, search_results: list, custom_instructions: str = None) -> str:
         """
         Tạo prompt dựa trên query và search_results.
@@ -79,4 +179,5 @@ Tài liệu (nếu có):
 Hãy đưa ra câu trả lời phù hợp nhất theo đúng quy tắc trên.
         """.strip()
 
+        PROMPT_SIZE.observe(len(prompt))
         return prompt
@@ -0,0 +1,64 @@
+import re
+from urllib.parse import urljoin
+from app.core.doc_parser import DocParser
+from app.utils.logger import logger
+
+CONTENT_TAGS = ["p", "h1", "h2", "h3", "h4", "li"]
+# Vùng nội dung chính của các trang văn bản luật thường gặp, thử lần lượt
+CONTENT_SELECTORS = ["div.content", "div.content1", "#toanvancontent", "article", "main"]
+DATE_RE = re.compile(r"ngày\s+\d{1,2}\s+tháng\s+\d{1,2}\s+năm\s+\d{4}", re.IGNORECASE)
+
+
+class HtmlParser(DocParser):
+    """
+    Phân tích một trang HTML văn bản luật thành cùng cấu trúc với DocParser (paragraphs, title, date,
+    markdown...) để dùng chung DocChunker và luồng lưu tài liệu với file DOCX.
+    `links` là các URL tuyệt đối trong trang, cho crawler mở rộng frontier.
+    """
+
+    def __init__(self, url: str, html: str):
+        from bs4 import BeautifulSoup
+
+        self.soup = BeautifulSoup(html, "html.parser")
+        self.base_url = url
+        self.content = self._content_root()
+        super().__init__(url)
+        self.images = [
+            urljoin(url, img["src"]) for img in self.content.find_all("img", src=True)
+        ]
+        self.links = [urljoin(url, a["href"]) for a in self.soup.find_all("a", href=True)]
+
+    def _content_root(self):
+        for selector in CONTENT_SELECTORS:
+            node = self.soup.select_one(selector)
+            if node is not None:
+                return node
+        return self.soup.body or self.soup
+
+    def _read_paragraphs(self):
+        paragraphs = []
+        for tag in self.content.find_all(CONTENT_TAGS):
+            # Thẻ chứa thẻ nội dung khác (vd. <li><p>..</p></li>) sẽ được lấy qua thẻ con, tránh lặp đoạn
+            if tag.find(CONTENT_TAGS) is not None:
+                continue
+            text = tag.get_text(" ", strip=True)
+            if text:
+                paragraphs.append(text)
+        logger.debug("Đã đọc {} đoạn văn bản từ trang {}", len(paragraphs), self.base_url)
+        return paragraphs
+
+    def _extract_title(self):
+        heading = self.content.find("h1") or self.soup.find("h1")
+        if heading is not None and heading.get_text(strip=True):
+            return heading.get_text(" ", strip=True)
+        if self.soup.title is not None and self.soup.title.get_text(strip=True):
+            return self.soup.title.get_text(" ", strip=True)
+        return super()._extract_title()
+
+    def _extract_date(self):
+        # Ngày ban hành thường nằm ở phần đầu văn bản ("Hà Nội, ngày 24 tháng 11 năm 2015")
+        for para in self.paragraphs[:30]:
+            match = DATE_RE.search(para)
+            if match:
+                return match.group(0)
+        return super()._extract_date()
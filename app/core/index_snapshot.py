@@ -0,0 +1,88 @@
+"""
+Snapshot chỉ mục tìm kiếm trên đĩa: SearchEngine mở trực tiếp (mmap) thay vì nạp và giải mã JSON từ Postgres.
+
+    <dir>/doc_ids.npy, chunk_ids.npy, title*.npy, markdown*.npy   ChunkStore (xem ChunkStore.save)
+    <dir>/embeddings.npy     float32 (số vector, dim), theo thứ tự chunk
+    <dir>/vector_rows.npy    vị trí chunk trong kho của từng hàng embeddings
+    <dir>/articles.json      [{id, title, date, start, end}] theo id tăng dần, kèm dấu vết corpus (fingerprint)
+
+Snapshot được ghi theo luồng (SnapshotWriter) từ bản export corpus, xem app.core.corpus_bundle.
+`fingerprint` ({articles, max_article_id, chunks}, như PostgresHandler.corpus_fingerprint) cho biết snapshot dựng từ
+corpus nào; SearchEngine chỉ dùng snapshot khi dấu vết này khớp với DB.
+"""
+import json
+import os
+
+import numpy as np
+
+from app.core.chunk_store import ChunkStore, ChunkStoreWriter, NpyStreamWriter
+
+SNAPSHOT_VERSION = 1
+ARTICLES_FILE = "articles.json"
+
+
+class SnapshotWriter:
+    """
+    Nhận articles và chunks (chunks sắp theo doc_id, chunk_id như khi SearchEngine nạp từ DB) rồi ghi snapshot.
+    Chỉ metadata của articles được giữ trong bộ nhớ.
+    """
+
+    def __init__(self, directory: str, dim: int):
+        self.directory = directory
+        self.dim = dim
+        self.store = ChunkStoreWriter(directory)
+        self.embeddings = NpyStreamWriter(os.path.join(directory, "embeddings.npy"), np.float32, (dim,))
+        self.vector_rows = NpyStreamWriter(os.path.join(directory, "vector_rows.npy"), np.int64)
+        self.articles = {}
+        self.ranges = {}
+
+    def add_article(self, article: dict):
+        self.articles[article["id"]] = {"title": article.get("title"), "date": article.get("date")}
+
+    def add_chunk(self, chunk: dict, vector=None):
+        """`vector`: mảng float32 đúng `dim` chiều, hoặc None nếu chunk không có vector dùng được."""
+        pos = len(self.store)
+        start, _ = self.ranges.get(chunk["doc_id"], (pos, pos))
+        self.ranges[chunk["doc_id"]] = (start, pos + 1)
+        self.store.add(chunk)
+        if vector is not None:
+            self.embeddings.write(vector)
+            self.vector_rows.write([pos])
+
+    def fingerprint(self) -> dict:
+        return {"articles": len(self.articles), "max_article_id": max(self.articles, default=0), "chunks": len(self.store)}
+
+    def close(self) -> dict:
+        self.store.close()
+        self.embeddings.close()
+        self.vector_rows.close()
+        # Bài không có chunk nhận khoảng rỗng tại vị trí của nó, như SearchEngine._load_chunks
+        entries, end = [], 0
+        for doc_id in sorted(self.articles):
+            start, end = self.ranges.get(doc_id, (end, end))
+            entries.append({"id": doc_id, **self.articles[doc_id], "start": start, "end": end})
+        meta = {"version": SNAPSHOT_VERSION, "dim": self.dim, "fingerprint": self.fingerprint(), "articles": entries}
+        with open(os.path.join(self.directory, ARTICLES_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        return {"articles": len(entries), "chunks": len(self.store), "vectors": self.embeddings.rows}
+
+
+def is_snapshot(directory: str) -> bool:
+    return bool(directory) and os.path.exists(os.path.join(directory, ARTICLES_FILE))
+
+
+def load_snapshot(directory: str, mmap: bool = True) -> dict:
+    """Trả về store, embeddings, vector_rows, dim, articles (list dict có start/end) và fingerprint (None với snapshot cũ)."""
+    with open(os.path.join(directory, ARTICLES_FILE), encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot {directory} có version {meta.get('version')}, cần {SNAPSHOT_VERSION}")
+    mode = "r" if mmap else None
+    return {
+        "store": ChunkStore.open(directory, mmap=mmap),
+        "embeddings": np.load(os.path.join(directory, "embeddings.npy"), mmap_mode=mode),
+        "vector_rows": np.load(os.path.join(directory, "vector_rows.npy")),
+        "dim": meta["dim"],
+        "articles": meta["articles"],
+        "fingerprint": meta.get("fingerprint"),
+    }
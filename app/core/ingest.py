@@ -0,0 +1,25 @@
+"""
+Luồng nạp tài liệu dùng chung cho upload DOCX (API) và crawler:
+parse (DocParser/HtmlParser) -> chia chunk theo Điều -> encode theo batch -> ghi article + chunks trong một transaction.
+"""
+from app.core.chunker import DocChunker
+from app.utils.logger import logger
+from app.utils.metrics import timed
+
+
+@timed("ingest.prepare")
+def prepare_chunks(parser, embed_model) -> list:
+    """Chia chunk và encode (một lời gọi encode cho cả tài liệu); chưa cần doc_id."""
+    return DocChunker(parser, doc_id=None, embed_model=embed_model).get_chunks()
+
+
+def store_document(db, parser, chunks: list, replace_id=None) -> int:
+    return db.insert_document(parser.to_dict(), chunks, replace_id=replace_id)
+
+
+def ingest_document(db, parser, embed_model, replace_id=None):
+    """Nạp một tài liệu đã parse, trả về (doc_id, chunks)."""
+    chunks = prepare_chunks(parser, embed_model)
+    doc_id = store_document(db, parser, chunks, replace_id=replace_id)
+    logger.info("Đã nạp tài liệu '{}' | doc_id={} | {} chunks", parser.title, doc_id, len(chunks))
+    return doc_id, chunks
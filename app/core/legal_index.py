@@ -0,0 +1,86 @@
+import re
+
+DIEU_RE = re.compile(r"(?:điều|dieu)\s+(\d+)", re.IGNORECASE)
+KHOAN_RE = re.compile(r"(?:khoản|khoan)\s+(\d+)", re.IGNORECASE)
+CHUONG_RE = re.compile(r"(?:chương|chuong)\s+([ivxlc]+|\d+)\b", re.IGNORECASE)
+CHUONG_HEADING_RE = re.compile(r"^#*\s*chương\s+([ivxlc]+|\d+)\b", re.IGNORECASE | re.MULTILINE)
+
+ROMAN = ((100, "C"), (90, "XC"), (50, "L"), (40, "XL"), (10, "X"), (9, "IX"), (5, "V"), (4, "IV"), (1, "I"))
+
+
+def _to_roman(number: int) -> str:
+    out = []
+    for value, symbol in ROMAN:
+        while number >= value:
+            out.append(symbol)
+            number -= value
+    return "".join(out)
+
+
+def normalize_chapter(value: str) -> str:
+    """'2', 'ii', 'II' -> 'II' để so khớp tiêu đề chương viết bằng số La Mã."""
+    value = value.strip()
+    return _to_roman(int(value)) if value.isdigit() else value.upper()
+
+
+def parse_legal_refs(text: str) -> dict:
+    """Tách tham chiếu Chương/Điều/Khoản trong câu hỏi (có dấu hoặc không), vd. 'khoản 2 điều 12 chương II'."""
+    dieu = DIEU_RE.search(text)
+    khoan = KHOAN_RE.search(text)
+    chuong = CHUONG_RE.search(text)
+    return {
+        "dieu": int(dieu.group(1)) if dieu else None,
+        "khoan": int(khoan.group(1)) if khoan else None,
+        "chuong": normalize_chapter(chuong.group(1)) if chuong else None,
+    }
+
+
+class ArticleIndex:
+    """
+    Chỉ mục tra cứu trực tiếp Điều luật, dựng khi nạp corpus từ `title` của chunk ("## Điều N. ...").
+
+    - `by_doc[(doc_id, n)]` và `by_number[n]`: vị trí hàng của chunk trong `ChunkStore` của engine (`SearchState.store`)
+    - `chapters[pos]`: chương chứa chunk (suy ra từ dòng "# Chương ..." theo thứ tự trong tài liệu)
+    """
+
+    def __init__(self):
+        self.by_doc = {}
+        self.by_number = {}
+        self.chapters = {}
+
+    @classmethod
+    def build(cls, chunks, doc_ranges):
+        index = cls()
+        for doc_id, (start, end) in doc_ranges.items():
+            chapter = None
+            for pos in range(start, end):
+                chunk = chunks[pos]
+                headings = CHUONG_HEADING_RE.findall(chunk.get("markdown") or "")
+                # Chunk đầu tiên chứa cả phần mở đầu và tiêu đề "Chương I" đứng trước nó
+                if chapter is None and headings and pos == start:
+                    chapter = normalize_chapter(headings[0])
+                if chapter is not None:
+                    index.chapters[pos] = chapter
+                if headings:
+                    chapter = normalize_chapter(headings[-1])
+
+                match = DIEU_RE.search(chunk.get("title") or "")
+                if match:
+                    number = int(match.group(1))
+                    index.by_doc.setdefault((doc_id, number), []).append(pos)
+                    index.by_number.setdefault(number, []).append(pos)
+        return index
+
+    def lookup(self, refs: dict, doc_ids=None):
+        """Vị trí các chunk đúng Điều (và Chương nếu có) được hỏi; O(1) theo số Điều."""
+        number = refs.get("dieu")
+        if number is None:
+            return []
+        if doc_ids is None:
+            positions = self.by_number.get(number, [])
+        else:
+            positions = [pos for doc_id in doc_ids for pos in self.by_doc.get((doc_id, number), [])]
+        chapter = refs.get("chuong")
+        if chapter is not None:
+            positions = [pos for pos in positions if self.chapters.get(pos) == chapter]
+        return positions
@@ -0,0 +1,187 @@
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+
+_EMPTY = np.zeros(0, dtype=np.int32)
+
+
+def _fold_char(ch: str) -> str:
+    if ch in "đĐ":
+        return "d" if ch == "đ" else "D"
+    base = unicodedata.normalize("NFD", ch)[0]
+    return base if base.isascii() else ch
+
+
+# Bảng dịch ký tự có dấu -> không dấu (Latin mở rộng, gồm cả dải Latin Extended Additional của tiếng Việt)
+FOLD_TABLE = {
+    code: _fold_char(chr(code))
+    for code in list(range(0x00C0, 0x0250)) + list(range(0x1E00, 0x1F00))
+    if _fold_char(chr(code)) != chr(code)
+}
+
+
+def fold_diacritics(text: str) -> str:
+    """Bỏ dấu tiếng Việt: 'quyền sử dụng đất' -> 'quyen su dung dat'. Giữ nguyên độ dài chuỗi."""
+    return text.translate(FOLD_TABLE)
+
+
+def _sorted_unique(values: np.ndarray) -> np.ndarray:
+    values = np.sort(values)
+    return values[np.r_[True, values[1:] != values[:-1]]] if values.size else values
+
+
+def _group(keys: np.ndarray, positions: np.ndarray, n_texts: int, name) -> dict:
+    """{name(khóa): mảng vị trí tăng dần, không trùng} từ hai mảng song song khóa/vị trí."""
+    if keys.size == 0:
+        return {}
+    combined = np.sort(keys * n_texts + positions)
+    combined = combined[np.r_[True, combined[1:] != combined[:-1]]]
+    keys, positions = combined // n_texts, (combined % n_texts).astype(np.int32)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return {name(int(keys[start])): chunk for start, chunk in zip(starts, np.split(positions, starts[1:]))}
+
+
+class _Vocabulary:
+    """
+    Tra âm tiết trong từ vựng theo tiền tố / hậu tố (tìm nhị phân trên từ vựng đã sắp xếp, xuôi và đảo ngược)
+    và theo chuỗi con (bảng n-gram ký tự, n <= GRAM -> số thứ tự từ), không duyệt toàn bộ từ vựng.
+    """
+
+    GRAM = 3
+
+    def __init__(self, words):
+        self.words = sorted(words)
+        self.reversed = sorted(word[::-1] for word in self.words)
+        grams = {}
+        for i, word in enumerate(self.words):
+            for gram in {word[j:j + n] for n in range(1, self.GRAM + 1) for j in range(len(word) - n + 1)}:
+                grams.setdefault(gram, []).append(i)
+        self.grams = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in grams.items()}
+
+    @staticmethod
+    def _prefixed(words, prefix: str):
+        start = bisect_left(words, prefix)
+        end = bisect_left(words, prefix + "\U0010ffff", lo=start)
+        return words[start:end]
+
+    def starting(self, prefix: str):
+        return self._prefixed(self.words, prefix)
+
+    def ending(self, suffix: str):
+        return [word[::-1] for word in self._prefixed(self.reversed, suffix[::-1])]
+
+    def containing(self, token: str):
+        if len(token) <= self.GRAM:
+            # Mọi từ chứa `token` đều có `token` là một n-gram ký tự của nó
+            ids = self.grams.get(token, _EMPTY) if token else range(len(self.words))
+            return [self.words[i] for i in ids]
+        sets = sorted((self.grams.get(token[j:j + self.GRAM], _EMPTY) for j in range(len(token) - self.GRAM + 1)), key=len)
+        if len(sets[0]) * 4 > len(self.words):
+            # Phần lớn từ vựng đều khớp: giao các danh sách còn đắt hơn duyệt thẳng
+            return [word for word in self.words if token in word]
+        ids = sets[0]
+        for other in sets[1:]:
+            if ids.size == 0:
+                break
+            ids = np.intersect1d(ids, other, assume_unique=True)
+        return [word for word in (self.words[i] for i in ids.tolist()) if token in word]
+
+
+class NgramIndex:
+    """
+    Chỉ mục n-gram theo âm tiết trên văn bản đã chuẩn hóa, dùng để thu hẹp truy vấn cụm từ
+    (`phrase in text`) xuống một tập ứng viên nhỏ trước khi kiểm tra lại bằng so khớp chuỗi.
+
+    - `unigrams[tok]`, `bigrams[(a, b)]`: vị trí các văn bản chứa âm tiết / cặp âm tiết liền nhau
+    - Âm tiết ở hai đầu cụm từ có thể chỉ khớp một phần (hậu tố / tiền tố) nên chỉ các âm tiết
+      bên trong được tra trực tiếp; cụm ngắn thì mở rộng theo từ vựng.
+    """
+
+    def __init__(self, texts, unigrams=None, bigrams=None, fold=False):
+        self.texts = texts
+        # Chỉ mục bỏ dấu dùng chung `texts` với chỉ mục gốc, chỉ bỏ dấu các ứng viên khi kiểm tra lại
+        self.fold = fold
+        if unigrams is None:
+            unigrams, bigrams = self._build(texts)
+        self.unigrams = unigrams
+        self.bigrams = bigrams
+        self.vocab = _Vocabulary(unigrams)
+
+    @staticmethod
+    def _build(texts):
+        # Đánh số âm tiết rồi gom (khóa, vị trí) bằng numpy, tránh thao tác dict cho từng âm tiết
+        tokenized = [text.split() for text in texts]
+        lengths = [len(tokens) for tokens in tokenized]
+        tokens = [tok for toks in tokenized for tok in toks]
+        words = list(dict.fromkeys(tokens))
+        vocab = {tok: i for i, tok in enumerate(words)}
+        ids = np.fromiter(map(vocab.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+        positions = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+
+        size = max(1, len(words))
+        same_text = positions[1:] == positions[:-1]
+        pairs = ids[:-1][same_text] * size + ids[1:][same_text]
+        unigrams = _group(ids, positions, len(texts), lambda key: words[key])
+        bigrams = _group(pairs, positions[1:][same_text], len(texts), lambda key: (words[key // size], words[key % size]))
+        return unigrams, bigrams
+
+    def folded(self):
+        """Chỉ mục trên bản bỏ dấu, gộp từ vựng của chỉ mục hiện tại thay vì tách âm tiết lại toàn bộ văn bản."""
+        def merge(postings, fold_key):
+            groups = {}
+            for key, positions in postings.items():
+                groups.setdefault(fold_key(key), []).append(positions)
+            return {key: lists[0] if len(lists) == 1 else _sorted_unique(np.concatenate(lists)) for key, lists in groups.items()}
+
+        return NgramIndex(
+            self.texts,
+            unigrams=merge(self.unigrams, fold_diacritics),
+            bigrams=merge(self.bigrams, lambda pair: (fold_diacritics(pair[0]), fold_diacritics(pair[1]))),
+            fold=True,
+        )
+
+    def _union(self, words):
+        """Hợp (tăng dần) các danh sách vị trí của các âm tiết `words`."""
+        lists = [self.unigrams[word] for word in words]
+        if not lists:
+            return _EMPTY
+        return lists[0] if len(lists) == 1 else _sorted_unique(np.concatenate(lists))
+
+    def candidates(self, phrase: str) -> np.ndarray:
+        """Vị trí (tăng dần) các văn bản có thể chứa `phrase`; luôn là tập cha của kết quả đúng."""
+        tokens = phrase.split()
+        if not tokens:
+            return np.arange(len(self.texts), dtype=np.int32)
+        if len(tokens) == 1:
+            return self.containing(tokens[0])
+
+        inner = tokens[1:-1]
+        if inner:
+            sets = [self.unigrams.get(tok, _EMPTY) for tok in inner]
+            sets += [self.bigrams.get(pair, _EMPTY) for pair in zip(inner, inner[1:])]
+        else:
+            first, last = tokens
+            sets = [self._union(self.vocab.ending(first)), self._union(self.vocab.starting(last))]
+
+        sets.sort(key=len)
+        result = sets[0]
+        for postings in sets[1:]:
+            if result.size == 0:
+                break
+            result = np.intersect1d(result, postings, assume_unique=True)
+        return result
+
+    def matches(self, phrase: str, positions=None):
+        """Duyệt (tăng dần) vị trí các văn bản chứa đúng `phrase`; `positions` (mảng tăng dần) giới hạn phạm vi."""
+        candidates = self.candidates(phrase)
+        if positions is not None:
+            candidates = np.intersect1d(candidates, positions, assume_unique=True)
+        for pos in candidates.tolist():
+            text = fold_diacritics(self.texts[pos]) if self.fold else self.texts[pos]
+            if phrase in text:
+                yield pos
+
+    def containing(self, token: str) -> np.ndarray:
+        """Vị trí các văn bản có âm tiết chứa `token` (tương đương `token in text` với token không có khoảng trắng)."""
+        return self._union(self.vocab.containing(token))
@@ -0,0 +1,153 @@
+"""
+Backend ONNX Runtime cho embedding model (CPU), thay cho SentenceTransformer/PyTorch khi EMBED_BACKEND=onnx.
+
+Xuất model một lần (cần torch + sentence_transformers + onnxruntime):
+
+    python -m app.core.onnx_encoder --output models/vietnamese_embedding_onnx --quantize
+
+Thư mục xuất gồm tokenizer, cấu hình pooling/normalize của SentenceTransformer, `model.onnx`
+và (nếu --quantize) `model_int8.onnx` đã lượng tử hóa động int8.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from app.utils.logger import logger
+
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "models/vietnamese_embedding_onnx")
+ONNX_QUANTIZED = os.getenv("ONNX_QUANTIZED", "true").lower() == "true"
+# Số thread intra-op của ONNX Runtime; 0 = để ORT tự chọn theo số core vật lý
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model_int8.onnx"
+
+
+def _pooling_config(model_dir: str):
+    """Đọc cách pooling (cls/mean) và có Normalize hay không từ cấu hình SentenceTransformer đã lưu."""
+    pooling, normalize = "cls", False
+    pooling_file = os.path.join(model_dir, "1_Pooling", "config.json")
+    if os.path.exists(pooling_file):
+        with open(pooling_file, encoding="utf-8") as f:
+            config = json.load(f)
+        pooling = "mean" if config.get("pooling_mode_mean_tokens") else "cls"
+    modules_file = os.path.join(model_dir, "modules.json")
+    if os.path.exists(modules_file):
+        with open(modules_file, encoding="utf-8") as f:
+            normalize = any(m.get("type", "").endswith("Normalize") for m in json.load(f))
+    return pooling, normalize
+
+
+class OnnxEncoder:
+    """
+    Cùng giao diện `encode` với SentenceTransformer: str -> (d,), list -> (n, d), float32,
+    cùng cách pooling và chuẩn hóa như model gốc. Câu được sắp theo độ dài trước khi chia batch
+    để giảm padding.
+    """
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, quantized: bool = ONNX_QUANTIZED, threads: int = ONNX_THREADS):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_file = os.path.join(model_dir, QUANTIZED_MODEL_FILE if quantized else MODEL_FILE)
+        if not os.path.exists(model_file):
+            raise FileNotFoundError(
+                f"Không tìm thấy {model_file}, chạy: python -m app.core.onnx_encoder --output {model_dir}"
+                + (" --quantize" if quantized else "")
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.pooling, self.normalize = _pooling_config(model_dir)
+        self.max_seq_length = 512
+        logger.info(
+            "Nạp ONNX encoder {} | pooling={} | normalize={} | threads={}",
+            model_file, self.pooling, self.normalize, threads or "auto",
+        )
+
+    def _forward(self, texts):
+        tokens = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors="np"
+        )
+        feeds = {name: tokens[name].astype(np.int64) for name in self.input_names if name in tokens}
+        hidden = self.session.run(None, feeds)[0]
+        if self.pooling == "cls":
+            return hidden[:, 0]
+        mask = tokens["attention_mask"][..., None].astype(np.float32)
+        return (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        parts = []
+        for start in range(0, len(texts), batch_size):
+            parts.append(self._forward([texts[i] for i in order[start:start + batch_size]]))
+        embeddings = np.empty((len(texts), parts[0].shape[1]), dtype=np.float32)
+        embeddings[order] = np.concatenate(parts)
+
+        if self.normalize or normalize_embeddings:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings[0] if single else embeddings
+
+
+def export(output_dir: str, quantize: bool = False, opset: int = 17):
+    """Xuất transformer của SentenceTransformer sang ONNX (trục batch/seq động), tùy chọn lượng tử hóa int8."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from app.core.search import EMBED_MODEL_NAME
+
+    model = SentenceTransformer(EMBED_MODEL_NAME, device="cpu")
+    model.save(output_dir)
+    transformer = model[0].auto_model.eval()
+    sample = model.tokenizer(["Điều 1. Phạm vi điều chỉnh"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "seq"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "seq"}
+
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    logger.info("Xuất ONNX: {}", model_path)
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantized_path = os.path.join(output_dir, QUANTIZED_MODEL_FILE)
+        logger.info("Lượng tử hóa động int8: {}", quantized_path)
+        # Model fp32 lớn hơn 2GB nên trọng số nằm ở file external data
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8, use_external_data_format=True)
+    logger.info("✅ Đã xuất model vào {}", output_dir)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--output", default=ONNX_MODEL_DIR)
+    ap.add_argument("--quantize", action="store_true", help="Tạo thêm bản lượng tử hóa động int8")
+    ap.add_argument("--opset", type=int, default=17)
+    args = ap.parse_args(argv)
+    os.makedirs(args.output, exist_ok=True)
+    export(args.output, args.quantize, args.opset)
+
+
+if __name__ == "__main__":
+    main()
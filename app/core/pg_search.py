@@ -0,0 +1,471 @@
+"""
+Backend tìm kiếm chạy trong Postgres (SEARCH_BACKEND=postgres): tiến trình API không nạp chunks/vectors vào bộ nhớ,
+nhiều node dùng chung một chỉ mục.
+
+    keyword   cột sinh `tsv` (to_tsvector 'simple') + GIN, điểm như backend bộ nhớ; `tsv_folded` (bỏ dấu) cho truy vấn
+              không dấu; chỉ mục biểu thức theo số Điều trong title cho truy vấn "Điều N"
+    vector    pgvector: cột sinh `embedding vector(dim)` từ JSONB + HNSW (inner product) khi có extension;
+              nếu không, chỉ giữ ma trận float32 trong bộ nhớ và lấy text của top-k từ Postgres
+
+    SEARCH_BACKEND=postgres
+    PG_VECTOR=auto          auto | on (bắt buộc có pgvector) | off
+    PG_VECTOR_DIM=1024      số chiều cột embedding khi migrate (bằng số chiều model embedding)
+    PG_HNSW_M=16 / PG_HNSW_EF_CONSTRUCTION=64 / PG_HNSW_EF_SEARCH=100
+    PG_SEARCH_POOL_SIZE=8   số kết nối dùng chung giữa các thread của API
+    PG_VERSION_CHECK_S=2    chu kỳ đối chiếu phiên bản corpus với DB (tài liệu upload/xóa qua node khác)
+
+Cột/chỉ mục tạo một lần bằng `python -m scripts.pg_search_migrate` trước khi chạy API (ghi lại bảng chunks và dựng HNSW,
+có thể lâu); API chỉ kiểm tra chúng khi khởi động.
+Khác backend bộ nhớ: từ khóa khớp theo nguyên âm tiết (không khớp một phần âm tiết) và "Điều N" không lọc theo Chương.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import NamedTuple
+
+import numpy as np
+import psycopg2
+from psycopg2 import sql
+
+from app.core.legal_index import parse_legal_refs
+from app.core.ngram_index import FOLD_TABLE, fold_diacritics
+from app.core.search import (
+    FOLDED_STOP_WORDS, KEYWORD_FOLD_DIACRITICS, SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL, STOP_WORDS,
+    SearchEngine, load_embed_model, parse_article_date, top_k_indices,
+)
+from app.db.db_handler import PostgresHandler
+from app.utils.cache import TTLCache
+from app.utils.logger import logger
+from app.utils.metrics import timed, INDEXED_CHUNKS
+
+PG_VECTOR = os.getenv("PG_VECTOR", "auto").lower()
+PG_VECTOR_DIM = int(os.getenv("PG_VECTOR_DIM", "1024"))
+PG_HNSW_M = int(os.getenv("PG_HNSW_M", "16"))
+PG_HNSW_EF_CONSTRUCTION = int(os.getenv("PG_HNSW_EF_CONSTRUCTION", "64"))
+PG_HNSW_EF_SEARCH = int(os.getenv("PG_HNSW_EF_SEARCH", "100"))
+PG_SEARCH_POOL_SIZE = int(os.getenv("PG_SEARCH_POOL_SIZE", "8"))
+# Mỗi node đối chiếu phiên bản corpus với DB tối đa một lần trong khoảng này (giây)
+PG_VERSION_CHECK_S = float(os.getenv("PG_VERSION_CHECK_S", "2"))
+
+# Cùng bảng bỏ dấu với NgramIndex, dưới dạng translate() (IMMUTABLE, dùng được trong cột sinh)
+FOLD_FROM = "".join(chr(code) for code in FOLD_TABLE)
+FOLD_TO = "".join(FOLD_TABLE.values())
+# Số Điều trong title ("## Điều 12. ..."); cùng biểu thức với chỉ mục chunks_dieu_idx
+DIEU_EXPR = r"(substring(lower(title) from 'điều\s+(\d{1,6})'))::int"
+MIN_KEYWORD_SCORE = 0.2
+
+
+def migrate_search_schema(db: PostgresHandler, vector: str = PG_VECTOR, fold: bool = KEYWORD_FOLD_DIACRITICS,
+                          dim: int = PG_VECTOR_DIM) -> bool:
+    """
+    Tạo các cột sinh và chỉ mục tìm kiếm trên `chunks` (chạy một lần qua python -m scripts.pg_search_migrate, không chạy
+    khi API khởi động: ALTER TABLE ghi lại toàn bộ bảng). Chạy lại không đổi gì. Trả về True nếu có cột embedding/HNSW.
+    """
+    db.connect()
+    cursor = db.cursor
+    logger.info("Thêm cột tsv (full-text) cho bảng chunks nếu chưa có...")
+    cursor.execute("""
+        ALTER TABLE chunks ADD COLUMN IF NOT EXISTS tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', coalesce(markdown, ''))) STORED
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS chunks_tsv_idx ON chunks USING gin (tsv)")
+    if fold:
+        logger.info("Thêm cột tsv_folded (bỏ dấu) cho bảng chunks nếu chưa có...")
+        cursor.execute("""
+            ALTER TABLE chunks ADD COLUMN IF NOT EXISTS tsv_folded tsvector
+            GENERATED ALWAYS AS (to_tsvector('simple', translate(coalesce(markdown, ''), %s, %s))) STORED
+        """, (FOLD_FROM, FOLD_TO))
+        cursor.execute("CREATE INDEX IF NOT EXISTS chunks_tsv_folded_idx ON chunks USING gin (tsv_folded)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS chunks_dieu_idx ON chunks (({DIEU_EXPR}))")
+    db.conn.commit()
+
+    if vector == "off":
+        return False
+    try:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        db.conn.commit()
+    except psycopg2.Error as e:
+        db.conn.rollback()
+        if vector == "on":
+            raise
+        logger.warning("Không bật được pgvector ({}), vector search sẽ chấm điểm trong tiến trình", str(e).strip())
+        return False
+
+    existing = _embedding_dim(cursor)
+    if existing is not None and existing != dim:
+        logger.warning("Cột embedding đã có với {} chiều (yêu cầu {}), giữ nguyên", existing, dim)
+    logger.info("Thêm cột embedding vector({}) cho bảng chunks nếu chưa có...", dim)
+    # Vector khác số chiều bị bỏ qua (NULL) như SearchEngine._collect_vectors
+    cursor.execute(f"""
+        ALTER TABLE chunks ADD COLUMN IF NOT EXISTS embedding vector({dim})
+        GENERATED ALWAYS AS (
+            CASE WHEN jsonb_typeof(vector) <> 'array' THEN NULL
+                 WHEN jsonb_array_length(vector) = {dim} THEN (vector::text)::vector({dim}) END
+        ) STORED
+    """)
+    logger.info("Dựng chỉ mục HNSW nếu chưa có (m={}, ef_construction={})...", PG_HNSW_M, PG_HNSW_EF_CONSTRUCTION)
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS chunks_embedding_hnsw ON chunks USING hnsw (embedding vector_ip_ops)
+        WITH (m = {PG_HNSW_M}, ef_construction = {PG_HNSW_EF_CONSTRUCTION})
+    """)
+    db.conn.commit()
+    return True
+
+
+def _embedding_dim(cursor):
+    """Số chiều của cột chunks.embedding (typmod của kiểu vector); None nếu chưa có cột."""
+    cursor.execute("""
+        SELECT atttypmod FROM pg_attribute
+        WHERE attrelid = 'chunks'::regclass AND attname = 'embedding' AND NOT attisdropped
+    """)
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def check_search_schema(db: PostgresHandler, vector: str = PG_VECTOR, fold: bool = KEYWORD_FOLD_DIACRITICS,
+                        dim: int = None) -> bool:
+    """
+    Kiểm tra (chỉ đọc) các cột/chỉ mục do migrate_search_schema tạo; thiếu phần full-text thì báo lỗi.
+    Trả về True nếu dùng được pgvector: có cột embedding đúng `dim` chiều của model và chỉ mục HNSW.
+    """
+    db.connect()
+    cursor = db.cursor
+    cursor.execute("SELECT column_name FROM information_schema.columns WHERE table_name = 'chunks'")
+    columns = {row[0] for row in cursor.fetchall()}
+    missing = [column for column in ("tsv", "tsv_folded" if fold else None) if column and column not in columns]
+    if missing:
+        raise RuntimeError(f"Bảng chunks thiếu cột {', '.join(missing)}; chạy python -m scripts.pg_search_migrate trước")
+    if vector == "off":
+        return False
+
+    problem = None
+    if "embedding" not in columns:
+        problem = "chưa có cột embedding"
+    else:
+        column_dim = _embedding_dim(cursor)
+        cursor.execute("SELECT 1 FROM pg_indexes WHERE tablename = 'chunks' AND indexname = 'chunks_embedding_hnsw'")
+        if dim is not None and column_dim != dim:
+            problem = f"cột embedding có {column_dim} chiều, model có {dim}"
+        elif cursor.fetchone() is None:
+            problem = "chưa có chỉ mục chunks_embedding_hnsw"
+    db.conn.rollback()
+    if problem is None:
+        return True
+    if vector == "on":
+        raise RuntimeError(f"PG_VECTOR=on nhưng {problem}; chạy python -m scripts.pg_search_migrate")
+    logger.warning("Không dùng pgvector ({}), vector search chấm điểm trong tiến trình", problem)
+    return False
+
+
+def _corpus_version(articles: int, max_id: int) -> str:
+    """
+    Phiên bản corpus từ số bài và id bài lớn nhất: chunks chỉ được ghi cùng một bài mới (id tăng dần), nên thêm/xóa/thay
+    tài liệu đều đổi giá trị này. Mọi node đọc cùng DB có cùng phiên bản, cache của phiên bản cũ tự hết hiệu lực.
+    """
+    return f"{articles}:{max_id}"
+
+
+def _vector_literal(vector) -> str:
+    return "[" + ",".join(map(repr, np.asarray(vector, dtype=np.float32).tolist())) + "]"
+
+
+class PgSearchState(NamedTuple):
+    """Phần dữ liệu tìm kiếm nằm trong bộ nhớ của PgSearchEngine; như SearchState, refresh() thay cả bộ bằng một phép gán."""
+    articles: dict
+    # Chỉ dùng khi không có pgvector: (doc_id, chunk_id) và vector của từng hàng
+    vector_keys: np.ndarray
+    embeddings: np.ndarray
+    # "số bài:id bài lớn nhất" trong DB, xem _corpus_version
+    version: str
+
+
+class PgSearchEngine(SearchEngine):
+    """
+    Cùng giao diện với SearchEngine (vector_search / keyword_search / hybrid_search / batch_search, cache kết quả,
+    bộ lọc tài liệu), nhưng truy vấn chạy trong Postgres. Chỉ metadata articles (lọc theo tiêu đề/ngày) nằm trong bộ nhớ.
+    Không gọi SearchEngine.__init__ vì không nạp corpus; phần encode, cache và trộn hybrid được dùng lại.
+    """
+
+    def __init__(self, db=None, embed_model=None, vector: str = PG_VECTOR, pool_size: int = PG_SEARCH_POOL_SIZE,
+                 version_check_s: float = PG_VERSION_CHECK_S):
+        logger.info("Khởi tạo PgSearchEngine...")
+        self.db = db if db is not None else PostgresHandler()
+        self.embed_model = embed_model if embed_model is not None else load_embed_model()
+        self.state = PgSearchState(
+            articles={}, vector_keys=np.zeros((0, 2), dtype=np.int64), embeddings=np.zeros((0, 0), dtype=np.float32), version=None,
+        )
+        self.result_cache = TTLCache("search", maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+        self.query_cache = TTLCache("query_embedding", maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+        self.use_pgvector = check_search_schema(self.db, vector, dim=self._embedding_dim())
+        self.fold = KEYWORD_FOLD_DIACRITICS
+        self.pool = self.db.connection_pool(pool_size)
+        # ThreadedConnectionPool báo PoolError khi hết kết nối thay vì chờ; thread thứ pool_size + 1 chờ ở đây
+        self._pool_slots = threading.BoundedSemaphore(pool_size)
+        self._refresh_lock = threading.Lock()
+        self.version_check_s = version_check_s
+        self._checked_at = 0.0
+        self.refresh()
+
+    @contextmanager
+    def _cursor(self):
+        with self._pool_slots:
+            conn = self.pool.getconn()
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    yield cursor
+            finally:
+                self.pool.putconn(conn, close=bool(conn.closed))
+
+    def refresh(self):
+        """Nạp lại metadata articles và phiên bản corpus từ DB; chỉ mục nằm trong Postgres."""
+        with self._refresh_lock:
+            self._reload()
+
+    def _reload(self):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT id, title, date FROM articles")
+            rows = cursor.fetchall()
+            cursor.execute("SELECT count(*) FROM chunks")
+            total = cursor.fetchone()[0]
+        articles = {
+            doc_id: {"title": (title or "").casefold(), "date": parse_article_date(date)}
+            for doc_id, title, date in rows
+        }
+        vector_keys, embeddings = self.state.vector_keys, self.state.embeddings
+        if not self.use_pgvector:
+            vector_keys, embeddings = self._load_vectors()
+        version = _corpus_version(len(articles), max(articles, default=0))
+        self.state = PgSearchState(articles, vector_keys, embeddings, version)
+        self._checked_at = time.monotonic()
+        INDEXED_CHUNKS.set(total)
+        logger.info("PgSearchEngine sẵn sàng: {} bài viết, {} chunks | pgvector={} | corpus_version={}",
+                    len(articles), total, self.use_pgvector, version)
+
+    def _current_state(self):
+        """
+        Như SearchEngine, nhưng đối chiếu phiên bản corpus với DB (tối đa mỗi `version_check_s` giây): tài liệu được
+        upload/xóa qua node khác thì nạp lại. Thread khác đang nạp lại thì dùng tạm dữ liệu hiện có.
+        """
+        state = self.state
+        now = time.monotonic()
+        if now - self._checked_at < self.version_check_s:
+            return state
+        self._checked_at = now
+        with self._cursor() as cursor:
+            cursor.execute("SELECT count(*), coalesce(max(id), 0) FROM articles")
+            version = _corpus_version(*cursor.fetchone())
+        if version != state.version and self._refresh_lock.acquire(blocking=False):
+            try:
+                logger.info("Corpus trong DB đã đổi ({} -> {}), nạp lại", state.version, version)
+                self._reload()
+            finally:
+                self._refresh_lock.release()
+        return self.state
+
+    def _load_vectors(self, batch_size: int = 1000):
+        """(khóa (doc_id, chunk_id), ma trận vector) của mọi chunk có vector đúng số chiều model."""
+        keys, blocks, dim, dropped = [], [], self._embedding_dim(), 0
+        batch = []
+
+        def flush():
+            nonlocal dim, dropped
+            rows, block, dim, skipped = self._collect_vectors(batch, 0, dim)
+            dropped += skipped
+            if rows:
+                keys.extend((batch[row]["doc_id"], batch[row]["chunk_id"]) for row in rows)
+                blocks.append(block)
+            batch.clear()
+
+        for chunk in self.db.iter_chunks(include_vector=True, batch_size=batch_size):
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+        if dropped:
+            logger.warning("Bỏ qua {} chunks có vector khác {} chiều của model embedding", dropped, dim)
+        embeddings = np.concatenate(blocks) if blocks else np.zeros((0, dim or 0), dtype=np.float32)
+        return np.asarray(keys, dtype=np.int64).reshape(-1, 2), embeddings
+
+    @staticmethod
+    def _doc_filter(doc_ids, column: str = "doc_id"):
+        if doc_ids is None:
+            return sql.SQL(""), []
+        return sql.SQL(" AND {} = ANY(%s)").format(sql.Identifier(column)), [list(doc_ids)]
+
+    @staticmethod
+    def _row_hit(row, kind: str, score=None):
+        doc_id, chunk_id, title, markdown = row[:4]
+        return {
+            "doc_id": doc_id,
+            "chunk_id": chunk_id,
+            "title": title,
+            "content": markdown,
+            "score": float(row[4]) if score is None else score,
+            "type": kind,
+        }
+
+    def _vector_search(self, state, query: str, top_k=5, doc_ids=None):
+        logger.info("Thực hiện vector search (postgres): query='{}' | top_k={} | doc_ids={}", query, top_k, doc_ids)
+        if doc_ids is not None and not doc_ids:
+            return []
+        query_vec = self.encode_query(query)
+        if query_vec is None:
+            return []
+        if not self.use_pgvector:
+            return self._vector_search_local(state, query_vec[0], top_k, doc_ids)
+
+        literal = _vector_literal(query_vec[0])
+        if doc_ids is None:
+            # ef_search phải >= top_k, nếu không HNSW trả về ít hơn top_k kết quả; SET LOCAL không giữ lại
+            # trên kết nối trả về pool
+            query_sql = sql.SQL("""
+                SET LOCAL hnsw.ef_search = %s;
+                SELECT doc_id, chunk_id, title, markdown, -(embedding <#> %s::vector)
+                FROM chunks WHERE embedding IS NOT NULL
+                ORDER BY embedding <#> %s::vector LIMIT %s
+            """)
+            params = [min(1000, max(PG_HNSW_EF_SEARCH, top_k)), literal, literal, top_k]
+        else:
+            # Có lọc tài liệu: quét chính xác trên các chunk được chọn (HNSW lọc sau có thể thiếu kết quả)
+            query_sql = sql.SQL("""
+                WITH candidates AS MATERIALIZED (
+                    SELECT doc_id, chunk_id, title, markdown, embedding FROM chunks
+                    WHERE doc_id = ANY(%s) AND embedding IS NOT NULL
+                )
+                SELECT doc_id, chunk_id, title, markdown, -(embedding <#> %s::vector)
+                FROM candidates ORDER BY embedding <#> %s::vector LIMIT %s
+            """)
+            params = [list(doc_ids), literal, literal, top_k]
+        with self._cursor() as cursor:
+            cursor.execute(query_sql, params)
+            results = [self._row_hit(row, "vector") for row in cursor.fetchall()]
+        logger.info("Vector search trả về {} kết quả", len(results))
+        return results
+
+    def _vector_search_local(self, state, query_vec, top_k, doc_ids):
+        rows = None
+        if doc_ids is not None:
+            rows = np.flatnonzero(np.isin(state.vector_keys[:, 0], list(doc_ids)))
+        matrix = state.embeddings if rows is None else state.embeddings[rows]
+        if not len(matrix) or matrix.shape[1] != len(query_vec):
+            return []
+        scores = matrix @ np.asarray(query_vec, dtype=np.float32)
+        top = top_k_indices(scores, top_k)
+        keys = state.vector_keys[top if rows is None else rows[top]]
+        with self._cursor() as cursor:
+            cursor.execute("""
+                SELECT c.doc_id, c.chunk_id, c.title, c.markdown
+                FROM chunks c JOIN unnest(%s::int[], %s::int[]) AS k(doc_id, chunk_id) USING (doc_id, chunk_id)
+            """, (keys[:, 0].tolist(), keys[:, 1].tolist()))
+            rows_by_key = {(row[0], row[1]): row for row in cursor.fetchall()}
+        return [
+            self._row_hit(rows_by_key[(int(d), int(c))], "vector", float(score))
+            for (d, c), score in zip(keys, scores[top]) if (int(d), int(c)) in rows_by_key
+        ]
+
+    def _keyword_search(self, state, query: str, top_k: int = 5, doc_ids=None):
+        logger.info("Thực hiện keyword search (postgres): query='{}' | top_k={} | doc_ids={}", query, top_k, doc_ids)
+        if doc_ids is not None and not doc_ids:
+            return []
+        query_norm = self._normalize(query)
+        doc_filter, filter_params = self._doc_filter(doc_ids)
+        results = []
+        seen = set()
+
+        with self._cursor() as cursor:
+            # "Điều N": tra chỉ mục biểu thức theo số Điều trong title, điểm 1.0 như ArticleIndex
+            number = parse_legal_refs(query_norm)["dieu"]
+            if number is not None:
+                cursor.execute(
+                    sql.SQL("SELECT doc_id, chunk_id, title, markdown FROM chunks WHERE " + DIEU_EXPR + " = %s")
+                    + doc_filter + sql.SQL(" ORDER BY doc_id, chunk_id LIMIT %s"),
+                    [number, *filter_params, top_k],
+                )
+                for row in cursor.fetchall():
+                    seen.add((row[0], row[1]))
+                    results.append(self._row_hit(row, "keyword", 1.0))
+
+            # Truy vấn không dấu: so khớp trên cột bỏ dấu
+            column, stop_words = "tsv", STOP_WORDS
+            if self.fold and query_norm and fold_diacritics(query_norm) == query_norm:
+                column, stop_words = "tsv_folded", FOLDED_STOP_WORDS
+            keywords = [kw for kw in query_norm.split() if kw not in stop_words]
+            if len(results) < top_k and query_norm:
+                results.extend(self._ranked_matches(cursor, column, query_norm, keywords, doc_filter,
+                                                    filter_params, top_k + len(seen), seen))
+
+        logger.info("Keyword search trả về {} kết quả", len(results))
+        return sorted(results, key=lambda r: r["score"], reverse=True)[:top_k]
+
+    @staticmethod
+    def _ranked_matches(cursor, column, phrase, keywords, doc_filter, filter_params, limit, seen):
+        """
+        Chunk chứa đúng cụm từ: điểm 1.0 (đứng trước chunk chỉ đủ từ khóa); còn lại: tỉ lệ từ khóa có mặt (>= 0.2)
+        như backend bộ nhớ, cùng điểm thì theo (doc_id, chunk_id). Mỗi từ khóa là một lần quét GIN chỉ lấy khóa chunk, chỉ đọc
+        markdown của top `limit`.
+        """
+        col = sql.Identifier(column)
+        keyword_hits = sql.SQL(" UNION ALL ").join(
+            [sql.SQL("SELECT doc_id, chunk_id FROM chunks WHERE {} @@ plainto_tsquery('simple', %s)").format(col)
+             + doc_filter] * len(keywords)
+        ) if keywords else sql.SQL("SELECT doc_id, chunk_id FROM chunks WHERE false")
+        # Planner đánh giá thấp chi phí @@ khi quét tuần tự nên chọn seq scan với từ phổ biến (chậm hơn ~20 lần
+        # bitmap scan trên GIN). SET LOCAL chỉ có hiệu lực trong transaction ngầm của chuỗi lệnh này.
+        query = sql.SQL("""
+            SET LOCAL enable_seqscan = off;
+            WITH counts AS (
+                SELECT doc_id, chunk_id, count(*) AS n FROM ({keyword_hits}) hits GROUP BY doc_id, chunk_id
+            ), phrase AS (
+                SELECT doc_id, chunk_id FROM chunks WHERE {col} @@ phraseto_tsquery('simple', %s){doc_filter}
+            ), ranked AS (
+                SELECT doc_id, chunk_id,
+                       CASE WHEN phrase.doc_id IS NOT NULL THEN 1.0
+                            ELSE round(counts.n::numeric / %s, 2) END AS score,
+                       phrase.doc_id IS NOT NULL AS is_phrase
+                FROM counts FULL JOIN phrase USING (doc_id, chunk_id)
+            ), top AS (
+                SELECT doc_id, chunk_id, score, is_phrase FROM ranked WHERE score >= %s
+                ORDER BY score DESC, is_phrase DESC, doc_id, chunk_id LIMIT %s
+            )
+            SELECT doc_id, chunk_id, c.title, c.markdown, top.score
+            FROM top JOIN chunks c USING (doc_id, chunk_id)
+            ORDER BY top.score DESC, top.is_phrase DESC, doc_id, chunk_id
+        """).format(keyword_hits=keyword_hits, col=col, doc_filter=doc_filter)
+        params = [param for kw in keywords for param in (kw, *filter_params)]
+        params += [phrase, *filter_params, max(1, len(keywords)), MIN_KEYWORD_SCORE, limit]
+        cursor.execute(query, params)
+        return [
+            PgSearchEngine._row_hit(row, "keyword", float(row[4]))
+            for row in cursor.fetchall() if (row[0], row[1]) not in seen
+        ]
+
+    @timed("batch_search")
+    def batch_search(self, queries: list):
+        """Encode chung một batch các truy vấn vector/hybrid (đưa vào cache embedding) rồi tìm lần lượt."""
+        logger.info("Thực hiện batch search (postgres): {} truy vấn", len(queries))
+        for q in queries:
+            if q["mode"] not in ("vector", "keyword", "hybrid"):
+                raise ValueError(f"mode '{q['mode']}' không hợp lệ")
+
+        pending = list(dict.fromkeys(
+            q["query"] for q in queries if q["mode"] != "keyword" and self.query_cache.get(q["query"]) is None
+        ))
+        if pending:
+            embeddings = self.encode_queries(pending)
+            if embeddings is not None:
+                for text, embedding in zip(pending, embeddings):
+                    self.query_cache.put(text, embedding.reshape(1, -1))
+
+        state = self._current_state()
+        results = []
+        for q in queries:
+            top_k, doc_ids = q.get("top_k", 5), q.get("doc_ids")
+            if q["mode"] == "vector":
+                results.append(self._vector(state, q["query"], top_k, doc_ids))
+            elif q["mode"] == "keyword":
+                results.append(self._keyword(state, q["query"], top_k, doc_ids))
+            else:
+                results.append(self._hybrid(state, q["query"], top_k, q.get("alpha", 0.6), doc_ids))
+        return results
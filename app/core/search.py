@@ -1,135 +1,497 @@
 import numpy as np
+import os
 import re
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import NamedTuple
+from app.core.chunk_store import ChunkStore, ChunkStoreBuilder, TextColumn, encode
+from app.core.index_snapshot import is_snapshot, load_snapshot
+from app.core.legal_index import ArticleIndex, parse_legal_refs
+from app.core.ngram_index import NgramIndex, fold_diacritics
+from app.utils.cache import TTLCache
 from app.db.db_handler import PostgresHandler 
-from app.utils.logger import logger  
+from app.utils.logger import logger, should_log
+from app.utils.metrics import timed, INDEXED_CHUNKS
+
+EMBED_MODEL_NAME = "AITeamVN/Vietnamese_Embedding"
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "600"))
+# Truy vấn gõ không dấu được so khớp trên văn bản đã bỏ dấu
+KEYWORD_FOLD_DIACRITICS = os.getenv("KEYWORD_FOLD_DIACRITICS", "true").lower() == "true"
+# Vector search chia ma trận embeddings thành N shard chấm điểm song song (1 = tắt); chỉ áp dụng từ MIN_ROWS hàng
+VECTOR_SHARDS = int(os.getenv("VECTOR_SHARDS", "1"))
+VECTOR_SHARD_MIN_ROWS = int(os.getenv("VECTOR_SHARD_MIN_ROWS", "50000"))
+# memory: nạp corpus vào tiến trình (mặc định) | postgres: truy vấn trong Postgres (app.core.pg_search)
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "memory").lower()
+SEARCH_BACKENDS = ("memory", "postgres")
+# Thư mục snapshot chỉ mục (python -m scripts.corpus_bundle snapshot ...); có thì nạp lúc khởi động thay cho DB
+SEARCH_SNAPSHOT = os.getenv("SEARCH_SNAPSHOT", "")
+
+STOP_WORDS = {
+    "tôi", "là", "cho", "hay", "xin", "biết", "giúp", "với", "làm", "có", "bạn",
+    "của", "ở", "và", "hoặc", "nhé", "thì", "đó", "này", "nào", "cái", "vậy", "ra",
+    "đi", "được", "sao", "ai", "đâu", "đây", "gì", "hả", "không", "như", "nha", "nhưng"
+}
+FOLDED_STOP_WORDS = {fold_diacritics(w) for w in STOP_WORDS}
+
+
+def load_embed_model(backend: str = None):
+    """Model embedding theo EMBED_BACKEND: torch (SentenceTransformer) hoặc onnx (ONNX Runtime, xem app.core.onnx_encoder)."""
+    backend = (backend or EMBED_BACKEND).lower()
+    if backend == "onnx":
+        from app.core.onnx_encoder import OnnxEncoder
+        return OnnxEncoder()
+    # Import muộn: sentence_transformers/torch mất vài giây để import
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBED_MODEL_NAME)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Chỉ số của k điểm cao nhất, giảm dần theo điểm (bằng điểm thì chỉ số nhỏ đứng trước)."""
+    k = min(k, scores.size)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.lexsort((top, -scores[top]))]
+
+
+def sharded_top_k(matrix: np.ndarray, query: np.ndarray, top_k: int, pool, n_shards: int):
+    """
+    Scatter-gather: mỗi shard là một khoảng hàng liền nhau của `matrix` (view, không sao chép),
+    chấm điểm và lấy top-k cục bộ trong một thread của `pool` (numpy nhả GIL khi nhân ma trận);
+    sau đó gộp các top-k cục bộ thành top-k toàn cục. Trả về (chỉ số hàng, điểm).
+    """
+    bounds = np.linspace(0, len(matrix), n_shards + 1).astype(np.int64)
+
+    def shard(i):
+        start, end = bounds[i], bounds[i + 1]
+        scores = matrix[start:end] @ query
+        if scores.size == 0:
+            return np.zeros(0, dtype=np.int64), scores
+        top = top_k_indices(scores, top_k)
+        return top + start, scores[top]
+
+    parts = list(pool.map(shard, range(n_shards)))
+    rows = np.concatenate([p[0] for p in parts])
+    scores = np.concatenate([p[1] for p in parts])
+    order = np.lexsort((rows, -scores))[:top_k]
+    return rows[order], scores[order]
+
+
+DATE_PATTERNS = (
+    (re.compile(r"ngày\s+(\d{1,2})\s+tháng\s+(\d{1,2})\s+năm\s+(\d{4})", re.IGNORECASE), (3, 2, 1)),
+    (re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})"), (1, 2, 3)),
+    (re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})"), (3, 2, 1)),
+)
+
+
+def parse_article_date(text):
+    """Đọc ngày của article ('ngày 05 tháng 11 năm 2025', '2025-11-05' hoặc '05/11/2025'); None nếu không đọc được."""
+    if not text:
+        return None
+    for pattern, (y, m, d) in DATE_PATTERNS:
+        match = pattern.search(str(text))
+        if match:
+            try:
+                return date(int(match.group(y)), int(match.group(m)), int(match.group(d)))
+            except ValueError:
+                return None
+    return None
+
+
+class SearchState(NamedTuple):
+    """
+    Dữ liệu tìm kiếm của một lần nạp corpus, không sửa sau khi dựng. Nạp lại thì dựng bản mới và thay bằng một phép gán,
+    mỗi truy vấn đọc `engine.state` một lần nên không thấy nửa cũ nửa mới.
+    """
+    store: ChunkStore
+    embeddings: np.ndarray
+    vector_rows: np.ndarray
+    # doc_id -> (start, end) trong store; chunks của một tài liệu luôn nằm liền nhau
+    doc_ranges: dict
+    articles: dict
+    article_index: ArticleIndex
+    text_index: NgramIndex
+    folded_index: NgramIndex
+    # Tăng mỗi lần nạp lại corpus (upload/xóa); là một phần khóa cache nên kết quả cũ tự hết hiệu lực
+    version: int
+
 
 class SearchEngine:
-    def __init__(self):
+    def __init__(self, db=None, embed_model=None, snapshot=SEARCH_SNAPSHOT):
+        """
+        `db` và `embed_model` có thể truyền vào (vd. bản in-memory/fake khi benchmark).
+        `snapshot`: thư mục snapshot chỉ mục dùng cho lần nạp đầu nếu khớp với DB; `refresh()` luôn nạp lại từ DB.
+        """
         logger.info("Khởi tạo SearchEngine...")
-        self.db = PostgresHandler()
-        self.embed_model = SentenceTransformer("AITeamVN/Vietnamese_Embedding")
+        self.db = db if db is not None else PostgresHandler()
+        self.embed_model = embed_model if embed_model is not None else load_embed_model()
 
-        self.all_chunks = []
+        self.state = SearchState(
+            store=ChunkStore(), embeddings=np.zeros((0, 0), dtype=np.float32), vector_rows=np.zeros(0, dtype=np.int64),
+            doc_ranges={}, articles={}, article_index=ArticleIndex(), text_index=NgramIndex([]), folded_index=None, version=0,
+        )
+        self.result_cache = TTLCache("search", maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+        # Embedding chỉ phụ thuộc câu truy vấn (không phụ thuộc corpus); /chat và vector search dùng chung
+        self.query_cache = TTLCache("query_embedding", maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+        self.shard_pool = ThreadPoolExecutor(VECTOR_SHARDS, thread_name_prefix="vector-shard") if VECTOR_SHARDS > 1 else None
+        # refresh() chạy trong threadpool của API; các lần nạp lại dùng chung cursor của self.db nên phải tuần tự
+        self._refresh_lock = threading.Lock()
+        if not (is_snapshot(snapshot) and self._load_snapshot(snapshot)):
+            self._load_chunks()
+        logger.info("Tổng số chunks được nạp vào bộ tìm kiếm: {}", len(self.state.store))
+
+    @property
+    def corpus_version(self):
+        return self._current_state().version
+
+    def _current_state(self):
+        """Dữ liệu tìm kiếm hiện hành, đọc một lần cho mỗi truy vấn."""
+        return self.state
+
+    def _load_chunks(self):
+        builder = ChunkStoreBuilder()
+        doc_ranges = {}
+        article_meta = {}
+        rows, blocks, dim, dropped = [], [], self._embedding_dim(), 0
+        normalized = []
         articles = self.db.fetch_all_articles()
         logger.info("Đã load {} bài viết từ database", len(articles))
 
+        # Xử lý từng bài: vector chuyển ngay sang float32, text mã hóa vào kho, dict của psycopg2 bỏ sau mỗi vòng
         for article in articles:
             chunks = self.db.fetch_chunks_by_doc_id(article["id"])
-            logger.debug("Bài viết id={} có {} chunks", article["id"], len(chunks))
-            self.all_chunks.extend(chunks)
+            if should_log("search.load_article"):
+                logger.debug("Bài viết id={} có {} chunks", article["id"], len(chunks))
+            start = len(builder)
+            doc_ranges[article["id"]] = (start, start + len(chunks))
+            article_meta[article["id"]] = {
+                "title": (article.get("title") or "").casefold(),
+                "date": parse_article_date(article.get("date")),
+            }
+            article_rows, block, dim, skipped = self._collect_vectors(chunks, start, dim)
+            dropped += skipped
+            if article_rows:
+                rows.extend(article_rows)
+                blocks.append(block)
+            builder.extend(chunks)
+            normalized.extend(encode(self._normalize(chunk["markdown"])) for chunk in chunks)
 
-        logger.info("Tổng số chunks được nạp vào bộ tìm kiếm: {}", len(self.all_chunks))
+        if dropped:
+            logger.warning("Bỏ qua {} chunks có vector khác {} chiều của model embedding", dropped, dim)
+        embeddings = np.concatenate(blocks) if blocks else np.zeros((0, dim or 0), dtype=np.float32)
+        self._install(builder.build(), embeddings, np.asarray(rows, dtype=np.int64), doc_ranges, article_meta, normalized)
 
+    @timed("search.load_snapshot")
+    def _load_snapshot(self, directory: str) -> bool:
+        """
+        Nạp snapshot nếu dấu vết corpus của nó khớp với DB và vector cùng số chiều với model embedding;
+        False nếu không (DB đã đổi sau khi dựng snapshot, hoặc snapshot dựng với số chiều khác).
+        """
+        snapshot = load_snapshot(directory)
+        current = self.db.corpus_fingerprint()
+        if snapshot["fingerprint"] is None or snapshot["fingerprint"] != current:
+            logger.warning("Snapshot {} không khớp DB (snapshot: {}, DB: {}), nạp lại từ DB", directory, snapshot["fingerprint"], current)
+            return False
+        dim = self._embedding_dim()
+        if len(snapshot["embeddings"]) and snapshot["dim"] != dim:
+            # Như _collect_vectors: mọi vector khác số chiều model đều vô dụng, vector search sẽ không trả gì
+            logger.warning("Snapshot {} có vector {} chiều, model embedding {} chiều; nạp lại từ DB", directory, snapshot["dim"], dim)
+            return False
+        store = snapshot["store"]
+        doc_ranges, article_meta = {}, {}
+        for article in snapshot["articles"]:
+            doc_ranges[article["id"]] = (article["start"], article["end"])
+            article_meta[article["id"]] = {
+                "title": (article.get("title") or "").casefold(),
+                "date": parse_article_date(article.get("date")),
+            }
+        normalized = (encode(self._normalize(markdown)) for markdown in store.markdowns)
+        self._install(store, snapshot["embeddings"], snapshot["vector_rows"], doc_ranges, article_meta, normalized)
+        logger.info("Đã nạp snapshot chỉ mục từ {}: {} bài viết, {} vectors", directory, len(doc_ranges), len(snapshot["vector_rows"]))
+        return True
+
+    def _install(self, store, embeddings, vector_rows, doc_ranges, article_meta, normalized):
+        """
+        Dựng các chỉ mục phụ rồi thay toàn bộ dữ liệu tìm kiếm bằng một phép gán `self.state`;
+        `normalized`: markdown đã chuẩn hóa, mã hóa UTF-8.
+        """
+        text_index = NgramIndex(TextColumn.from_encoded(normalized))
+        self.state = SearchState(
+            store=store,
+            embeddings=embeddings,
+            vector_rows=vector_rows,
+            doc_ranges=doc_ranges,
+            articles=article_meta,
+            article_index=ArticleIndex.build(store, doc_ranges),
+            text_index=text_index,
+            folded_index=text_index.folded() if KEYWORD_FOLD_DIACRITICS else None,
+            version=self.state.version + 1,
+        )
+        INDEXED_CHUNKS.set(len(store))
+
+    def _embedding_dim(self):
+        """Số chiều vector của model embedding (hỏi model, nếu không có thì encode thử một câu); None nếu không rõ."""
+        get_dim = getattr(self.embed_model, "get_sentence_embedding_dimension", None)
+        dim = get_dim() if callable(get_dim) else getattr(self.embed_model, "dim", None)
+        if dim:
+            return int(dim)
+        probe = self.encode_query("điều")
+        return probe.shape[1] if probe is not None else None
+
+    @staticmethod
+    def _collect_vectors(chunks, start, dim):
+        """
+        Vector của các chunks trong một bài dưới dạng ma trận float32, kèm vị trí trong kho (bắt đầu từ `start`).
+        `dim` là số chiều của model embedding (None: lấy theo vector hợp lệ đầu tiên); vector khác số chiều
+        (vd. embedding của model cũ) bị bỏ qua. Trả về (vị trí, ma trận, dim, số vector bị bỏ qua).
+        """
+        rows, vectors, dropped = [], [], 0
+        for offset, chunk in enumerate(chunks):
+            vector = chunk.get("vector")
+            if not vector or not isinstance(vector, list):
+                continue
+            if dim is None:
+                dim = len(vector)
+            if len(vector) != dim:
+                dropped += 1
+                if should_log("search.vector_dim"):
+                    logger.warning("Bỏ qua chunk_id={} vì vector có {} chiều (kỳ vọng {})", chunk.get("chunk_id"), len(vector), dim)
+                continue
+            rows.append(start + offset)
+            vectors.append(vector)
+        block = np.asarray(vectors, dtype=np.float32) if vectors else None
+        return rows, block, dim, dropped
+
+    @timed("encode_query")
     def encode_query(self, query: str):
+        embedding = self.query_cache.get(query)
+        if embedding is not None:
+            return embedding
         try:
             embedding = self.embed_model.encode(query).reshape(1, -1)
             logger.debug("Vector hóa truy vấn thành công")
+            self.query_cache.put(query, embedding)
             return embedding
         except Exception as e:
             logger.exception("Lỗi khi vector hóa truy vấn: {}", e)
             return None
 
+    @timed("encode_queries")
+    def encode_queries(self, queries: list):
+        """Vector hóa nhiều truy vấn trong một lượt forward của model, trả về ma trận (q, d)."""
+        try:
+            embeddings = np.asarray(self.embed_model.encode(list(queries)), dtype=np.float32)
+            return embeddings.reshape(len(queries), -1)
+        except Exception as e:
+            logger.exception("Lỗi khi vector hóa {} truy vấn: {}", len(queries), e)
+            return None
+
     def _normalize(self, text: str) -> str:
         return re.sub(r"[^\w\s]", "", text.lower()).strip()
 
-    def vector_search(self, query: str, top_k=5):
-        logger.info("Thực hiện vector search: query='{}' | top_k={}", query, top_k)
+    def resolve_doc_ids(self, doc_ids=None, title=None, date_from=None, date_to=None):
+        """
+        Quy đổi bộ lọc (doc_ids, title chứa chuỗi, khoảng ngày) thành tuple doc_id đã sắp xếp.
+        Trả về None khi không có bộ lọc nào (tìm trên toàn corpus).
+        """
+        if doc_ids is None and not title and date_from is None and date_to is None:
+            return None
+        articles = self._current_state().articles
+        candidates = articles.keys() if doc_ids is None else [d for d in doc_ids if d in articles]
+        title = title.casefold() if title else None
+        selected = []
+        for doc_id in candidates:
+            meta = articles[doc_id]
+            if title and title not in meta["title"]:
+                continue
+            if date_from is not None or date_to is not None:
+                if meta["date"] is None:
+                    continue
+                if date_from is not None and meta["date"] < date_from:
+                    continue
+                if date_to is not None and meta["date"] > date_to:
+                    continue
+            selected.append(doc_id)
+        return tuple(sorted(set(selected)))
+
+    @staticmethod
+    def _chunk_ranges(state, doc_ids):
+        return [state.doc_ranges[d] for d in doc_ids if d in state.doc_ranges]
+
+    def _candidate_positions(self, state, doc_ids):
+        """Vị trí trong kho chunks (mảng tăng dần) của các tài liệu được chọn; None = toàn corpus."""
+        if doc_ids is None:
+            return None
+        ranges = [np.arange(start, end, dtype=np.int32) for start, end in sorted(self._chunk_ranges(state, doc_ids))]
+        return np.concatenate(ranges) if ranges else np.zeros(0, dtype=np.int32)
+
+    def _candidate_rows(self, state, doc_ids):
+        """Chỉ số hàng trong ma trận embeddings của các tài liệu được chọn; None = mọi hàng."""
+        if doc_ids is None:
+            return None
+        ranges = []
+        for start, end in self._chunk_ranges(state, doc_ids):
+            lo, hi = np.searchsorted(state.vector_rows, (start, end))
+            if hi > lo:
+                ranges.append(np.arange(lo, hi))
+        return np.concatenate(ranges) if ranges else np.zeros(0, dtype=np.int64)
+
+    def _cached(self, state, kind: str, key: tuple, compute):
+        """Tra cache theo (kind, phiên bản corpus của `state`, *key); không cache kết quả rỗng (vd. lỗi encode)."""
+        cache_key = (kind, state.version) + key
+        results = self.result_cache.get(cache_key)
+        if results is None:
+            results = compute()
+            if results:
+                self.result_cache.put(cache_key, results)
+        return results
+
+    @timed("vector_search")
+    def vector_search(self, query: str, top_k=5, doc_ids=None):
+        return self._vector(self._current_state(), query, top_k, doc_ids)
+
+    def _vector(self, state, query, top_k, doc_ids):
+        return self._cached(
+            state, "vector", (query.strip(), top_k, doc_ids), lambda: self._vector_search(state, query, top_k, doc_ids)
+        )
+
+    def _vector_search(self, state, query: str, top_k=5, doc_ids=None):
+        logger.info("Thực hiện vector search: query='{}' | top_k={} | doc_ids={}", query, top_k, doc_ids)
+        rows = self._candidate_rows(state, doc_ids)
+        if rows is not None and rows.size == 0:
+            return []
+        embeddings = state.embeddings
+        if embeddings.size == 0:
+            return []
         query_vec = self.encode_query(query)
-        if query_vec is None:
+        if query_vec is None or query_vec.shape[1] != embeddings.shape[1]:
             return []
 
-        results = []
-        for chunk in self.all_chunks:
-            vector = chunk.get("vector")
-            if not vector or not isinstance(vector, list):
-                continue
+        if rows is None and self.shard_pool is not None and len(embeddings) >= VECTOR_SHARD_MIN_ROWS:
+            hit_rows, scores = sharded_top_k(
+                embeddings, np.asarray(query_vec[0], dtype=np.float32), top_k, self.shard_pool, VECTOR_SHARDS
+            )
+            results = self._rows_to_hits(state, hit_rows, scores)
+        else:
+            results = self._vector_hits(state, self._score(state, query_vec, rows)[0], top_k, rows)
+        logger.info("Vector search trả về {} kết quả", len(results))
+        return results
 
-            try:
-                
-                score = query_vec @ np.array(vector).T
-                results.append({
-                    "doc_id": chunk["doc_id"],
-                    "chunk_id": chunk["chunk_id"],
-                    "title": chunk["title"],
-                    "content": chunk["markdown"],
-                    "score": score[0],
-                    "type": "vector"
-                })
-            except Exception as e:
-                logger.warning("Lỗi khi tính cosine: chunk_id={} | {}", chunk.get("chunk_id"), e)
+    @staticmethod
+    def _score(state, query_vecs, rows=None) -> np.ndarray:
+        """Điểm (tích vô hướng) của các truy vấn với các chunk: (q, d) @ (d, n) -> (q, n); `rows` giới hạn số hàng."""
+        query_vecs = np.asarray(query_vecs, dtype=np.float32)
+        matrix = state.embeddings if rows is None else state.embeddings[rows]
+        if matrix.size == 0 or query_vecs.shape[1] != matrix.shape[1]:
+            # Corpus chưa có vector (hoặc khác số chiều model): không chunk nào có điểm
+            return np.zeros((len(query_vecs), 0), dtype=np.float32)
+        return query_vecs @ matrix.T
 
-        logger.info("Vector search trả về {} kết quả", len(results))
-        return sorted(results, key=lambda x: x["score"], reverse=True)[:top_k]
+    def _vector_hits(self, state, scores: np.ndarray, top_k: int, rows=None):
+        if scores.size == 0:
+            return []
+        top = top_k_indices(scores, top_k)
+        return self._rows_to_hits(state, top if rows is None else rows[top], scores[top])
+
+    def _rows_to_hits(self, state, rows, scores):
+        """Kết quả vector search từ chỉ số hàng trong ma trận embeddings và điểm tương ứng."""
+        return [self._hit(state, state.vector_rows[row], float(score), "vector") for row, score in zip(rows, scores)]
 
-    def keyword_search(self, query: str, top_k: int = 5):
-        logger.info("Thực hiện keyword search: query='{}' | top_k={}", query, top_k)
+    @staticmethod
+    def _hit(state, pos, score, kind):
+        """Dựng kết quả cho chunk ở vị trí `pos`; text chỉ được giải mã ở đây, cho các chunk được trả về."""
+        chunk = state.store[pos]
+        return {
+            "doc_id": chunk.doc_id,
+            "chunk_id": chunk.chunk_id,
+            "title": chunk.title,
+            "content": chunk.markdown,
+            "score": score,
+            "type": kind
+        }
+
+    @timed("keyword_search")
+    def keyword_search(self, query: str, top_k: int = 5, doc_ids=None):
+        return self._keyword(self._current_state(), query, top_k, doc_ids)
+
+    def _keyword(self, state, query, top_k, doc_ids):
+        return self._cached(
+            state, "keyword", (query.strip(), top_k, doc_ids), lambda: self._keyword_search(state, query, top_k, doc_ids)
+        )
+
+    def _keyword_search(self, state, query: str, top_k: int = 5, doc_ids=None):
+        logger.info("Thực hiện keyword search: query='{}' | top_k={} | doc_ids={}", query, top_k, doc_ids)
+        positions = self._candidate_positions(state, doc_ids)
         results = []
+        seen = set()
         query_norm = self._normalize(query)
-        dieu_match = re.search(r"điều\s+(\d+)", query_norm)
-
-        if dieu_match:
-            dieu_query = f"{dieu_match.group(0)}"
-            for chunk in self.all_chunks:
-                content_norm = self._normalize(chunk["markdown"])
-                if dieu_query in content_norm:
-                    results.append({
-                        "doc_id": chunk["doc_id"],
-                        "chunk_id": chunk["chunk_id"],
-                        "title": chunk["title"],
-                        "content": chunk["markdown"],
-                        "score": 1.0,
-                        "type": "keyword"
-                    })
-        if len(results) < top_k:
-            for chunk in self.all_chunks:
-                content_norm = self._normalize(chunk["markdown"])
-                if query_norm in content_norm:
-                    key = (chunk["doc_id"], chunk["chunk_id"])
-                    if key not in {(r["doc_id"], r["chunk_id"]) for r in results}:
-                        results.append({
-                            "doc_id": chunk["doc_id"],
-                            "chunk_id": chunk["chunk_id"],
-                            "title": chunk["title"],
-                            "content": chunk["markdown"],
-                            "score": 1.0,
-                            "type": "keyword"
-                        })
+
+        def add(pos, score):
+            seen.add(pos)
+            results.append((pos, score))
+
+        # "Điều N" (kèm Chương nếu có): tra thẳng chỉ mục, đúng Điều được hỏi đứng đầu
+        for pos in state.article_index.lookup(parse_legal_refs(query_norm), doc_ids):
+            add(pos, 1.0)
+
+        # Truy vấn không dấu: so khớp trên bản bỏ dấu của corpus
+        index, stop_words = state.text_index, STOP_WORDS
+        if state.folded_index is not None and query_norm and fold_diacritics(query_norm) == query_norm:
+            index, stop_words = state.folded_index, FOLDED_STOP_WORDS
 
         if len(results) < top_k:
-            stop_words = {
-                "tôi", "là", "cho", "hay", "xin", "biết", "giúp", "với", "làm", "có", "bạn",
-                "của", "ở", "và", "hoặc", "nhé", "thì", "đó", "này", "nào", "cái", "vậy", "ra",
-                "đi", "được", "sao", "ai", "đâu", "đây", "gì", "hả", "không", "như", "nha", "nhưng"
-            }
+            # Mọi kết quả tới đây đều có điểm 1.0 nên đủ top_k là dừng được
+            for pos in index.matches(query_norm, positions):
+                if len(results) >= top_k:
+                    break
+                if pos not in seen:
+                    add(pos, 1.0)
 
+        if len(results) < top_k:
+            # Mỗi từ khóa chỉ xét các chunk có âm tiết chứa nó, không quét toàn corpus
             keywords = [kw for kw in query_norm.split() if kw not in stop_words]
-            for chunk in self.all_chunks:
-                key = (chunk["doc_id"], chunk["chunk_id"])
-                if key in {(r["doc_id"], r["chunk_id"]) for r in results}:
+            counts = {}
+            for kw in keywords:
+                matched = index.containing(kw)
+                if positions is not None:
+                    matched = np.intersect1d(matched, positions, assume_unique=True)
+                for pos in matched.tolist():
+                    counts[pos] = counts.get(pos, 0) + 1
+            for pos in sorted(counts):
+                if pos in seen:
                     continue
-                content_norm = self._normalize(chunk["markdown"])
-                match_score = sum(1 for kw in keywords if kw in content_norm) / max(1, len(keywords))
+                match_score = counts[pos] / max(1, len(keywords))
                 if match_score >= 0.2:
-                    results.append({
-                        "doc_id": chunk["doc_id"],
-                        "chunk_id": chunk["chunk_id"],
-                        "title": chunk["title"],
-                        "content": chunk["markdown"],
-                        "score": round(match_score, 2),
-                        "type": "keyword"
-                    })
+                    add(pos, round(match_score, 2))
 
         logger.info("Keyword search trả về {} kết quả", len(results))
-        return sorted(results, key=lambda x: x["score"], reverse=True)[:top_k]
+        top = sorted(results, key=lambda x: x[1], reverse=True)[:top_k]
+        return [self._hit(state, pos, score, "keyword") for pos, score in top]
+
+    @timed("hybrid_search")
+    def hybrid_search(self, query: str, top_k=5, alpha=0.6, doc_ids=None):
+        return self._hybrid(self._current_state(), query, top_k, alpha, doc_ids)
 
-    def hybrid_search(self, query: str, top_k=5, alpha=0.6):
-        logger.info("Thực hiện hybrid search: query='{}' | top_k={} | alpha={}", query, top_k, alpha)
+    def _hybrid(self, state, query, top_k, alpha, doc_ids):
+        return self._cached(
+            state, "hybrid", (query.strip(), top_k, alpha, doc_ids),
+            lambda: self._hybrid_search(state, query, top_k, alpha, doc_ids),
+        )
 
-        vec_results = self.vector_search(query, top_k=100)
-        kw_results = self.keyword_search(query, top_k=100)
+    def _hybrid_search(self, state, query: str, top_k=5, alpha=0.6, doc_ids=None):
+        logger.info("Thực hiện hybrid search: query='{}' | top_k={} | alpha={} | doc_ids={}", query, top_k, alpha, doc_ids)
 
+        # Cùng một `state` cho cả hai nhánh: refresh giữa chừng không trộn kết quả của hai phiên bản corpus
+        vec_results = self._vector(state, query, 100, doc_ids)
+        kw_results = self._keyword(state, query, 100, doc_ids)
+        hybrid = self._merge_hybrid(vec_results, kw_results, top_k, alpha)
+
+        logger.info("Hybrid search trả về {} kết quả", len(hybrid))
+        return hybrid
+
+    @staticmethod
+    def _merge_hybrid(vec_results, kw_results, top_k, alpha):
         kw_dict = {
             (r["doc_id"], r["chunk_id"]): r
             for r in kw_results
@@ -164,17 +526,68 @@ class SearchEngine:
                     "type": "hybrid"
                 })
 
-        logger.info("Hybrid search trả về {} kết quả", len(hybrid))
         return sorted(hybrid, key=lambda x: x["score"], reverse=True)[:top_k]
+
+    @timed("batch_search")
+    def batch_search(self, queries: list):
+        """
+        Tìm kiếm nhiều truy vấn một lượt; `queries` là list dict {query, mode, top_k, alpha, doc_ids}.
+        Các truy vấn vector/hybrid được encode chung một batch; các truy vấn không lọc được chấm điểm
+        bằng một phép nhân ma trận, truy vấn có lọc chỉ chấm trên các hàng của tài liệu được chọn.
+        """
+        logger.info("Thực hiện batch search: {} truy vấn", len(queries))
+        for q in queries:
+            if q["mode"] not in ("vector", "keyword", "hybrid"):
+                raise ValueError(f"mode '{q['mode']}' không hợp lệ")
+
+        state = self._current_state()
+        vector_idx = [i for i, q in enumerate(queries) if q["mode"] != "keyword"]
+        query_rows = {}
+        if vector_idx:
+            query_vecs = self.encode_queries([queries[i]["query"] for i in vector_idx])
+            if query_vecs is not None:
+                unfiltered = [pos for pos, i in enumerate(vector_idx) if queries[i].get("doc_ids") is None]
+                if unfiltered:
+                    scores = self._score(state, query_vecs[unfiltered])
+                    for row, pos in enumerate(unfiltered):
+                        query_rows[vector_idx[pos]] = (scores[row], None)
+                for pos, i in enumerate(vector_idx):
+                    if i not in query_rows:
+                        rows = self._candidate_rows(state, queries[i]["doc_ids"])
+                        query_rows[i] = (self._score(state, query_vecs[pos:pos + 1], rows)[0], rows)
+
+        results = []
+        for i, q in enumerate(queries):
+            top_k = q.get("top_k", 5)
+            doc_ids = q.get("doc_ids")
+            if q["mode"] == "keyword":
+                results.append(self._keyword(state, q["query"], top_k, doc_ids))
+                continue
+
+            vec_results = []
+            if i in query_rows:
+                scores, rows = query_rows[i]
+                vec_results = self._vector_hits(state, scores, top_k if q["mode"] == "vector" else 100, rows)
+            if q["mode"] == "vector":
+                results.append(vec_results)
+            else:
+                kw_results = self._keyword(state, q["query"], 100, doc_ids)
+                results.append(self._merge_hybrid(vec_results, kw_results, top_k, q.get("alpha", 0.6)))
+        return results
+
     def refresh(self):
         """Reload tất cả chunks từ database."""
         logger.info("🔄 Đang refresh SearchEngine...")
-        self.all_chunks = []
-        articles = self.db.fetch_all_articles()
-        
-        for article in articles:
-            chunks = self.db.fetch_chunks_by_doc_id(article["id"])
-            logger.debug("Bài viết id={} có {} chunks", article["id"], len(chunks))
-            self.all_chunks.extend(chunks)
-            
-        logger.info("✅ Đã refresh xong. Tổng số chunks: {}", len(self.all_chunks))
\ No newline at end of file
+        with self._refresh_lock:
+            self._load_chunks()
+        logger.info("✅ Đã refresh xong. Tổng số chunks: {}", len(self.state.store))
+
+
+def create_search_engine(embed_model=None, backend: str = SEARCH_BACKEND):
+    """Search engine theo SEARCH_BACKEND; hai backend cùng giao diện tìm kiếm."""
+    if backend == "postgres":
+        from app.core.pg_search import PgSearchEngine
+        return PgSearchEngine(embed_model=embed_model)
+    if backend not in SEARCH_BACKENDS:
+        raise ValueError(f"SEARCH_BACKEND '{backend}' không hợp lệ ({' | '.join(SEARCH_BACKENDS)})")
+    return SearchEngine(embed_model=embed_model)
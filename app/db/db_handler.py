@@ -1,12 +1,20 @@
 import psycopg2
 from psycopg2 import sql
+from psycopg2.extras import execute_values
 import json
 import os
 from dotenv import load_dotenv
-from app.utils.logger import logger  
+from app.utils.logger import logger, should_log
+from app.utils.metrics import timed
 
 load_dotenv()
 
+CHUNK_COLUMNS = ("doc_id", "chunk_id", "title", "markdown")
+ARTICLE_COLUMNS = ("id", "url", "title", "date", "markdown", "text", "images")
+# Ký tự phải escape trong định dạng text của COPY
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
 class PostgresHandler:
     def __init__(self):
         self.pg_user = os.getenv("PG_USER")
@@ -68,6 +76,7 @@ class PostgresHandler:
             self.conn.close()
         logger.debug("🔌 Đã đóng kết nối đến database")
 
+    @timed("db.delete_article")
     def delete_article(self, article_id):
         try:
             self.connect()
@@ -123,22 +132,11 @@ class PostgresHandler:
         except Exception as e:
             logger.exception("Lỗi khi tạo bảng chunks: {}", e)
 
+    @timed("db.insert_article")
     def insert_article(self, data):
         try:
             self.connect()
-            self.cursor.execute("""
-                INSERT INTO articles (url, title, date, markdown, text, images)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (
-                data.get("url", ""),
-                data.get("title", ""),
-                data.get("date", ""),
-                data.get("markdown", ""),
-                data.get("text", ""),
-                data.get("images", []),
-            ))
-            article_id = self.cursor.fetchone()[0]
+            article_id = self._insert_article(data)
             self.conn.commit()
             logger.info("Đã chèn article với id={}", article_id)
             return article_id
@@ -146,27 +144,69 @@ class PostgresHandler:
             logger.exception("Lỗi khi insert article: {}", e)
             raise
 
+    @timed("db.insert_chunks")
     def insert_chunks(self, doc_id, chunks):
         try:
             self.connect()
-            for chunk in chunks:
-                self.cursor.execute("""
-                    INSERT INTO chunks (doc_id, chunk_id, title, markdown, vector)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON CONFLICT (doc_id, chunk_id) DO NOTHING
-                """, (
-                    chunk.get("doc_id", doc_id),
-                    chunk.get("chunk_id"),
-                    chunk.get("title", ""),
-                    chunk.get("markdown", ""),
-                    json.dumps(chunk.get("vector")) if chunk.get("vector") else None
-                ))
+            self._insert_chunks(doc_id, chunks)
             self.conn.commit()
             logger.info("Đã lưu {} chunks cho doc_id={}", len(chunks), doc_id)
         except Exception as e:
             logger.exception("Lỗi khi insert chunks: {}", e)
             raise
 
+    @timed("db.insert_document")
+    def insert_document(self, data, chunks, replace_id=None):
+        """
+        Chèn article và toàn bộ chunks trong một transaction (không để lại article thiếu chunks khi lỗi giữa chừng).
+        `replace_id`: article cũ cần thay (vd. trang web đã đổi nội dung), bị xóa trong cùng transaction.
+        """
+        try:
+            self.connect()
+            if replace_id is not None:
+                self.cursor.execute("DELETE FROM articles WHERE id = %s", (replace_id,))
+            article_id = self._insert_article(data)
+            self._insert_chunks(article_id, chunks, force_doc_id=True)
+            self.conn.commit()
+            logger.info("Đã lưu article id={} với {} chunks", article_id, len(chunks))
+            return article_id
+        except Exception as e:
+            self.conn.rollback()
+            logger.exception("Lỗi khi insert tài liệu: {}", e)
+            raise
+
+    def _insert_article(self, data):
+        self.cursor.execute("""
+            INSERT INTO articles (url, title, date, markdown, text, images)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            RETURNING id
+        """, (
+            data.get("url", ""),
+            data.get("title", ""),
+            data.get("date", ""),
+            data.get("markdown", ""),
+            data.get("text", ""),
+            data.get("images", []),
+        ))
+        return self.cursor.fetchone()[0]
+
+    def _insert_chunks(self, doc_id, chunks, force_doc_id=False):
+        """Ghi nhiều dòng trong một câu INSERT (execute_values) thay vì một round-trip cho mỗi chunk."""
+        rows = [
+            (
+                doc_id if force_doc_id else chunk.get("doc_id", doc_id),
+                chunk.get("chunk_id"),
+                chunk.get("title", ""),
+                chunk.get("markdown", ""),
+                json.dumps(chunk.get("vector")) if chunk.get("vector") else None,
+            ) for chunk in chunks
+        ]
+        execute_values(self.cursor, """
+            INSERT INTO chunks (doc_id, chunk_id, title, markdown, vector)
+            VALUES %s
+            ON CONFLICT (doc_id, chunk_id) DO NOTHING
+        """, rows, page_size=500)
+
     def export_to_json(self, filename="result.json"):
         try:
             self.connect()
@@ -182,6 +222,7 @@ class PostgresHandler:
         except Exception as e:
             logger.exception("Lỗi khi export dữ liệu: {}", e)
 
+    @timed("db.fetch_all_articles")
     def fetch_all_articles(self):
         try:
             self.connect()
@@ -193,6 +234,37 @@ class PostgresHandler:
         except Exception as e:
             logger.exception("Lỗi khi lấy tất cả articles: {}", e)
             return []
+
+    @timed("db.corpus_fingerprint")
+    def corpus_fingerprint(self):
+        """Dấu vết của corpus: {articles: số bài, max_article_id, chunks: số chunk}; đổi khi thêm/xóa/thay tài liệu."""
+        try:
+            self.connect()
+            self.cursor.execute("""
+                SELECT (SELECT count(*) FROM articles), (SELECT coalesce(max(id), 0) FROM articles),
+                       (SELECT count(*) FROM chunks)
+            """)
+            articles, max_id, chunks = self.cursor.fetchone()
+            return {"articles": articles, "max_article_id": max_id, "chunks": chunks}
+        except Exception as e:
+            logger.exception("Lỗi khi lấy dấu vết corpus: {}", e)
+            return None
+
+    @timed("db.vector_dims")
+    def vector_dims(self):
+        """{số chiều: số chunk} của các vector trong bảng chunks."""
+        try:
+            self.connect()
+            self.cursor.execute("""
+                SELECT jsonb_array_length(vector), count(*) FROM chunks
+                WHERE jsonb_typeof(vector) = 'array' GROUP BY 1
+            """)
+            return dict(self.cursor.fetchall())
+        except Exception as e:
+            logger.exception("Lỗi khi đếm số chiều vector: {}", e)
+            return {}
+
+    @timed("db.get_all_articles")
     def get_all_articles(self):
         try:
             self.connect()
@@ -217,6 +289,7 @@ class PostgresHandler:
             logger.exception("Lỗi khi lấy danh sách articles: {}", e)
             return []
 
+    @timed("db.fetch_article_by_id")
     def fetch_article_by_id(self, article_id):
         try:
             self.connect()
@@ -232,14 +305,203 @@ class PostgresHandler:
             logger.exception("Lỗi khi lấy article theo id: {}", e)
             return None
 
+    @timed("db.fetch_chunks_by_doc_id")
     def fetch_chunks_by_doc_id(self, doc_id):
         try:
             self.connect()
             self.cursor.execute("SELECT * FROM chunks WHERE doc_id = %s ORDER BY chunk_id", (doc_id,))
             rows = self.cursor.fetchall()
             columns = [desc[0] for desc in self.cursor.description]
-            logger.debug("Đã fetch {} chunks cho doc_id={}", len(rows), doc_id)
+            if should_log("db.fetch_chunks_by_doc_id"):
+                logger.debug("Đã fetch {} chunks cho doc_id={}", len(rows), doc_id)
             return [dict(zip(columns, row)) for row in rows]
         except Exception as e:
             logger.exception("Lỗi khi lấy chunks theo doc_id: {}", e)
             return []
+
+    def _chunk_query(self, doc_id=None, after=None, include_vector=False, limit=None):
+        """Dựng câu SELECT chunks theo keyset (doc_id, chunk_id), chỉ lấy các cột cần thiết."""
+        columns = CHUNK_COLUMNS + (("vector",) if include_vector else ())
+        conditions = []
+        params = []
+        if doc_id is not None:
+            conditions.append(sql.SQL("doc_id = %s"))
+            params.append(doc_id)
+        if after is not None:
+            conditions.append(sql.SQL("(doc_id, chunk_id) > (%s, %s)"))
+            params.extend(after)
+
+        query = sql.SQL("SELECT {columns} FROM chunks").format(
+            columns=sql.SQL(", ").join(sql.Identifier(c) for c in columns)
+        )
+        if conditions:
+            query += sql.SQL(" WHERE ") + sql.SQL(" AND ").join(conditions)
+        query += sql.SQL(" ORDER BY doc_id, chunk_id")
+        if limit is not None:
+            query += sql.SQL(" LIMIT %s")
+            params.append(limit)
+        return query, params, columns
+
+    @timed("db.fetch_chunks_page")
+    def fetch_chunks_page(self, doc_id=None, after=None, limit=100, include_vector=False):
+        """Lấy một trang chunks sau con trỏ `after` = (doc_id, chunk_id); LIMIT được đẩy xuống SQL."""
+        try:
+            self.connect()
+            query, params, columns = self._chunk_query(doc_id, after, include_vector, limit)
+            self.cursor.execute(query, params)
+            rows = self.cursor.fetchall()
+            logger.debug("Đã fetch trang {} chunks | doc_id={} | after={}", len(rows), doc_id, after)
+            return [dict(zip(columns, row)) for row in rows]
+        except Exception as e:
+            logger.exception("Lỗi khi lấy trang chunks: {}", e)
+            raise
+
+    def iter_chunks(self, doc_id=None, after=None, limit=None, include_vector=False, batch_size=500):
+        """Duyệt chunks bằng server-side cursor trên kết nối riêng, bộ nhớ không phụ thuộc kích thước corpus."""
+        conn = self._new_connection()
+        try:
+            query, params, columns = self._chunk_query(doc_id, after, include_vector, limit)
+            with conn.cursor(name="iter_chunks") as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(query, params)
+                for row in cursor:
+                    yield dict(zip(columns, row))
+        finally:
+            conn.close()
+
+    def _connect_params(self) -> dict:
+        return {
+            "dbname": self.db_name,
+            "user": self.pg_user,
+            "password": self.pg_pwd,
+            "host": self.pg_host,
+            "port": self.pg_port,
+        }
+
+    def _new_connection(self):
+        return psycopg2.connect(**self._connect_params())
+
+    def connection_pool(self, maxconn: int):
+        """Pool kết nối dùng chung giữa các thread (mỗi thread mượn một kết nối), cho truy vấn chạy song song."""
+        from psycopg2.pool import ThreadedConnectionPool
+
+        return ThreadedConnectionPool(1, maxconn, **self._connect_params())
+
+    def iter_corpus(self, batch_size=1000):
+        """
+        Duyệt toàn bộ corpus cho export: ("article", dict) theo id rồi ("chunk", dict kèm vector) theo (doc_id, chunk_id).
+        Cả hai lượt đọc cùng một snapshot (REPEATABLE READ) qua server-side cursor, bộ nhớ không tăng theo corpus.
+        """
+        conn = self._new_connection()
+        try:
+            conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+            chunk_query, params, chunk_columns = self._chunk_query(include_vector=True)
+            article_query = sql.SQL("SELECT {columns} FROM articles ORDER BY id").format(
+                columns=sql.SQL(", ").join(sql.Identifier(c) for c in ARTICLE_COLUMNS)
+            )
+            for kind, query, query_params, columns in (
+                ("article", article_query, [], ARTICLE_COLUMNS),
+                ("chunk", chunk_query, params, chunk_columns),
+            ):
+                with conn.cursor(name=f"export_{kind}") as cursor:
+                    cursor.itersize = batch_size
+                    cursor.execute(query, query_params)
+                    for row in cursor:
+                        yield kind, dict(zip(columns, row))
+        finally:
+            conn.close()
+
+    @timed("db.copy_corpus")
+    def copy_corpus(self, articles, chunks, replace=False, expected=None):
+        """
+        Nạp corpus từ export bằng COPY trong một transaction, giữ nguyên id của articles.
+        `articles`, `chunks`: iterable dict (vector của chunk là list float hoặc None), được đọc dần.
+        DB phải rỗng, trừ khi `replace=True` (xóa toàn bộ corpus hiện có trong cùng transaction).
+        `expected`: {articles, chunks} (vd. từ manifest); số dòng đã đọc khác thì rollback, không để lại corpus dở dang.
+        """
+        self.create_articles_table()
+        self.create_chunks_table()
+        try:
+            self.connect()
+            if replace:
+                self.cursor.execute("TRUNCATE articles, chunks")
+            else:
+                self.cursor.execute("SELECT EXISTS (SELECT 1 FROM articles)")
+                if self.cursor.fetchone()[0]:
+                    raise ValueError("Bảng articles đã có dữ liệu; dùng replace=True để thay toàn bộ corpus")
+
+            counts = {"articles": 0, "chunks": 0}
+
+            def article_lines():
+                for article in articles:
+                    counts["articles"] += 1
+                    yield _copy_row((
+                        article["id"], article.get("url"), article.get("title"), article.get("date"),
+                        article.get("markdown"), article.get("text"), _pg_array(article.get("images")),
+                    ))
+
+            def chunk_lines():
+                for chunk in chunks:
+                    counts["chunks"] += 1
+                    vector = chunk.get("vector")
+                    yield _copy_row((
+                        chunk["doc_id"], chunk["chunk_id"], chunk.get("title"), chunk.get("markdown"),
+                        json.dumps(vector) if vector else None,
+                    ))
+
+            self.cursor.copy_expert(
+                f"COPY articles ({', '.join(ARTICLE_COLUMNS)}) FROM STDIN", _LineStream(article_lines())
+            )
+            self.cursor.copy_expert(
+                f"COPY chunks ({', '.join(CHUNK_COLUMNS)}, vector) FROM STDIN", _LineStream(chunk_lines())
+            )
+            # id được giữ nguyên nên sequence phải đi tiếp từ id lớn nhất
+            self.cursor.execute(
+                "SELECT setval(pg_get_serial_sequence('articles', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM articles"
+            )
+            if expected is not None and (counts["articles"], counts["chunks"]) != (expected["articles"], expected["chunks"]):
+                raise ValueError(f"Số dòng đã đọc {counts} khác số dòng cần nạp {expected}")
+            self.conn.commit()
+            logger.info("Đã nạp {} articles, {} chunks bằng COPY", counts["articles"], counts["chunks"])
+            return counts
+        except Exception as e:
+            self.conn.rollback()
+            logger.exception("Lỗi khi nạp corpus: {}", e)
+            raise
+
+
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    return str(value).translate(COPY_ESCAPES)
+
+
+def _copy_row(values) -> str:
+    return "\t".join(_copy_value(v) for v in values) + "\n"
+
+
+def _pg_array(items):
+    """list[str] -> literal mảng TEXT[] của Postgres."""
+    if items is None:
+        return None
+    quoted = ('"' + str(item).replace("\\", "\\\\").replace('"', '\\"') + '"' for item in items)
+    return "{" + ",".join(quoted) + "}"
+
+
+class _LineStream:
+    """File-like chỉ đọc trên một iterator các dòng, để COPY đọc dần thay vì dựng cả buffer trong bộ nhớ."""
+
+    def __init__(self, lines):
+        self._lines = lines
+        self._buffer = b""
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line.encode("utf-8")
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
@@ -1,18 +1,97 @@
+import json
 import os
 import requests
 import streamlit as st
-from app.utils.logger import logger  
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from app.utils.logger import logger
+
+API_URL = os.getenv("API_URL", "http://app:8000").rstrip("/")
+# (connect, read) giây; read là thời gian tối đa giữa hai lần nhận dữ liệu, không phải cả câu trả lời
+API_TIMEOUT = (float(os.getenv("API_CONNECT_TIMEOUT", "3")), float(os.getenv("API_READ_TIMEOUT", "60")))
+UPLOAD_TIMEOUT = (API_TIMEOUT[0], float(os.getenv("API_UPLOAD_TIMEOUT", "600")))
+ARTICLES_CACHE_TTL = int(os.getenv("UI_ARTICLES_CACHE_TTL", "300"))
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """Một Session dùng chung cho mọi phiên Streamlit: giữ kết nối keep-alive tới API thay vì mở mới mỗi câu hỏi."""
+    session = requests.Session()
+    # Chỉ tự thử lại lỗi kết nối và các GET; POST /chat không thử lại để tránh gọi LLM hai lần
+    retry = Retry(total=2, connect=2, read=0, backoff_factor=0.2,
+                  status_forcelist=(502, 504), allowed_methods=frozenset({"GET"}))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_data(ttl=ARTICLES_CACHE_TTL, show_spinner=False)
+def fetch_articles() -> list:
+    response = get_session().get(f"{API_URL}/articles", timeout=API_TIMEOUT)
+    response.raise_for_status()
+    return response.json().get("articles", [])
+
+
+def load_articles() -> list:
+    try:
+        return fetch_articles()
+    except Exception as e:
+        logger.warning("Không lấy được danh sách tài liệu: {}", e)
+        return []
+
+
+def error_detail(response: requests.Response) -> str:
+    try:
+        return str(response.json().get("detail", "Không rõ nguyên nhân."))
+    except ValueError:
+        return response.text or "Không rõ nguyên nhân."
+
+
+def stream_chat(payload: dict, result: dict):
+    """Gọi POST /chat/stream, trả từng đoạn câu trả lời cho st.write_stream; sources/cache ghi vào `result`."""
+    with get_session().post(f"{API_URL}/chat/stream", json=payload, stream=True, timeout=API_TIMEOUT) as response:
+        if response.status_code != 200:
+            raise RuntimeError(error_detail(response))
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["type"] == "token":
+                yield event["text"]
+            elif event["type"] == "meta":
+                result["sources"] = event.get("sources", [])
+                result["cache"] = event.get("cache", {})
+
+
+def render_sources(sources: list, titles: dict):
+    if not sources:
+        return
+    with st.expander(f"📚 Nguồn tham khảo ({len(sources)})"):
+        for src in sources:
+            doc_title = titles.get(src["doc_id"], f"doc_id={src['doc_id']}")
+            st.markdown(f"**{doc_title}** · {src.get('title') or ''} · score={src['score']} ({src['type']})")
+            st.caption(src["content"][:500] + ("…" if len(src["content"]) > 500 else ""))
+
 
 st.set_page_config(page_title="ChatBot Luật Việt Nam", layout="wide")
 st.title("📘 ChatBot Luật Việt Nam")
 
 logger.info("Giao diện người dùng đã được khởi chạy")
 
+articles = load_articles()
+article_titles = {a["id"]: a.get("title") or f"doc_id={a['id']}" for a in articles}
+
 with st.sidebar:
     st.header("⚙️ Cấu hình tìm kiếm")
     mode = st.radio("Phương pháp tìm kiếm", ["hybrid", "vector", "keyword"])
     top_k = st.slider("Số kết quả (top_k)", 1, 10, 5)
     alpha = st.slider("Độ cân bằng (alpha)", 0.0, 1.0, 0.6) if mode == "hybrid" else None
+    doc_ids = st.multiselect(
+        "Chỉ tìm trong tài liệu",
+        options=list(article_titles),
+        format_func=lambda doc_id: article_titles[doc_id],
+    )
 
     st.markdown("---")
     st.header("📤 Tải tài liệu luật")
@@ -31,16 +110,19 @@ with st.sidebar:
                             "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
                         )
                     }
-                    response = requests.post("http://app:8000/upload", files=files)
-                    res = response.json()
+                    response = get_session().post(f"{API_URL}/upload/", files=files, timeout=UPLOAD_TIMEOUT)
 
                     if response.status_code == 200:
+                        res = response.json()
                         st.success(f"Tải lên thành công: {res['filename']}")
                         st.info(f"Đã tạo doc_id: {res['doc_id']} với {res['total_chunks']} đoạn.")
                         logger.info("Upload thành công: {} | doc_id={} | chunks={}", res['filename'], res['doc_id'], res['total_chunks'])
+                        # Danh sách tài liệu đã đổi
+                        fetch_articles.clear()
                     else:
-                        st.error(f"Lỗi từ server: {res.get('detail', 'Không rõ nguyên nhân.')}")
-                        logger.warning("Lỗi khi upload file: {}", res.get("detail", "Không rõ nguyên nhân."))
+                        detail = error_detail(response)
+                        st.error(f"Lỗi từ server: {detail}")
+                        logger.warning("Lỗi khi upload file: {}", detail)
                 except Exception as e:
                     st.error(f"Lỗi khi gửi file: {e}")
                     logger.exception("Exception khi gửi file upload: {}", e)
@@ -48,9 +130,11 @@ with st.sidebar:
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+# Sources được lưu cùng tin nhắn nên các lần chạy lại script không gọi lại API
 for msg in st.session_state.messages:
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
+        render_sources(msg.get("sources"), article_titles)
 
 query = st.chat_input("Nhập câu hỏi của bạn...")
 
@@ -60,21 +144,24 @@ if query:
     with st.chat_message("user"):
         st.markdown(query)
 
-    with st.spinner("🔍 Đang phản hồi..."):
+    payload = {"query": query, "mode": mode, "top_k": top_k}
+    if alpha is not None:
+        payload["alpha"] = alpha
+    if doc_ids:
+        payload["doc_ids"] = doc_ids
+
+    result = {"sources": [], "cache": {}}
+    with st.chat_message("assistant"):
         try:
-            params = {"query": query, "mode": mode, "top_k": top_k}
-            if alpha is not None:
-                params["alpha"] = alpha
-
-            logger.debug("Gửi yêu cầu đến API: {}", params)
-            response = requests.get("http://app:8000/chat", params=params)
-            data = response.json()
-            answer = data.get("answer", "Không có phản hồi.")
+            logger.debug("Gửi yêu cầu đến API: {}", payload)
+            answer = st.write_stream(stream_chat(payload, result))
             logger.debug("Nhận phản hồi: {}", answer[:100] + "...")
         except Exception as e:
             answer = f"Lỗi khi gọi API: {e}"
+            st.markdown(answer)
             logger.exception("Lỗi khi gọi API: {}", e)
+        if result["cache"].get("hit"):
+            st.caption(f"♻️ Câu trả lời đã lưu cho câu hỏi tương tự: “{result['cache'].get('cached_query')}”")
+        render_sources(result["sources"], article_titles)
 
-    st.session_state.messages.append({"role": "assistant", "content": answer})
-    with st.chat_message("assistant"):
-        st.markdown(answer)
+    st.session_state.messages.append({"role": "assistant", "content": answer, "sources": result["sources"]})
@@ -0,0 +1,190 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from app.utils.metrics import CACHE_REQUESTS, CACHE_ENTRIES, SEMANTIC_SIMILARITY
+
+
+class TTLCache:
+    """
+    Cache LRU có giới hạn kích thước và thời gian sống (TTL) cho mỗi entry, an toàn đa luồng.
+    `maxsize=0` tắt cache. Hit/miss được đếm vào metric chatbot_cache_requests_total{cache=name}.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 600.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if self.maxsize <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                CACHE_REQUESTS.inc(cache=self.name, result="hit")
+                return item[1]
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+        CACHE_REQUESTS.inc(cache=self.name, result="miss")
+        return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            CACHE_ENTRIES.set(len(self._data), cache=self.name)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            CACHE_ENTRIES.set(0, cache=self.name)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class SemanticCache:
+    """
+    Cache câu trả lời theo độ tương đồng embedding của câu hỏi (câu hỏi khác chữ nhưng cùng ý).
+
+    Mỗi entry lưu (embedding đã chuẩn hóa, context, phiên bản corpus, danh sách chunk đã truy xuất, giá trị).
+    Trúng cache khi cosine >= `threshold`, cùng `context` (mode, top_k, bộ lọc, model...) và cùng
+    phiên bản corpus với entry (request bắt đầu trước khi corpus đổi không trúng entry mới và ngược lại).
+    Ghi entry của phiên bản khác thì bỏ các entry cũ, kiểm tra - xóa - ghi trong cùng một lock. Để tránh trả nhầm, chunks truy xuất cho câu hỏi mới phải trùng với chunks
+    của entry ít nhất `min_overlap` (Jaccard); không đạt thì tính là false hit và không dùng cache.
+    Đầy thì bỏ entry lâu không dùng nhất. `maxsize=0` tắt cache.
+    """
+
+    def __init__(self, name: str, maxsize: int = 512, ttl: float = 3600.0, threshold: float = 0.92, min_overlap: float = 0.6):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.min_overlap = min_overlap
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._entries = []
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.false_hits = 0
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    @staticmethod
+    def overlap(a, b) -> float:
+        a, b = set(a), set(b)
+        return len(a & b) / len(a | b) if a or b else 1.0
+
+    def _reset(self, version):
+        self._vectors = None
+        self._entries = []
+        self._version = version
+        CACHE_ENTRIES.set(0, cache=self.name)
+
+    def _best(self, vector, context, version, now):
+        """(vị trí, cosine) của entry còn hạn, cùng context/phiên bản và gần nhất; (None, cosine cao nhất) nếu không có."""
+        if not self._entries:
+            return None, 0.0
+        sims = self._vectors[:len(self._entries)] @ vector
+        for slot in np.argsort(-sims):
+            entry = self._entries[slot]
+            if entry["context"] == context and entry["version"] == version and entry["expires"] > now:
+                return int(slot), float(sims[slot])
+        return None, float(sims.max())
+
+    def lookup(self, vector, context, version, chunk_ids):
+        """Entry {"value", "query", "similarity"} nếu trúng cache, ngược lại None."""
+        if self.maxsize <= 0:
+            return None
+        vector = self._unit(vector)
+        now = time.monotonic()
+        hit = None
+        with self._lock:
+            slot, similarity = self._best(vector, context, version, now)
+            if slot is None or similarity < self.threshold:
+                self.misses += 1
+                result = "miss"
+            elif self.overlap(self._entries[slot]["chunk_ids"], chunk_ids) < self.min_overlap:
+                self.false_hits += 1
+                result = "false_hit"
+            else:
+                entry = self._entries[slot]
+                entry["last_used"] = now
+                self.hits += 1
+                result = "hit"
+                hit = {"value": entry["value"], "query": entry["query"], "similarity": round(similarity, 4)}
+        SEMANTIC_SIMILARITY.observe(similarity, cache=self.name)
+        CACHE_REQUESTS.inc(cache=self.name, result=result)
+        return hit
+
+    def put(self, vector, context, version, chunk_ids, value, query: str = ""):
+        if self.maxsize <= 0:
+            return
+        vector = self._unit(vector)
+        now = time.monotonic()
+        entry = {
+            "context": context, "version": version, "chunk_ids": list(chunk_ids), "value": value, "query": query,
+            "expires": now + self.ttl, "last_used": now,
+        }
+        with self._lock:
+            if version != self._version:
+                self._reset(version)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.maxsize, vector.size), dtype=np.float32)
+            slot, similarity = self._best(vector, context, version, now)
+            if slot is None or similarity < 0.999:
+                if len(self._entries) < self.maxsize:
+                    slot = len(self._entries)
+                    self._entries.append(None)
+                else:
+                    slot = min(range(len(self._entries)), key=lambda i: self._entries[i]["last_used"])
+            self._entries[slot] = entry
+            self._vectors[slot] = vector
+            CACHE_ENTRIES.set(len(self._entries), cache=self.name)
+
+    def clear(self):
+        with self._lock:
+            self._reset(self._version)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses + self.false_hits
+        served = self.hits + self.false_hits
+        return {
+            "entries": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "threshold": self.threshold,
+            "min_overlap": self.min_overlap,
+            "hits": self.hits,
+            "misses": self.misses,
+            "false_hits": self.false_hits,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "false_hit_ratio": round(self.false_hits / served, 4) if served else 0.0,
+        }
@@ -1,5 +1,9 @@
 import sys
 import os
+import atexit
+import queue
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
 from loguru import logger as loguru_logger
@@ -10,47 +14,151 @@ load_dotenv()
 DEBUG = os.getenv("DEBUG", "false").lower() == "true"
 LOG_SIZE_LIMIT = os.getenv("LOG_SIZE_LIMIT", "10 MB")
 SERVICE_NAME = os.getenv("SERVICE_NAME", "chatbot-service")
-
-loguru_logger.remove()
+# production (mặc định): tắt diagnose/backtrace, không dump biến cục bộ (có thể chứa secret) khi có exception;
+# development: bật lại để debug trên máy dev
+LOG_PROFILE = os.getenv("LOG_PROFILE", "production").lower()
+# Ghi log qua hàng đợi + thread nền: request chỉ đẩy record vào queue, format/serialize/ghi file ở thread nền
+LOG_ENQUEUE = os.getenv("LOG_ENQUEUE", "true").lower() == "true"
+# Hàng đợi đầy thì luồng gọi log phải chờ (backpressure) thay vì làm rơi log
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Số log tối đa mỗi giây cho một khóa log trong vòng lặp nóng (xem should_log)
+LOG_THROTTLE_PER_SEC = float(os.getenv("LOG_THROTTLE_PER_SEC", "5"))
 
 LOG_DIR = Path("./logs")
-LOG_DIR.mkdir(parents=True, exist_ok=True)
 
-log_filename = f"{SERVICE_NAME}-{datetime.now().strftime('%Y%m%d')}.log"
-LOG_FILE = LOG_DIR / log_filename
+LOG_LEVEL = "DEBUG" if DEBUG else os.getenv("LOG_LEVEL", "INFO").upper()
+
+CONSOLE_FORMAT = "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
+FILE_FORMAT = "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}"
+
+
+class _BackgroundWriter:
+    """
+    Sink loguru chỉ đẩy record vào hàng đợi trong tiến trình; một thread nền phát lại record
+    tới các sink thật (console, file JSON) nên format, serialize và I/O không nằm trên luồng request.
+
+    Không dùng `enqueue=True` của loguru vì nó pickle từng message qua multiprocessing queue,
+    còn chậm hơn ghi đồng bộ.
+    """
+
+    def __init__(self, maxsize: int = LOG_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def __call__(self, message):
+        self.queue.put(message.record)
+
+    def in_writer(self, record) -> bool:
+        return threading.current_thread() is self.thread
+
+    def not_in_writer(self, record) -> bool:
+        return threading.current_thread() is not self.thread
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                break
+            try:
+                loguru_logger.patch(lambda r, src=record: r.update(src)).log(record["level"].name, "")
+            except Exception:
+                pass
+
+    def stop(self, timeout=None):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout=timeout)
+
+
+_writer = None
+
 
-LOG_LEVEL = "DEBUG" if DEBUG else "INFO"
+def setup_logging(level=LOG_LEVEL, profile=LOG_PROFILE, enqueue=LOG_ENQUEUE, log_dir=LOG_DIR, console=sys.stdout):
+    """Cấu hình lại các sink của loguru: console + 2 file JSON (theo dung lượng và theo ngày)."""
+    global _writer
+    log_dir = Path(log_dir)
+    log_dir.mkdir(parents=True, exist_ok=True)
+    verbose_errors = profile != "production"
 
-loguru_logger.configure(
-    handlers=[
+    loguru_logger.remove()
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+    if enqueue:
+        _writer = _BackgroundWriter()
+    sink_filter = _writer.in_writer if _writer else None
+
+    file_options = {
+        "level": level,
+        "retention": "30 days",
+        "compression": "zip",
+        "format": FILE_FORMAT,
+        "serialize": True,
+        "backtrace": verbose_errors,
+        "diagnose": verbose_errors,
+        "filter": sink_filter,
+    }
+    handlers = [
         {
-            "sink": sys.stdout,
-            "level": LOG_LEVEL,
-            "format": "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
+            "sink": console,
+            "level": level,
+            "format": CONSOLE_FORMAT,
+            "backtrace": verbose_errors,
+            "diagnose": verbose_errors,
+            "filter": sink_filter,
         },
         {
-            "sink": LOG_FILE,
-            "level": LOG_LEVEL,
+            "sink": log_dir / f"{SERVICE_NAME}-{datetime.now().strftime('%Y%m%d')}.log",
             "rotation": LOG_SIZE_LIMIT,
-            "retention": "30 days",
-            "compression": "zip",
-            "format": "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
-            "serialize": True,
-            "backtrace": True,
-            "diagnose": True,
+            **file_options,
         },
         {
-            "sink": str(LOG_DIR / f"{SERVICE_NAME}-daily.log"),
-            "level": LOG_LEVEL,
+            "sink": str(log_dir / f"{SERVICE_NAME}-daily.log"),
             "rotation": "00:00",
-            "retention": "30 days",
-            "compression": "zip",
-            "format": "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
-            "serialize": True,
-            "backtrace": True,
-            "diagnose": True,
+            **file_options,
         },
     ]
-)
+    if _writer:
+        handlers.append({"sink": _writer, "level": level, "format": "{message}", "filter": _writer.not_in_writer})
+    loguru_logger.configure(handlers=handlers)
+
+
+def flush_logging(timeout=None):
+    """Chờ thread nền ghi hết log còn trong hàng đợi (gọi khi tắt dịch vụ)."""
+    if _writer is not None:
+        _writer.stop(timeout)
+
+
+class _LogThrottle:
+    """Token bucket theo từng khóa, giới hạn log lặp lại trong vòng lặp nóng."""
+
+    def __init__(self, per_second: float):
+        self.per_second = per_second
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key: str) -> bool:
+        if self.per_second <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.per_second, now))
+            tokens = min(self.per_second, tokens + (now - last) * self.per_second)
+            allowed = tokens >= 1.0
+            self._buckets[key] = (tokens - 1.0 if allowed else tokens, now)
+        return allowed
+
+
+_throttle = _LogThrottle(LOG_THROTTLE_PER_SEC)
+
+
+def should_log(key: str) -> bool:
+    """True nếu log theo `key` còn trong hạn mức LOG_THROTTLE_PER_SEC; dùng cho log từng phần tử trong vòng lặp."""
+    return _throttle.allow(key)
+
+
+setup_logging()
+atexit.register(flush_logging, timeout=10)
 
 logger = loguru_logger.bind(service=SERVICE_NAME)
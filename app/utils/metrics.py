@@ -0,0 +1,201 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ContextDecorator, contextmanager
+from contextvars import ContextVar
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_request_timings: ContextVar = ContextVar("request_timings", default=None)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + body + "}"
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict):
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def collect(self):
+        lines = self.header()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            series["counts"][bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def collect(self):
+        lines = self.header()
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series["counts"]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    labels = _format_labels(self.labelnames, key, extra=[("le", le)])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {series['sum']}")
+                lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "chatbot_stage_latency_seconds", "Thời gian xử lý của từng giai đoạn", labelnames=("stage",)
+))
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    "chatbot_http_request_duration_seconds", "Thời gian xử lý HTTP request", labelnames=("method", "path", "status")
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "chatbot_cache_requests_total", "Số lần tra cache theo kết quả hit/miss", labelnames=("cache", "result")
+))
+CACHE_ENTRIES = REGISTRY.register(Gauge(
+    "chatbot_cache_entries", "Số entry hiện có trong cache", labelnames=("cache",)
+))
+SEMANTIC_SIMILARITY = REGISTRY.register(Histogram(
+    "chatbot_semantic_cache_similarity", "Cosine cao nhất giữa câu hỏi và các entry của cache ngữ nghĩa",
+    labelnames=("cache",), buckets=(0.5, 0.7, 0.8, 0.85, 0.9, 0.92, 0.95, 0.97, 0.99, 1.0),
+))
+RETRIEVED_CHUNKS = REGISTRY.register(Histogram(
+    "chatbot_retrieved_chunks", "Số chunks đưa vào prompt", buckets=(0, 1, 2, 5, 10, 20, 50)
+))
+PROMPT_SIZE = REGISTRY.register(Histogram(
+    "chatbot_prompt_chars", "Độ dài prompt gửi tới LLM (ký tự)",
+    buckets=(500, 1000, 2000, 4000, 8000, 16000, 32000, 64000),
+))
+EMBED_BATCH = REGISTRY.register(Histogram(
+    "chatbot_embed_batch_size", "Số câu trong mỗi batch encode của embedding service",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+))
+LLM_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "chatbot_llm_queue_depth", "Số lời gọi LLM đang chờ trong hàng đợi admission"
+))
+LLM_QUEUE_WAIT = REGISTRY.register(Histogram(
+    "chatbot_llm_queue_wait_seconds", "Thời gian chờ trước khi được gọi LLM", labelnames=("provider",)
+))
+LLM_ACTIVE = REGISTRY.register(Gauge(
+    "chatbot_llm_active_calls", "Số lời gọi LLM đang chạy", labelnames=("provider",)
+))
+LLM_REJECTED = REGISTRY.register(Counter(
+    "chatbot_llm_rejected_total", "Số lời gọi LLM bị từ chối theo lý do", labelnames=("provider", "reason")
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "chatbot_llm_tokens_total", "Số token (ước lượng) đã gửi và nhận từ LLM", labelnames=("provider",)
+))
+INDEXED_CHUNKS = REGISTRY.register(Gauge(
+    "chatbot_indexed_chunks", "Số chunks đang nạp trong SearchEngine"
+))
+
+
+class timed(ContextDecorator):
+    """Đo thời gian một giai đoạn; dùng được như `with timed("stage"):` hoặc `@timed("stage")`."""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._starts = threading.local()
+
+    def __enter__(self):
+        stack = getattr(self._starts, "stack", None)
+        if stack is None:
+            stack = self._starts.stack = []
+        stack.append(time.perf_counter())
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._starts.stack.pop()
+        STAGE_LATENCY.observe(elapsed, stage=self.stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[self.stage] = round(timings.get(self.stage, 0.0) + elapsed * 1000, 3)
+        return False
+
+
+@contextmanager
+def collect_timings():
+    """Gom thời gian (ms) của các giai đoạn chạy trong request hiện tại vào một dict."""
+    timings = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,145 @@
+"""
+Benchmark export/import corpus theo luồng (app.core.corpus_bundle) và snapshot chỉ mục, chạy offline.
+
+    python -m benchmarks.bundle_bench --sizes 2000,20000
+
+Với mỗi kích thước corpus: thời gian và dung lượng export (gzip / không nén, so với JSON một dòng mỗi bản ghi),
+bộ nhớ đỉnh (tracemalloc) khi export/import (phải gần như không đổi theo kích thước), thời gian dựng snapshot và
+khởi động SearchEngine từ snapshot so với từ DB. Kiểm tra import lại cho đúng dữ liệu gốc và tìm kiếm trên
+snapshot cho cùng kết quả (kể cả khi dòng đầu có vector cũ khác số chiều), và snapshot không còn khớp DB (đã xóa một bài)
+hoặc khác số chiều model bị bỏ qua; exit code 1 nếu sai.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from app.core.corpus_bundle import export_corpus, import_corpus, write_snapshot
+from app.core.search import SearchEngine
+from app.utils.logger import logger
+from benchmarks.corpus import generate_queries
+from benchmarks.fakes import FakeEncoder, InMemoryHandler
+from benchmarks.search_bench import MODES, build_handler, run_search
+
+
+class SinkHandler:
+    """Nhận `copy_corpus` nhưng không lưu gì: đo riêng bộ nhớ của luồng import."""
+
+    def copy_corpus(self, articles, chunks, replace=False, expected=None):
+        counts = {"articles": sum(1 for _ in articles), "chunks": 0}
+        for _ in chunks:
+            counts["chunks"] += 1
+        if expected is not None and (counts["articles"], counts["chunks"]) != (expected["articles"], expected["chunks"]):
+            raise ValueError(f"Số dòng đã đọc {counts} khác số dòng cần nạp {expected}")
+        return counts
+
+
+def traced(fn, *args, **kwargs):
+    """(kết quả, giây, bộ nhớ đỉnh MB) của một lời gọi."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return result, round(elapsed, 3), round(peak, 2)
+
+
+def json_bytes(handler) -> int:
+    return sum(len(json.dumps(row, ensure_ascii=False).encode("utf-8")) + 1 for _, row in handler.iter_corpus())
+
+
+def same_corpus(a, b) -> bool:
+    rows_a, rows_b = list(a.iter_corpus()), list(b.iter_corpus())
+    if len(rows_a) != len(rows_b):
+        return False
+    for (kind_a, row_a), (kind_b, row_b) in zip(rows_a, rows_b):
+        if kind_a != kind_b or row_a != row_b:
+            return False
+    return True
+
+
+def bench_size(n_chunks: int, dim: int, n_queries: int, tmp: str) -> dict:
+    encoder = FakeEncoder(dim=dim)
+    handler = build_handler(n_chunks, encoder)
+    # Dòng đầu tiên mang vector cũ (khác số chiều): không được quyết định số chiều của bản export
+    first = handler.chunks[min(handler.chunks)][0]
+    first["vector"] = json.dumps([0.5] * (dim // 2))
+    result = {"chunks": n_chunks, "json_mb": round(json_bytes(handler) / 2 ** 20, 2)}
+    errors = []
+
+    for name, compress in (("gzip", True), ("raw", False)):
+        directory = os.path.join(tmp, f"{n_chunks}_{name}")
+        manifest, seconds, peak = traced(export_corpus, handler, directory, compress=compress, level=1)
+        result[f"export_{name}"] = {"seconds": seconds, "mb": round(manifest["bytes"] / 2 ** 20, 2), "peak_mb": peak}
+
+    directory = os.path.join(tmp, f"{n_chunks}_gzip")
+    _, seconds, peak = traced(import_corpus, SinkHandler(), directory)
+    result["import_stream"] = {"seconds": seconds, "peak_mb": peak}
+
+    restored = InMemoryHandler()
+    import_corpus(restored, directory)
+    if not same_corpus(handler, restored):
+        errors.append(f"{n_chunks}: import không khớp dữ liệu gốc")
+
+    snapshot_dir = os.path.join(tmp, f"{n_chunks}_index")
+    _, seconds, peak = traced(write_snapshot, directory, snapshot_dir)
+    result["snapshot_write"] = {"seconds": seconds, "peak_mb": peak}
+
+    start = time.perf_counter()
+    from_db = SearchEngine(db=handler, embed_model=encoder, snapshot=None)
+    result["startup_db_s"] = round(time.perf_counter() - start, 3)
+    start = time.perf_counter()
+    from_snapshot = SearchEngine(db=handler, embed_model=encoder, snapshot=snapshot_dir)
+    result["startup_snapshot_s"] = round(time.perf_counter() - start, 3)
+
+    for query in generate_queries(n_queries):
+        for mode in MODES:
+            if run_search(from_db, mode, query, 5) != run_search(from_snapshot, mode, query, 5):
+                errors.append(f"{n_chunks}: {mode} '{query}' khác nhau giữa DB và snapshot")
+
+    # Snapshot mở embeddings bằng mmap; nạp từ DB thì không
+    if not isinstance(from_snapshot.state.embeddings, np.memmap):
+        errors.append(f"{n_chunks}: snapshot khớp DB nhưng không được dùng")
+    # Model khác số chiều với snapshot: phải bỏ snapshot
+    other_dim = SearchEngine(db=handler, embed_model=FakeEncoder(dim=dim // 2), snapshot=snapshot_dir)
+    if isinstance(other_dim.state.embeddings, np.memmap):
+        errors.append(f"{n_chunks}: snapshot {dim} chiều vẫn được dùng với model {dim // 2} chiều")
+    # DB đổi sau khi dựng snapshot: phải bỏ snapshot, nạp lại từ DB
+    handler.delete_article(max(handler.articles))
+    stale = SearchEngine(db=handler, embed_model=encoder, snapshot=snapshot_dir)
+    if isinstance(stale.state.embeddings, np.memmap) or len(stale.state.store) == len(from_snapshot.state.store):
+        errors.append(f"{n_chunks}: snapshot lệch DB vẫn được dùng")
+    return result, errors
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="2000,20000")
+    ap.add_argument("--dim", type=int, default=1024)
+    ap.add_argument("--queries", type=int, default=30)
+    args = ap.parse_args(argv)
+
+    logger.remove()
+    report, errors = {}, []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(s) for s in args.sizes.split(",")):
+            result, size_errors = bench_size(size, args.dim, args.queries, tmp)
+            report[size] = result
+            errors.extend(size_errors)
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if errors:
+        print("❌ " + "\n❌ ".join(errors[:20]))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
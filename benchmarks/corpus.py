@@ -0,0 +1,120 @@
+import random
+
+ROMAN = ["I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X", "XI", "XII"]
+
+LAW_NAMES = [
+    "Luật Đất đai", "Luật Dân sự", "Luật Hôn nhân và Gia đình", "Luật Nhà ở", "Luật Lao động",
+    "Luật Doanh nghiệp", "Luật Đầu tư", "Luật Thuế thu nhập cá nhân", "Luật Giao thông đường bộ",
+    "Luật Bảo hiểm xã hội", "Luật Xây dựng", "Luật Kinh doanh bất động sản",
+]
+
+SUBJECTS = [
+    "người sử dụng đất", "cơ quan nhà nước có thẩm quyền", "tổ chức kinh tế", "hộ gia đình",
+    "cá nhân", "người lao động", "người sử dụng lao động", "doanh nghiệp", "nhà đầu tư",
+    "Ủy ban nhân dân cấp tỉnh", "Ủy ban nhân dân cấp xã", "chủ sở hữu nhà ở", "bên thuê",
+]
+
+ACTIONS = [
+    "có quyền", "có nghĩa vụ", "được phép", "không được", "phải thực hiện", "chịu trách nhiệm",
+    "có trách nhiệm", "được nhà nước bảo hộ khi", "bị xử phạt nếu",
+]
+
+OBJECTS = [
+    "cấp giấy chứng nhận quyền sử dụng đất", "chuyển nhượng quyền sử dụng đất", "bồi thường khi thu hồi đất",
+    "đăng ký biến động đất đai", "nộp thuế sử dụng đất", "lập hợp đồng lao động", "giải quyết tranh chấp",
+    "công chứng hợp đồng", "đăng ký kết hôn", "thực hiện thủ tục hành chính", "thế chấp tài sản",
+    "góp vốn bằng quyền sử dụng đất", "cho thuê lại đất", "gia hạn thời hạn sử dụng đất",
+    "khiếu nại quyết định hành chính", "bảo vệ quyền lợi hợp pháp", "lập quy hoạch sử dụng đất",
+]
+
+CONDITIONS = [
+    "theo quy định của pháp luật", "trong thời hạn 30 ngày", "kể từ ngày nhận đủ hồ sơ hợp lệ",
+    "trừ trường hợp quy định tại khoản 2 Điều này", "theo quy định tại Điều 45 của Luật này",
+    "khi có quyết định của cơ quan có thẩm quyền", "đối với trường hợp đất có nguồn gốc được giao",
+]
+
+ARTICLE_TOPICS = [
+    "Phạm vi điều chỉnh", "Đối tượng áp dụng", "Giải thích từ ngữ", "Nguyên tắc sử dụng đất",
+    "Quyền của người sử dụng đất", "Nghĩa vụ của người sử dụng đất", "Thủ tục cấp giấy chứng nhận",
+    "Thẩm quyền thu hồi đất", "Bồi thường, hỗ trợ, tái định cư", "Giải quyết tranh chấp",
+    "Hợp đồng chuyển nhượng", "Thời hạn sử dụng đất", "Xử lý vi phạm", "Điều khoản chuyển tiếp",
+]
+
+POINTS = "abcdđeg"
+
+
+def _sentence(rng: random.Random) -> str:
+    return f"{rng.choice(SUBJECTS).capitalize()} {rng.choice(ACTIONS)} {rng.choice(OBJECTS)} {rng.choice(CONDITIONS)}."
+
+
+def _article(rng: random.Random, number: int):
+    title = f"## Điều {number}. {rng.choice(ARTICLE_TOPICS)}"
+    lines = [title]
+    for k in range(1, rng.randint(2, 5) + 1):
+        lines.append(f"- Khoản {k}. {_sentence(rng)}")
+        if rng.random() < 0.4:
+            for p in POINTS[:rng.randint(1, 4)]:
+                lines.append(f"{p}) {_sentence(rng)}")
+    return title, "\n".join(lines)
+
+
+def generate_corpus(n_chunks: int, articles_per_doc: int = 200, seed: int = 42):
+    """
+    Sinh corpus luật giả lập có cấu trúc Chương/Điều/Khoản, theo đúng dạng chunk của DocChunker
+    (mỗi chunk là một Điều, `title` là dòng "## Điều N. ..."). Trả về list (article, chunks).
+    """
+    rng = random.Random(seed)
+    docs = []
+    produced = 0
+    doc_idx = 0
+    while produced < n_chunks:
+        n_articles = min(articles_per_doc, n_chunks - produced)
+        law = LAW_NAMES[doc_idx % len(LAW_NAMES)]
+        title = f"{law} số {doc_idx + 1}/{2010 + doc_idx % 15}/QH{13 + doc_idx % 3}"
+
+        chunks = []
+        markdown_parts = [f"# {title}"]
+        articles_per_chapter = max(1, n_articles // rng.randint(3, 8))
+        for i in range(n_articles):
+            number = i + 1
+            chunk_title, markdown = _article(rng, number)
+            if i % articles_per_chapter == 0:
+                chapter = ROMAN[min(i // articles_per_chapter, len(ROMAN) - 1)]
+                heading = f"# Chương {chapter}"
+                markdown_parts.append(heading)
+                # Như DocChunker: dòng "Chương" (và phần mở đầu) dính vào chunk đứng trước nó,
+                # riêng chương đầu tiên nằm trong chunk Điều 1
+                if chunks:
+                    chunks[-1]["markdown"] += "\n" + heading
+                else:
+                    markdown = markdown.replace("\n", f"\n# {title}\n{heading}\n", 1)
+            markdown_parts.append(markdown)
+            chunks.append({"chunk_id": number, "title": chunk_title, "markdown": markdown})
+
+        article = {
+            "url": f"synthetic://{doc_idx + 1}",
+            "title": title,
+            "date": f"ngày {rng.randint(1, 28):02d} tháng {rng.randint(1, 12):02d} năm {2010 + doc_idx % 15}",
+            "markdown": "\n\n".join(markdown_parts),
+            "text": "",
+            "images": [],
+        }
+        docs.append((article, chunks))
+        produced += n_articles
+        doc_idx += 1
+    return docs
+
+
+def generate_queries(n_queries: int, seed: int = 7):
+    """Bộ truy vấn tất định trộn ba kiểu: "Điều N", cụm từ chính xác và câu hỏi tự nhiên."""
+    rng = random.Random(seed)
+    queries = []
+    for i in range(n_queries):
+        kind = i % 3
+        if kind == 0:
+            queries.append(f"Điều {rng.randint(1, 150)} quy định gì")
+        elif kind == 1:
+            queries.append(rng.choice(OBJECTS))
+        else:
+            queries.append(f"{rng.choice(SUBJECTS)} {rng.choice(ACTIONS)} {rng.choice(OBJECTS)} không")
+    return queries
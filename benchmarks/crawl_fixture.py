@@ -0,0 +1,137 @@
+"""
+Máy chủ HTTP cục bộ giả lập một trang văn bản luật để chạy crawler offline (benchmarks.crawler_bench).
+
+    /robots.txt          chặn /private/
+    /                    trang mục lục, link tới các văn bản (và một link /private/)
+    /luat/<i>.html       toàn văn văn bản thứ i sinh từ generate_corpus
+
+Mỗi trang có ETag/Last-Modified và trả 304 cho GET có điều kiện khớp. `mutate(i)` sửa nội dung văn bản i
+(đổi ETag) để kiểm tra crawl lại chỉ nạp trang đã đổi.
+"""
+import hashlib
+import html
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.corpus import generate_corpus
+
+
+def render_document(article: dict) -> str:
+    """Markdown của corpus -> HTML theo bố cục trang luật (div.content, mỗi đoạn một thẻ <p>)."""
+    body = []
+    for line in article["markdown"].split("\n"):
+        line = line.strip()
+        if not line or line == f"# {article['title']}":
+            continue
+        text = line.lstrip("#- ").strip()
+        body.append(f"<p>{html.escape(text)}</p>")
+    return (
+        f"<html><head><title>{html.escape(article['title'])}</title></head><body>"
+        f"<nav><a href='/'>Trang chủ</a></nav>"
+        f"<div class='content'><h1>{html.escape(article['title'])}</h1>"
+        f"<p>Hà Nội, {html.escape(article['date'])}</p>{''.join(body)}</div></body></html>"
+    )
+
+
+class LawSite:
+    """Nội dung các trang, phiên bản (để sinh ETag/Last-Modified) và bộ đếm request theo mã trả về."""
+
+    def __init__(self, n_docs: int, articles_per_doc: int = 30, latency_ms: float = 0.0, validators: bool = True):
+        corpus = generate_corpus(n_docs * articles_per_doc, articles_per_doc=articles_per_doc)
+        self.articles = [article for article, _ in corpus]
+        self.latency = latency_ms / 1000
+        self.validators = validators
+        self.pages = {}
+        self.modified = {}
+        self.requests = {}
+        self._lock = threading.Lock()
+        links = "".join(
+            f"<li><a href='/luat/{i}.html#top'>{html.escape(a['title'])}</a></li>" for i, a in enumerate(self.articles)
+        )
+        self._set("/", f"<html><body><h1>Văn bản pháp luật</h1><ul>{links}</ul>"
+                       f"<a href='/private/admin.html'>Quản trị</a><a href='/files/mau.pdf'>Mẫu</a></body></html>")
+        self._set("/private/admin.html", "<html><body>admin</body></html>")
+        for i, article in enumerate(self.articles):
+            self._set(f"/luat/{i}.html", render_document(article))
+
+    def _set(self, path: str, body: str):
+        self.pages[path] = body.encode("utf-8")
+        self.modified[path] = time.time()
+
+    def mutate(self, i: int):
+        """Thêm một khoản vào Điều 1 của văn bản i."""
+        path = f"/luat/{i}.html"
+        body = self.pages[path].decode("utf-8")
+        body = body.replace("</div>", "<p>Khoản bổ sung. Văn bản được sửa đổi, bổ sung theo quy định mới.</p></div>", 1)
+        with self._lock:
+            self._set(path, body)
+            # Last-Modified chỉ chính xác tới giây
+            self.modified[path] += 1
+
+    def count(self, status: int):
+        with self._lock:
+            self.requests[status] = self.requests.get(status, 0) + 1
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests = {}
+
+
+def _handler(site: LawSite):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: bytes = b"", headers: dict = None):
+            site.count(status)
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if site.latency:
+                time.sleep(site.latency)
+            path = self.path.split("?", 1)[0]
+            if path == "/robots.txt":
+                return self._send(200, b"User-agent: *\nDisallow: /private/\n", {"Content-Type": "text/plain"})
+            body = site.pages.get(path)
+            if body is None:
+                return self._send(404, b"not found", {"Content-Type": "text/plain"})
+
+            headers = {"Content-Type": "text/html; charset=utf-8"}
+            if site.validators:
+                etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+                last_modified = formatdate(site.modified[path], usegmt=True)
+                headers.update({"ETag": etag, "Last-Modified": last_modified})
+                if self.headers.get("If-None-Match") == etag:
+                    return self._send(304, headers=headers)
+            self._send(200, body, headers)
+
+    return Handler
+
+
+class FixtureServer:
+    """ThreadingHTTPServer chạy nền trên cổng ngẫu nhiên; dùng với `with`."""
+
+    def __init__(self, site: LawSite):
+        self.site = site
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(site))
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+        return False
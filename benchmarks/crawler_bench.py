@@ -0,0 +1,102 @@
+"""
+Benchmark/kiểm tra crawler (app.core.crawler) với máy chủ HTTP cục bộ (benchmarks.crawl_fixture), chạy offline.
+
+    python -m benchmarks.crawler_bench --docs 40 --latency-ms 50 --concurrency 1,8
+
+Các bước:
+    1. crawl lần đầu với từng mức concurrency (state mới): số trang/giây
+    2. crawl lại (--refresh): mọi trang phải trả 304, không nạp lại tài liệu nào
+    3. sửa 2 văn bản rồi crawl lại: chỉ 2 văn bản đó được nạp lại, thay cho bản cũ
+    4. dừng giữa chừng (max_pages) rồi chạy tiếp từ state: đủ số văn bản, không nạp trùng
+Trả exit code 1 nếu bước 2-4 sai. Encoder giả lập (FakeEncoder), DB trong bộ nhớ (InMemoryHandler).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+from app.core.crawler import Crawler, CrawlState
+from app.core.embedding_service import BatchingEncoder
+from app.utils.logger import logger
+from benchmarks.crawl_fixture import FixtureServer, LawSite
+from benchmarks.fakes import FakeEncoder, InMemoryHandler
+
+
+def crawl(server, db, encoder, state_path, concurrency, refresh=False, max_pages=None):
+    state = CrawlState(state_path)
+    try:
+        if refresh:
+            state.requeue()
+        server.site.reset_counts()
+        # Một host: politeness theo host bằng đúng concurrency, không delay, để đo thông lượng của pipeline
+        crawler = Crawler(db, encoder, state, [server.url], max_depth=1, max_pages=max_pages,
+                          concurrency=concurrency, per_host=concurrency, delay=0.0)
+        stats = asyncio.run(crawler.run())
+        stats["http"] = dict(server.site.requests)
+        return stats
+    finally:
+        state.close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--docs", type=int, default=40)
+    ap.add_argument("--articles", type=int, default=30, help="số Điều mỗi văn bản")
+    ap.add_argument("--latency-ms", type=float, default=50.0, help="độ trễ giả lập của máy chủ mỗi request")
+    ap.add_argument("--concurrency", default="1,8")
+    ap.add_argument("--embed-call-ms", type=float, default=5.0)
+    ap.add_argument("--embed-item-ms", type=float, default=0.5)
+    args = ap.parse_args(argv)
+
+    logger.remove()
+    encoder = BatchingEncoder(FakeEncoder(dim=256, call_ms=args.embed_call_ms, item_ms=args.embed_item_ms))
+    site = LawSite(args.docs, args.articles, latency_ms=args.latency_ms)
+    report = {"docs": args.docs, "articles_per_doc": args.articles, "latency_ms": args.latency_ms, "first_crawl": {}}
+    errors = []
+
+    with FixtureServer(site) as server, tempfile.TemporaryDirectory() as tmp:
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            db = InMemoryHandler()
+            state_path = os.path.join(tmp, f"state_{concurrency}.sqlite")
+            stats = crawl(server, db, encoder, state_path, concurrency)
+            stats["pages_per_s"] = round(stats["fetched"] / stats["elapsed_s"], 2)
+            report["first_crawl"][concurrency] = stats
+            print(json.dumps({"first_crawl": concurrency, **stats}, ensure_ascii=False), flush=True)
+            if stats["ingested"] != args.docs:
+                errors.append(f"crawl lần đầu (concurrency={concurrency}) nạp {stats['ingested']}/{args.docs} văn bản")
+
+        # Các bước sau dùng DB/state của lần crawl cuối
+        stats = crawl(server, db, encoder, state_path, concurrency, refresh=True)
+        report["recrawl"] = stats
+        if stats["ingested"] or stats["not_modified"] != stats["fetched"]:
+            errors.append(f"crawl lại không đổi: nạp {stats['ingested']}, 304 {stats['not_modified']}/{stats['fetched']}")
+
+        old_ids = set(db.articles)
+        site.mutate(0)
+        site.mutate(1)
+        stats = crawl(server, db, encoder, state_path, concurrency, refresh=True)
+        report["after_mutate"] = stats
+        replaced = old_ids - set(db.articles)
+        if stats["ingested"] != 2 or len(replaced) != 2 or len(db.articles) != args.docs:
+            errors.append(f"sau khi sửa 2 văn bản: nạp {stats['ingested']}, thay {len(replaced)}, còn {len(db.articles)}")
+
+        db = InMemoryHandler()
+        state_path = os.path.join(tmp, "state_resume.sqlite")
+        partial = crawl(server, db, encoder, state_path, concurrency, max_pages=args.docs // 2)
+        resumed = crawl(server, db, encoder, state_path, concurrency)
+        report["resume"] = {"partial": partial["ingested"], "resumed": resumed["ingested"], "articles": len(db.articles)}
+        if partial["ingested"] + resumed["ingested"] != args.docs or len(db.articles) != args.docs:
+            errors.append(f"chạy tiếp: {report['resume']}")
+
+    encoder.close()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if errors:
+        print("❌ " + "\n❌ ".join(errors))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
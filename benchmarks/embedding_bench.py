@@ -0,0 +1,78 @@
+"""
+So sánh encode truy vấn đồng thời: gọi model trực tiếp (batch 1) và qua BatchingEncoder.
+
+    python -m benchmarks.embedding_bench --concurrency 1,8,32 --call-ms 40 --item-ms 2
+
+Encoder giả lập có chi phí forward `call_ms` mỗi lượt + `item_ms` mỗi câu, các lượt chạy tuần tự
+(như một model CPU dùng hết các core), nên gom batch giúp chia chi phí cố định cho nhiều truy vấn.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+
+import numpy as np
+
+from app.core.embedding_service import BatchingEncoder
+from app.utils.logger import logger
+from benchmarks.corpus import generate_queries
+from benchmarks.fakes import FakeEncoder
+
+
+def run(encoder, concurrency: int, duration: float, queries) -> dict:
+    latencies = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(offset):
+        local = []
+        i = offset
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            encoder.encode(queries[i % len(queries)])
+            local.append(time.perf_counter() - start)
+            i += concurrency
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    arr = np.asarray(latencies) * 1000
+    return {
+        "qps": round(len(arr) / duration, 1),
+        "p50_ms": round(float(np.percentile(arr, 50)), 2),
+        "p95_ms": round(float(np.percentile(arr, 95)), 2),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--concurrency", default="1,8,32")
+    ap.add_argument("--duration", type=float, default=5.0)
+    ap.add_argument("--call-ms", type=float, default=40.0, help="Chi phí cố định mỗi lượt forward")
+    ap.add_argument("--item-ms", type=float, default=2.0, help="Chi phí thêm cho mỗi câu trong batch")
+    ap.add_argument("--batch-size", type=int, default=32)
+    ap.add_argument("--wait-ms", type=float, default=5.0)
+    args = ap.parse_args(argv)
+
+    logger.remove()
+    queries = generate_queries(200)
+    report = {}
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        model = FakeEncoder(dim=256, call_ms=args.call_ms, item_ms=args.item_ms)
+        batching = BatchingEncoder(model, args.batch_size, args.wait_ms)
+        report[concurrency] = {
+            "direct": run(model, concurrency, args.duration, queries),
+            "batching": run(batching, concurrency, args.duration, queries),
+        }
+        batching.close()
+        print(json.dumps({concurrency: report[concurrency]}), flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
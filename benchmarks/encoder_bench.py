@@ -0,0 +1,102 @@
+"""
+So sánh backend embedding PyTorch (SentenceTransformer) và ONNX Runtime (fp32 / int8): độ khớp và tốc độ.
+
+    python -m app.core.onnx_encoder --output models/vietnamese_embedding_onnx --quantize
+    python -m benchmarks.encoder_bench --onnx-dir models/vietnamese_embedding_onnx
+
+Độ khớp: cosine giữa embedding của từng câu so với PyTorch và tỉ lệ trùng top-5 khi tìm các chunk
+cho cùng truy vấn. Tốc độ: p50/p95 encode một truy vấn và số câu/giây khi encode chunk theo batch 32.
+Trả exit code 1 nếu cosine nhỏ nhất dưới ngưỡng (--min-cosine, --min-cosine-int8).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from app.core.onnx_encoder import MODEL_FILE, QUANTIZED_MODEL_FILE, OnnxEncoder
+from app.core.search import load_embed_model
+from app.utils.logger import logger
+from benchmarks.corpus import generate_corpus, generate_queries
+
+
+def _normalized(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def parity(reference, candidate, queries, chunks, top_k: int = 5) -> dict:
+    texts = queries + chunks
+    ref = _normalized(reference.encode(texts))
+    cand = _normalized(candidate.encode(texts))
+    cosines = (ref * cand).sum(axis=1)
+
+    ref_q, ref_c = ref[:len(queries)], ref[len(queries):]
+    cand_q, cand_c = cand[:len(queries)], cand[len(queries):]
+    ref_top = np.argsort(-(ref_q @ ref_c.T), axis=1)[:, :top_k]
+    cand_top = np.argsort(-(cand_q @ cand_c.T), axis=1)[:, :top_k]
+    overlap = np.mean([len(set(a) & set(b)) / top_k for a, b in zip(ref_top, cand_top)])
+    return {
+        "cosine_mean": round(float(cosines.mean()), 5),
+        "cosine_min": round(float(cosines.min()), 5),
+        f"top{top_k}_overlap": round(float(overlap), 4),
+    }
+
+
+def speed(encoder, queries, chunks, batch_size: int = 32) -> dict:
+    for query in queries[:3]:
+        encoder.encode(query)
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        encoder.encode(query)
+        samples.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    encoder.encode(chunks, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    arr = np.asarray(samples) * 1000
+    return {
+        "query_p50_ms": round(float(np.percentile(arr, 50)), 2),
+        "query_p95_ms": round(float(np.percentile(arr, 95)), 2),
+        "chunks_per_s": round(len(chunks) / elapsed, 1),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--onnx-dir", default=os.getenv("ONNX_MODEL_DIR", "models/vietnamese_embedding_onnx"))
+    ap.add_argument("--threads", type=int, default=0, help="intra-op threads của ONNX Runtime (0 = tự chọn)")
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--chunks", type=int, default=200)
+    ap.add_argument("--min-cosine", type=float, default=0.999)
+    ap.add_argument("--min-cosine-int8", type=float, default=0.97)
+    args = ap.parse_args(argv)
+
+    logger.remove()
+    queries = generate_queries(args.queries)
+    chunks = [c["markdown"] for _, doc_chunks in generate_corpus(args.chunks) for c in doc_chunks]
+
+    reference = load_embed_model("torch")
+    reference.max_seq_length = 512
+    report = {"torch": {"speed": speed(reference, queries, chunks)}}
+    thresholds = {}
+    for name, quantized, threshold in (("onnx_fp32", False, args.min_cosine), ("onnx_int8", True, args.min_cosine_int8)):
+        if not os.path.exists(os.path.join(args.onnx_dir, QUANTIZED_MODEL_FILE if quantized else MODEL_FILE)):
+            continue
+        encoder = OnnxEncoder(args.onnx_dir, quantized=quantized, threads=args.threads)
+        report[name] = {"parity": parity(reference, encoder, queries, chunks), "speed": speed(encoder, queries, chunks)}
+        thresholds[name] = threshold
+        print(json.dumps({name: report[name]}, ensure_ascii=False), flush=True)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    failed = [name for name, threshold in thresholds.items() if report[name]["parity"]["cosine_min"] < threshold]
+    if failed:
+        print(f"❌ Cosine thấp hơn ngưỡng: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
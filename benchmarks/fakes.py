@@ -0,0 +1,198 @@
+import json
+import re
+import threading
+import time
+import zlib
+import numpy as np
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+class FakeEncoder:
+    """
+    Encoder giả lập, tất định, chạy offline thay cho SentenceTransformer.
+
+    Mỗi token được gán một vector ngẫu nhiên cố định (seed theo crc32 của token);
+    embedding của văn bản là tổng các vector token đã chuẩn hóa L2, nên các văn bản
+    chung từ vựng vẫn có cosine cao như một mô hình thật.
+    """
+
+    def __init__(self, dim: int = 1024, call_ms: float = 0.0, item_ms: float = 0.0):
+        """`call_ms`/`item_ms`: giả lập chi phí forward (cố định mỗi lượt + theo số câu), các lượt chạy tuần tự như trên CPU."""
+        self.dim = dim
+        self._vocab = {}
+        self._table = np.zeros((0, dim), dtype=np.float32)
+        self.max_seq_length = 512
+        self.call_ms = call_ms
+        self.item_ms = item_ms
+        self._cpu = threading.Lock()
+
+    def _token_ids(self, text: str):
+        ids = []
+        new_tokens = []
+        for token in TOKEN_RE.findall(text.lower()):
+            idx = self._vocab.get(token)
+            if idx is None:
+                idx = self._vocab[token] = len(self._vocab)
+                new_tokens.append(token)
+            ids.append(idx)
+        if new_tokens:
+            rows = [
+                np.random.default_rng(zlib.crc32(t.encode("utf-8"))).standard_normal(self.dim).astype(np.float32)
+                for t in new_tokens
+            ]
+            self._table = np.vstack([self._table, np.stack(rows)])
+        return ids
+
+    def encode(self, sentences, batch_size: int = 256, normalize_embeddings: bool = True, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if self.call_ms or self.item_ms:
+            with self._cpu:
+                time.sleep((self.call_ms + self.item_ms * len(texts)) / 1000)
+
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            batch = [self._token_ids(t) for t in texts[start:start + batch_size]]
+            counts = np.zeros((len(batch), len(self._vocab)), dtype=np.float32)
+            for row, ids in enumerate(batch):
+                np.add.at(counts[row], ids, 1.0)
+            out[start:start + len(batch)] = counts @ self._table
+
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        out /= np.maximum(norms, 1e-12)
+        return out[0] if single else out
+
+
+class InMemoryHandler:
+    """Bản thay thế PostgresHandler lưu articles/chunks trong bộ nhớ, cùng giao diện đọc/ghi."""
+
+    def __init__(self):
+        self.articles = {}
+        self.chunks = {}
+        self._next_id = 1
+
+    def insert_article(self, data):
+        article_id = self._next_id
+        self._next_id += 1
+        self.articles[article_id] = {
+            "id": article_id,
+            "url": data.get("url", ""),
+            "title": data.get("title", ""),
+            "date": data.get("date", ""),
+            "markdown": data.get("markdown", ""),
+            "text": data.get("text", ""),
+            "images": data.get("images", []),
+        }
+        self.chunks[article_id] = []
+        return article_id
+
+    def insert_chunks(self, doc_id, chunks):
+        rows = self.chunks.setdefault(doc_id, [])
+        for chunk in chunks:
+            vector = chunk.get("vector")
+            rows.append({
+                "doc_id": chunk.get("doc_id", doc_id),
+                "chunk_id": chunk.get("chunk_id"),
+                "title": chunk.get("title", ""),
+                "markdown": chunk.get("markdown", ""),
+                # Lưu dạng JSON text như cột JSONB, giải mã lại mỗi lần fetch giống psycopg2
+                "vector": json.dumps([float(x) for x in vector]) if vector is not None else None,
+            })
+
+    def insert_document(self, data, chunks, replace_id=None):
+        if replace_id is not None:
+            self.delete_article(replace_id)
+        doc_id = self.insert_article(data)
+        self.insert_chunks(doc_id, [{**chunk, "doc_id": doc_id} for chunk in chunks])
+        return doc_id
+
+    @staticmethod
+    def _row(chunk, include_vector=True):
+        row = dict(chunk)
+        # psycopg2 giải mã mỗi dòng thành chuỗi mới; không dùng chung chuỗi với dữ liệu lưu ở đây
+        for key in ("title", "markdown"):
+            if row[key] is not None:
+                row[key] = row[key].encode("utf-8").decode("utf-8")
+        if include_vector:
+            row["vector"] = json.loads(row["vector"]) if row["vector"] is not None else None
+        else:
+            row.pop("vector", None)
+        return row
+
+    def delete_article(self, article_id):
+        self.chunks.pop(article_id, None)
+        return self.articles.pop(article_id, None) is not None
+
+    def fetch_all_articles(self):
+        return [dict(a) for _, a in sorted(self.articles.items())]
+
+    def get_all_articles(self):
+        return [{"id": a["id"], "title": a["title"], "date": a["date"]} for a in self.articles.values()]
+
+    def corpus_fingerprint(self):
+        return {
+            "articles": len(self.articles),
+            "max_article_id": max(self.articles, default=0),
+            "chunks": sum(len(rows) for rows in self.chunks.values()),
+        }
+
+    def vector_dims(self):
+        dims = {}
+        for rows in self.chunks.values():
+            for chunk in rows:
+                if chunk["vector"] is not None:
+                    dim = len(json.loads(chunk["vector"]))
+                    dims[dim] = dims.get(dim, 0) + 1
+        return dims
+
+    def fetch_article_by_id(self, article_id):
+        article = self.articles.get(article_id)
+        return dict(article) if article else None
+
+    def fetch_chunks_by_doc_id(self, doc_id):
+        return [self._row(c) for c in sorted(self.chunks.get(doc_id, []), key=lambda c: c["chunk_id"])]
+
+    def iter_corpus(self, batch_size=1000):
+        for _, article in sorted(self.articles.items()):
+            yield "article", dict(article)
+        for key in sorted(self.chunks):
+            for chunk in sorted(self.chunks[key], key=lambda c: c["chunk_id"]):
+                yield "chunk", self._row(chunk)
+
+    def copy_corpus(self, articles, chunks, replace=False, expected=None):
+        if not replace and self.articles:
+            raise ValueError("Bảng articles đã có dữ liệu; dùng replace=True để thay toàn bộ corpus")
+        # Như một transaction: lỗi giữa chừng thì trả lại corpus cũ
+        previous = (self.articles, self.chunks)
+        self.articles, self.chunks = {}, {}
+        try:
+            counts = {"articles": 0, "chunks": 0}
+            for article in articles:
+                self.articles[article["id"]] = {key: article.get(key) for key in
+                                                ("id", "url", "title", "date", "markdown", "text", "images")}
+                self.chunks[article["id"]] = []
+                counts["articles"] += 1
+            for chunk in chunks:
+                self.insert_chunks(chunk["doc_id"], [chunk])
+                counts["chunks"] += 1
+            if expected is not None and (counts["articles"], counts["chunks"]) != (expected["articles"], expected["chunks"]):
+                raise ValueError(f"Số dòng đã đọc {counts} khác số dòng cần nạp {expected}")
+        except Exception:
+            self.articles, self.chunks = previous
+            raise
+        self._next_id = max(self.articles, default=0) + 1
+        return counts
+
+    def fetch_chunks_page(self, doc_id=None, after=None, limit=100, include_vector=False):
+        rows = []
+        for key in sorted(self.chunks):
+            if doc_id is not None and key != doc_id:
+                continue
+            for chunk in sorted(self.chunks[key], key=lambda c: c["chunk_id"]):
+                if after is not None and (chunk["doc_id"], chunk["chunk_id"]) <= tuple(after):
+                    continue
+                rows.append(self._row(chunk, include_vector))
+                if limit is not None and len(rows) >= limit:
+                    return rows
+        return rows
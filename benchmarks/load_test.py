@@ -0,0 +1,141 @@
+"""
+Load test end-to-end cho API: /chat, /search/* và /upload/ ở mức concurrency cho trước.
+
+Chạy API với LLM giả lập để không tốn tiền/quota:
+
+    LLM_PROVIDER=fake FAKE_LLM_LATENCY_MS=800 uvicorn app.api.api:app --workers 2
+    python -m benchmarks.load_test --concurrency 32 --duration 60 --mix chat=0.6,hybrid=0.2,vector=0.1,keyword=0.1
+
+Báo cáo số request, lỗi, requests/sec và p50/p95/p99 cho từng endpoint.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import requests
+
+from benchmarks.corpus import generate_queries
+
+ENDPOINTS = ("chat", "vector", "keyword", "hybrid", "upload")
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Endpoint '{name}' không hợp lệ, chọn trong {ENDPOINTS}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class LoadTest:
+    def __init__(self, base_url, mix, top_k=5, model_llm=None, upload_file=None, timeout=60.0, seed=0):
+        self.base_url = base_url.rstrip("/")
+        self.names = list(mix)
+        self.weights = [mix[n] for n in self.names]
+        self.top_k = top_k
+        self.model_llm = model_llm
+        self.upload_file = Path(upload_file) if upload_file else None
+        self.timeout = timeout
+        self.queries = generate_queries(200, seed=seed)
+        self.seed = seed
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def _request(self, session: requests.Session, name: str, query: str):
+        if name == "chat":
+            body = {"query": query, "mode": "hybrid", "top_k": self.top_k}
+            if self.model_llm:
+                body["model_llm"] = self.model_llm
+            return session.post(f"{self.base_url}/chat", json=body, timeout=self.timeout)
+        if name == "upload":
+            with open(self.upload_file, "rb") as f:
+                files = {"file": (self.upload_file.name, f, DOCX_MIME)}
+                return session.post(f"{self.base_url}/upload/", files=files, timeout=self.timeout)
+        return session.get(
+            f"{self.base_url}/search/{name}/",
+            params={"query": query, "top_k": self.top_k},
+            timeout=self.timeout,
+        )
+
+    def worker(self, worker_id: int, deadline: float):
+        rng = random.Random(self.seed * 1000 + worker_id)
+        with requests.Session() as session:
+            while time.perf_counter() < deadline:
+                name = rng.choices(self.names, self.weights)[0]
+                query = rng.choice(self.queries)
+                start = time.perf_counter()
+                try:
+                    ok = self._request(session, name, query).status_code < 400
+                except requests.RequestException:
+                    ok = False
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.latencies[name].append(elapsed)
+                    if not ok:
+                        self.errors[name] += 1
+
+    def run(self, concurrency: int, duration: float) -> dict:
+        if "upload" in self.names and not self.upload_file:
+            raise ValueError("Cần --upload-file khi mix có 'upload'")
+        start = time.perf_counter()
+        deadline = start + duration
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for i in range(concurrency):
+                pool.submit(self.worker, i, deadline)
+        wall = time.perf_counter() - start
+        return self.report(wall, concurrency)
+
+    def report(self, wall: float, concurrency: int) -> dict:
+        result = {"concurrency": concurrency, "wall_s": round(wall, 2), "endpoints": {}}
+        total = 0
+        for name, samples in sorted(self.latencies.items()):
+            arr = np.asarray(samples) * 1000
+            total += len(samples)
+            result["endpoints"][name] = {
+                "requests": len(samples),
+                "errors": self.errors[name],
+                "rps": round(len(samples) / wall, 2),
+                "p50_ms": round(float(np.percentile(arr, 50)), 1),
+                "p95_ms": round(float(np.percentile(arr, 95)), 1),
+                "p99_ms": round(float(np.percentile(arr, 99)), 1),
+            }
+        result["total_requests"] = total
+        result["total_rps"] = round(total / wall, 2)
+        return result
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--base-url", default="http://localhost:8000")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=30.0, help="Thời gian chạy (giây)")
+    ap.add_argument("--mix", default="chat=0.6,hybrid=0.2,vector=0.1,keyword=0.1",
+                    help="Tỉ trọng endpoint: chat, vector, keyword, hybrid, upload")
+    ap.add_argument("--top-k", type=int, default=5)
+    ap.add_argument("--model-llm", default=None, help="vd. 'fake' để dùng LLM giả lập theo từng request")
+    ap.add_argument("--upload-file", default=None, help="File .docx dùng cho endpoint upload")
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    test = LoadTest(args.base_url, parse_mix(args.mix), top_k=args.top_k, model_llm=args.model_llm,
+                    upload_file=args.upload_file, timeout=args.timeout, seed=args.seed)
+    print(f"▶ Load test {args.base_url} | concurrency={args.concurrency} | duration={args.duration}s", flush=True)
+    print(json.dumps(test.run(args.concurrency, args.duration), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""
+Đo chi phí log trên mỗi request với các cấu hình sink khác nhau.
+
+    python -m benchmarks.logging_bench --requests 1000 --items 50 --gap-ms 10
+
+Mỗi "request" phát ra các log giống một lần /search (3 dòng INFO) cộng `--items` dòng DEBUG
+theo từng phần tử như vòng lặp nạp chunks. So sánh cấu hình cũ (sink đồng bộ, diagnose bật,
+không giới hạn log vòng lặp) với cấu hình mới (thread ghi nền, profile production, should_log).
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from app.utils import logger as logging_setup
+from app.utils.logger import logger, setup_logging, flush_logging
+
+CONFIGS = {
+    "sync+diagnose": {"enqueue": False, "profile": "development", "throttle": False},
+    "queued+diagnose": {"enqueue": True, "profile": "development", "throttle": False},
+    "queued+production": {"enqueue": True, "profile": "production", "throttle": False},
+    "queued+production+throttle": {"enqueue": True, "profile": "production", "throttle": True},
+}
+
+
+def emit_request(i: int, items: int, throttle):
+    logger.info(f"🔍 Hybrid search: 'câu hỏi {i}' | top_k=5 | alpha=0.6")
+    logger.info("Thực hiện hybrid search: query='{}' | top_k={} | alpha={}", f"câu hỏi {i}", 5, 0.6)
+    for j in range(items):
+        if throttle is None or throttle.allow("bench.item"):
+            logger.debug("Bài viết id={} có {} chunks", j, 42)
+    logger.info("Hybrid search trả về {} kết quả", 5)
+
+
+def bench(name: str, config: dict, requests: int, items: int, gap_s: float) -> dict:
+    throttle = logging_setup._LogThrottle(logging_setup.LOG_THROTTLE_PER_SEC) if config["throttle"] else None
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull:
+        setup_logging(level="DEBUG", profile=config["profile"], enqueue=config["enqueue"],
+                      log_dir=tmp, console=devnull)
+        samples = []
+        for i in range(requests):
+            start = time.perf_counter()
+            emit_request(i, items, throttle)
+            samples.append(time.perf_counter() - start)
+            time.sleep(gap_s)
+        start = time.perf_counter()
+        flush_logging()
+        drain_s = time.perf_counter() - start
+        logger.remove()
+
+    arr = np.asarray(samples) * 1e6
+    return {
+        "config": name,
+        "p50_us": round(float(np.percentile(arr, 50)), 1),
+        "p99_us": round(float(np.percentile(arr, 99)), 1),
+        "mean_us": round(float(arr.mean()), 1),
+        "drain_s": round(drain_s, 3),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--requests", type=int, default=1000)
+    ap.add_argument("--items", type=int, default=50, help="Số log DEBUG theo phần tử trong mỗi request")
+    ap.add_argument("--gap-ms", type=float, default=10.0,
+                    help="Thời gian nghỉ giữa hai request (giả lập phần xử lý không phải log, không tính vào kết quả)")
+    args = ap.parse_args(argv)
+
+    results = [bench(name, cfg, args.requests, args.items, args.gap_ms / 1000) for name, cfg in CONFIGS.items()]
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    setup_logging()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
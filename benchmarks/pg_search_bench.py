@@ -0,0 +1,157 @@
+"""
+So sánh backend tìm kiếm Postgres (app.core.pg_search) với SearchEngine trong bộ nhớ trên cùng corpus giả lập.
+
+    PG_HOST=localhost PG_USER=postgres PG_PWD=... python -m benchmarks.pg_search_bench --db chatbot_bench --sizes 2000,20000
+    python -m benchmarks.pg_search_bench --db chatbot_bench --vector off     # không dùng pgvector
+
+Cần một Postgres đang chạy (có pgvector để đo HNSW). Bảng articles/chunks của database --db bị xóa và tạo lại
+cho mỗi kích thước corpus, không chạy trên database thật.
+
+Đo: thời gian nạp corpus (COPY) và dựng cột/chỉ mục tìm kiếm, thời gian khởi động và RSS tăng thêm của mỗi engine,
+độ trễ p50/p95 từng mode (tắt cache), thông lượng khi nhiều thread cùng truy vấn, và độ trùng top-k (và dãy điểm) với
+backend bộ nhớ (với vector search là recall của HNSW so với quét chính xác).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.logger import logger
+from benchmarks.corpus import generate_corpus, generate_queries
+from benchmarks.fakes import FakeEncoder
+from benchmarks.search_bench import MODES, percentiles, rss_mb, run_search
+
+
+def reset_database(handler):
+    handler.create_database()
+    handler.connect()
+    handler.cursor.execute("DROP TABLE IF EXISTS chunks; DROP TABLE IF EXISTS articles")
+    handler.conn.commit()
+    handler.create_articles_table()
+    handler.create_chunks_table()
+
+
+def load_corpus(handler, n_chunks: int, encoder: FakeEncoder) -> float:
+    docs = generate_corpus(n_chunks)
+    articles, chunks = [], []
+    for doc_id, (article, doc_chunks) in enumerate(docs, start=1):
+        articles.append({**article, "id": doc_id})
+        vectors = encoder.encode([c["markdown"] for c in doc_chunks])
+        for chunk, vector in zip(doc_chunks, vectors):
+            chunks.append({**chunk, "doc_id": doc_id, "vector": vector.tolist()})
+    start = time.perf_counter()
+    handler.copy_corpus(articles, chunks)
+    return time.perf_counter() - start
+
+
+def timed_engine(factory):
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    engine = factory()
+    startup_s = time.perf_counter() - start
+    engine.result_cache.maxsize = 0
+    engine.query_cache.maxsize = 0
+    return engine, round(startup_s, 3), round(rss_mb() - rss_before, 2)
+
+
+def latencies(engine, queries, top_k: int) -> dict:
+    out = {}
+    for mode in MODES:
+        for query in queries[:3]:
+            run_search(engine, mode, query, top_k)
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            run_search(engine, mode, query, top_k)
+            samples.append(time.perf_counter() - start)
+        out[mode] = percentiles(samples)
+    return out
+
+
+def throughput(engine, queries, top_k: int, threads: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda q: run_search(engine, "hybrid", q, top_k), queries))
+    return round(len(queries) / (time.perf_counter() - start), 1)
+
+
+def overlap(pg_engine, memory_engine, queries, top_k: int) -> dict:
+    """
+    Theo từng mode: tỉ lệ trung bình (doc_id, chunk_id) trong top-k của backend Postgres cũng có trong top-k của
+    backend bộ nhớ, và tỉ lệ truy vấn có cùng dãy điểm top-k. Hai backend phá hòa điểm khác nhau (ts_rank so với
+    thứ tự trong corpus) nên keyword có thể trùng thấp dù điểm giống hệt.
+    """
+    out = {}
+    for mode in MODES:
+        ratios, same_scores = [], 0
+        for query in queries:
+            expected = run_search(memory_engine, mode, query, top_k)
+            got = run_search(pg_engine, mode, query, top_k)
+            same_scores += [round(r["score"], 3) for r in got] == [round(r["score"], 3) for r in expected]
+            if expected:
+                keys = {(r["doc_id"], r["chunk_id"]) for r in expected}
+                ratios.append(len({(r["doc_id"], r["chunk_id"]) for r in got} & keys) / len(keys))
+        out[mode] = {"overlap": round(sum(ratios) / max(1, len(ratios)), 3),
+                     "same_scores": round(same_scores / max(1, len(queries)), 3)}
+    return out
+
+
+def bench_size(n_chunks: int, args) -> dict:
+    from app.core.pg_search import PgSearchEngine, migrate_search_schema
+    from app.core.search import SearchEngine
+    from app.db.db_handler import PostgresHandler
+
+    encoder = FakeEncoder(dim=args.dim)
+    handler = PostgresHandler()
+    reset_database(handler)
+    result = {"chunks": n_chunks, "copy_s": round(load_corpus(handler, n_chunks, encoder), 3)}
+    queries = generate_queries(args.queries)
+
+    # Migration (scripts.pg_search_migrate): thêm cột sinh, GIN, HNSW trên dữ liệu đã có
+    start = time.perf_counter()
+    migrate_search_schema(handler, args.vector, dim=args.dim)
+    result["schema_build_s"] = round(time.perf_counter() - start, 3)
+
+    pg_engine, startup_s, rss = timed_engine(
+        lambda: PgSearchEngine(db=PostgresHandler(), embed_model=encoder, vector=args.vector)
+    )
+    result["pgvector"] = pg_engine.use_pgvector
+    result["postgres"] = {"startup_s": startup_s, "rss_mb": rss}
+    memory_engine, startup_s, rss = timed_engine(lambda: SearchEngine(db=handler, embed_model=encoder, snapshot=None))
+    result["memory"] = {"startup_s": startup_s, "rss_mb": rss}
+
+    for name, engine in (("postgres", pg_engine), ("memory", memory_engine)):
+        result[name].update(latencies(engine, queries, args.top_k))
+        result[name]["hybrid_qps"] = throughput(engine, queries, args.top_k, args.threads)
+    result["agreement_at_k"] = overlap(pg_engine, memory_engine, queries, args.top_k)
+    pg_engine.pool.closeall()
+    handler.close()
+    return result
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db", default="chatbot_bench", help="database dùng để benchmark (bị xóa dữ liệu)")
+    ap.add_argument("--sizes", default="2000,20000")
+    ap.add_argument("--dim", type=int, default=1024)
+    ap.add_argument("--queries", type=int, default=60)
+    ap.add_argument("--top-k", type=int, default=5)
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--vector", default="auto", choices=("auto", "on", "off"))
+    args = ap.parse_args(argv)
+
+    # PostgresHandler đọc DB_NAME khi khởi tạo
+    os.environ["DB_NAME"] = args.db
+    logger.remove()
+    report = {}
+    for size in (int(s) for s in args.sizes.split(",")):
+        report[size] = bench_size(size, args)
+        print(json.dumps(report[size], ensure_ascii=False), flush=True)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
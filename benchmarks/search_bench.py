@@ -0,0 +1,189 @@
+"""
+Benchmark tìm kiếm của SearchEngine trên corpus luật giả lập, chạy offline.
+
+    python -m benchmarks.search_bench --sizes 1000,10000
+    python -m benchmarks.search_bench --sizes 1000,10000 --save-baseline
+    python -m benchmarks.search_bench --sizes 1000,10000 --compare
+
+Đo độ trễ p50/p95/p99 của vector/keyword/hybrid search, thời gian khởi tạo (load từ DB),
+thời gian build lại index (refresh), bộ nhớ của index (tracemalloc) và RSS tiến trình tăng thêm. Kết quả baseline lưu ở
+benchmarks/baseline.json; --compare trả exit code 1 nếu có chỉ số chậm hơn quá ngưỡng.
+"""
+import argparse
+import ctypes
+import gc
+import os
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from app.core.search import SearchEngine
+from app.utils.logger import logger
+from benchmarks.corpus import generate_corpus, generate_queries
+from benchmarks.fakes import FakeEncoder, InMemoryHandler
+
+BASELINE_FILE = Path(__file__).with_name("baseline.json")
+MODES = ("vector", "keyword", "hybrid")
+
+
+def build_handler(n_chunks: int, encoder: FakeEncoder, seed: int = 42) -> InMemoryHandler:
+    handler = InMemoryHandler()
+    for article, chunks in generate_corpus(n_chunks, seed=seed):
+        doc_id = handler.insert_article(article)
+        vectors = encoder.encode([c["markdown"] for c in chunks])
+        for chunk, vector in zip(chunks, vectors):
+            chunk["doc_id"] = doc_id
+            chunk["vector"] = vector.tolist()
+        handler.insert_chunks(doc_id, chunks)
+    return handler
+
+
+def rss_mb() -> float:
+    """RSS hiện tại của tiến trình (Linux), sau khi trả bộ nhớ heap đã giải phóng về hệ điều hành."""
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except OSError:
+        pass
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def percentiles(samples):
+    arr = np.asarray(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p95_ms": round(float(np.percentile(arr, 95)), 3),
+        "p99_ms": round(float(np.percentile(arr, 99)), 3),
+        "mean_ms": round(float(arr.mean()), 3),
+    }
+
+
+def run_search(engine: SearchEngine, mode: str, query: str, top_k: int):
+    if mode == "vector":
+        return engine.vector_search(query, top_k=top_k)
+    if mode == "keyword":
+        return engine.keyword_search(query, top_k=top_k)
+    return engine.hybrid_search(query, top_k=top_k, alpha=0.6)
+
+
+def bench_size(n_chunks: int, dim: int, n_queries: int, top_k: int, use_cache: bool = False) -> dict:
+    encoder = FakeEncoder(dim=dim)
+    handler = build_handler(n_chunks, encoder)
+    queries = generate_queries(n_queries)
+
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    engine = SearchEngine(db=handler, embed_model=encoder)
+    startup_s = time.perf_counter() - start
+    engine_rss_mb = rss_mb() - rss_before
+
+    start = time.perf_counter()
+    engine.refresh()
+    index_build_s = time.perf_counter() - start
+
+    del engine
+    gc.collect()
+    tracemalloc.start()
+    engine = SearchEngine(db=handler, embed_model=encoder)
+    index_memory_mb = tracemalloc.get_traced_memory()[0] / 2 ** 20
+    tracemalloc.stop()
+    if not use_cache:
+        # Đo chi phí tìm kiếm thật, không để các truy vấn lặp lại trúng cache kết quả
+        engine.result_cache.maxsize = 0
+        engine.query_cache.maxsize = 0
+
+    result = {
+        "chunks": n_chunks,
+        "startup_s": round(startup_s, 4),
+        "index_build_s": round(index_build_s, 4),
+        "index_memory_mb": round(index_memory_mb, 2),
+        "rss_mb": round(engine_rss_mb, 2),
+        "rss_mb_per_10k": round(engine_rss_mb * 10000 / n_chunks, 2),
+    }
+    for mode in MODES:
+        for query in queries[:3]:
+            run_search(engine, mode, query, top_k)
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            run_search(engine, mode, query, top_k)
+            samples.append(time.perf_counter() - start)
+        result[mode] = percentiles(samples)
+    return result
+
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """Trả về danh sách chỉ số chậm hơn baseline quá `tolerance` (tỉ lệ)."""
+    regressions = []
+    for size, current in results.items():
+        base = baseline.get("results", {}).get(size)
+        if not base:
+            continue
+        checks = [("startup_s", current["startup_s"], base["startup_s"]),
+                  ("index_build_s", current["index_build_s"], base["index_build_s"])]
+        for mode in MODES:
+            for key in ("p50_ms", "p95_ms"):
+                checks.append((f"{mode}.{key}", current[mode][key], base[mode][key]))
+        for name, now, before in checks:
+            if before > 0 and now > before * (1 + tolerance):
+                regressions.append(f"{size} chunks | {name}: {before} -> {now} (+{(now / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="1000,10000", help="Danh sách số chunks, vd. 1000,10000,100000")
+    ap.add_argument("--dim", type=int, default=1024, help="Số chiều embedding (mô hình thật: 1024)")
+    ap.add_argument("--queries", type=int, default=30, help="Số truy vấn cho mỗi chế độ")
+    ap.add_argument("--top-k", type=int, default=5)
+    ap.add_argument("--cache", action="store_true", help="Bật cache kết quả khi đo (mặc định tắt)")
+    ap.add_argument("--save-baseline", action="store_true", help="Ghi kết quả vào benchmarks/baseline.json")
+    ap.add_argument("--compare", action="store_true", help="So sánh với baseline, exit 1 nếu chậm hơn")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="Ngưỡng chậm hơn cho phép (0.2 = 20%%)")
+    ap.add_argument("--log-level", default="WARNING", help="Mức log khi chạy benchmark")
+    args = ap.parse_args(argv)
+
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+
+    results = {}
+    for size in (int(s) for s in args.sizes.split(",")):
+        print(f"▶ Benchmark {size} chunks (dim={args.dim}) ...", flush=True)
+        results[str(size)] = bench_size(size, args.dim, args.queries, args.top_k, args.cache)
+        print(json.dumps(results[str(size)], ensure_ascii=False, indent=2), flush=True)
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "dim": args.dim,
+        "queries": args.queries,
+        "top_k": args.top_k,
+        "results": results,
+    }
+
+    if args.save_baseline:
+        BASELINE_FILE.write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"💾 Đã lưu baseline vào {BASELINE_FILE}")
+
+    if args.compare:
+        if not BASELINE_FILE.exists():
+            print("⚠️ Chưa có baseline, chạy lại với --save-baseline")
+            return 1
+        regressions = compare(results, json.loads(BASELINE_FILE.read_text(encoding="utf-8")), args.tolerance)
+        if regressions:
+            print("❌ Phát hiện chậm hơn baseline:")
+            for line in regressions:
+                print("  - " + line)
+            return 1
+        print("✅ Không có chỉ số nào chậm hơn baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
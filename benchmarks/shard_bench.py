@@ -0,0 +1,69 @@
+"""
+Đo khả năng mở rộng theo số core của vector search chia shard (scatter-gather, app.core.search.sharded_top_k).
+
+    OPENBLAS_NUM_THREADS=1 OMP_NUM_THREADS=1 python -m benchmarks.shard_bench --rows 200000 --shards 1,2,4,8
+
+Ma trận embeddings ngẫu nhiên (float32, đã chuẩn hóa), đo p50/p95 một truy vấn và kiểm tra top-k
+trùng với cách chấm điểm một luồng. Nên giới hạn BLAS một thread để mỗi shard dùng đúng một core.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.core.search import sharded_top_k, top_k_indices
+
+
+def measure(fn, queries):
+    fn(queries[0])
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        samples.append(time.perf_counter() - start)
+    arr = np.asarray(samples) * 1000
+    return round(float(np.percentile(arr, 50)), 3), round(float(np.percentile(arr, 95)), 3)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=200000)
+    ap.add_argument("--dim", type=int, default=1024)
+    ap.add_argument("--shards", default=",".join(str(n) for n in (1, 2, 4, 8) if n <= (os.cpu_count() or 1)) or "1")
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--top-k", type=int, default=5)
+    args = ap.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((args.rows, args.dim), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    queries = [matrix[i] + 0.1 * rng.standard_normal(args.dim, dtype=np.float32) for i in range(args.queries)]
+
+    def single(query):
+        scores = matrix @ query
+        top = top_k_indices(scores, args.top_k)
+        return top, scores[top]
+
+    base_p50, base_p95 = measure(single, queries)
+    report = {"rows": args.rows, "dim": args.dim, "cpu_count": os.cpu_count(),
+              "single": {"p50_ms": base_p50, "p95_ms": base_p95}, "sharded": {}}
+    for n_shards in (int(s) for s in args.shards.split(",")):
+        with ThreadPoolExecutor(n_shards, thread_name_prefix="vector-shard") as pool:
+            def sharded(query):
+                return sharded_top_k(matrix, query, args.top_k, pool, n_shards)
+
+            same = all(np.array_equal(sharded(q)[0], single(q)[0]) for q in queries)
+            p50, p95 = measure(sharded, queries)
+        report["sharded"][n_shards] = {"p50_ms": p50, "p95_ms": p95, "speedup": round(base_p50 / p50, 2), "same_top_k": same}
+        print(json.dumps({n_shards: report["sharded"][n_shards]}), flush=True)
+
+    print(json.dumps(report, indent=2))
+    return 0 if all(r["same_top_k"] for r in report["sharded"].values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
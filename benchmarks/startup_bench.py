@@ -0,0 +1,77 @@
+"""
+Đo thời gian import và khởi động API.
+
+    python -m benchmarks.startup_bench                 # chỉ đo import
+    python -m benchmarks.startup_bench --serve         # thêm thời gian tới /healthz và /readyz
+
+Mỗi phép đo import chạy trong tiến trình Python mới để không bị cache module.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+HEAVY_MODULES = ("app.api.api", "sentence_transformers", "openai", "google.generativeai", "sklearn")
+
+
+def import_time(module: str) -> float:
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if proc.returncode != 0:
+        return None
+    return round(float(proc.stdout.strip().splitlines()[-1]), 3)
+
+
+def wait_for(url: str, deadline: float):
+    while time.perf_counter() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    return False
+
+
+def serve_times(port: int, timeout: float) -> dict:
+    env = dict(os.environ, STARTUP_MODE=os.getenv("STARTUP_MODE", "background"))
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.api.api:app", "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = start + timeout
+        base = f"http://127.0.0.1:{port}"
+        result = {}
+        if wait_for(f"{base}/healthz", deadline):
+            result["healthz_s"] = round(time.perf_counter() - start, 3)
+        if wait_for(f"{base}/readyz", deadline):
+            result["readyz_s"] = round(time.perf_counter() - start, 3)
+            result["startup_timings"] = requests.get(f"{base}/readyz", timeout=1).json().get("timings")
+        return result
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--serve", action="store_true", help="Khởi động uvicorn và đo thời gian tới /healthz, /readyz")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--timeout", type=float, default=300.0)
+    args = ap.parse_args(argv)
+
+    report = {"import_s": {m: import_time(m) for m in HEAVY_MODULES}}
+    if args.serve:
+        report["serve"] = serve_times(args.port, args.timeout)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+Export/import corpus theo luồng (xem app.core.corpus_bundle) để seed node mới hoặc sao lưu.
+
+    python -m scripts.corpus_bundle export backups/corpus            # gzip mặc định; --no-compress để ghi thô
+    python -m scripts.corpus_bundle import backups/corpus --snapshot data/index
+    python -m scripts.corpus_bundle snapshot backups/corpus data/index   # chỉ dựng snapshot, không cần DB
+
+Node mới: import vào Postgres rồi khởi động API với SEARCH_SNAPSHOT=data/index để không phải nạp lại từ DB.
+"""
+import argparse
+import json
+import sys
+
+from app.core.corpus_bundle import export_corpus, import_corpus, write_snapshot
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="DB -> thư mục export")
+    export.add_argument("directory")
+    export.add_argument("--no-compress", action="store_true")
+    export.add_argument("--level", type=int, default=6, help="mức nén gzip (1 nhanh nhất, 9 nhỏ nhất)")
+    export.add_argument("--batch-size", type=int, default=1000, help="số dòng mỗi lần đọc của server-side cursor")
+    export.add_argument("--dim", type=int, help="số chiều vector của model embedding (mặc định: số chiều phổ biến nhất trong DB)")
+
+    restore = sub.add_parser("import", help="thư mục export -> DB (COPY)")
+    restore.add_argument("directory")
+    restore.add_argument("--replace", action="store_true", help="xóa corpus hiện có trong DB trước khi nạp")
+    restore.add_argument("--snapshot", help="đồng thời ghi snapshot chỉ mục tìm kiếm vào thư mục này")
+
+    snapshot = sub.add_parser("snapshot", help="thư mục export -> snapshot chỉ mục tìm kiếm")
+    snapshot.add_argument("directory")
+    snapshot.add_argument("snapshot")
+    args = ap.parse_args(argv)
+
+    if args.command == "snapshot":
+        result = write_snapshot(args.directory, args.snapshot)
+    else:
+        from app.db.db_handler import PostgresHandler
+
+        db = PostgresHandler()
+        try:
+            if args.command == "export":
+                result = export_corpus(db, args.directory, compress=not args.no_compress, level=args.level,
+                                       batch_size=args.batch_size, dim=args.dim)
+            else:
+                result = import_corpus(db, args.directory, replace=args.replace)
+                if args.snapshot:
+                    result = {"db": result, "snapshot": write_snapshot(args.directory, args.snapshot)}
+        finally:
+            db.close()
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
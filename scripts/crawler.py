@@ -1,111 +1,57 @@
-import requests
-from bs4 import BeautifulSoup
-import json
+"""
+Crawl các trang văn bản luật vào DB, dùng chung luồng chia chunk/embedding với upload DOCX.
+
+    python -m scripts.crawler --seed https://luatchiminh.com/bo-luat-dan-su-2015.html --max-depth 0
+    python -m scripts.crawler --seed https://example.vn/van-ban/ --allow "/van-ban/" --max-depth 2
+    python -m scripts.crawler --refresh      # crawl lại mọi trang đã biết, chỉ nạp lại trang đã đổi
+
+Chạy lại cùng --state sau khi bị dừng sẽ tiếp tục các URL còn pending. Cấu hình mặc định lấy từ
+CRAWL_* trong .env (xem .example.env).
+"""
+import argparse
+import asyncio
 import sys
-import os
-sys.path.append(os.path.abspath(r"C:\Users\MAC VAN THANH\Desktop\BTL_xlnntn\chat_bot_luat"))
-from db_handler import PostgresHandler
-import re
-from sentence_transformers import SentenceTransformer
-
-db = PostgresHandler()
-class WebChunker:
-    def __init__(self, data_dict: dict, doc_id: int):
-        self.data = data_dict
-        self.doc_id = doc_id
-        self.embed_model = SentenceTransformer('all-mpnet-base-v2')
-
-    def chunk_by_article(self):
-        chunks = []
-        current_chunk = {"title": "", "markdown": []}
-
-        paragraphs = self.data.get("markdown", "").split("\n\n")
-        if not paragraphs or len(paragraphs) < 2:
-            paragraphs = self.data.get("text", "").split("\n")
-
-        for para in paragraphs:
-            para = para.strip()
-            if not para:
-                continue
-
-            if re.match(r"(#+\s*)?Điều\s+\d+", para):
-                if current_chunk["title"]:
-                    chunks.append(current_chunk)
-                    current_chunk = {"title": "", "markdown": []}
-                current_chunk["title"] = para
-            else:
-                current_chunk["markdown"].append(para)
-
-        if current_chunk["title"]:
-            chunks.append(current_chunk)
-
-
-        result = []
-        for idx, chunk in enumerate(chunks, start=1):
-            markdown = chunk["title"] + "\n" + "\n".join(chunk["markdown"])
-            try:
-                embedding = self.embed_model.encode(markdown).tolist()
-            except Exception as e:
-                embedding = []
-
-            result.append({
-                "doc_id": self.doc_id,
-                "chunk_id": idx,
-                "title": chunk["title"],
-                "content": markdown,
-                "vector": embedding
-            })
-
-        return result
-    
-url = "https://luatchiminh.com/bo-luat-dan-su-2015.html"
-response = requests.get(url)
-soup = BeautifulSoup(response.text, "html.parser")
-images= []
-title_tag = soup.find("title")
-title = title_tag.text.strip() if title_tag else ""
-date = ""
-table = soup.find("table")
-if table:
-    i_tags = table.find_all("i")
-    for i_tag in i_tags:
-        if "ngày" in i_tag.text:
-            date = i_tag.get_text(strip=True)
-            break
-
-content_div = soup.find("div", class_="content")
-text_parts = []
-markdown_parts = []
-
-if content_div:
-    for tag in content_div.find_all(["p", "h1", "h2", "h3", "h4", "li"]):
-        text = tag.get_text(strip=True)
-        if not text:
-            continue
-        text_parts.append(text)
-
-        if tag.name.startswith("h"):
-            markdown_parts.append(f"{'#' * int(tag.name[1])} {text}")
-        elif tag.name == "li":
-            markdown_parts.append(f"- {text}")
-        else:
-            markdown_parts.append(text)
-
-full_text = "\n".join(text_parts)
-markdown = "\n\n".join(markdown_parts)
-
-data_list = {
-    "url": url,
-    "title": title,
-    "date": date,
-    "text": full_text,
-    "markdown": markdown,
-    "images": images
-}
-article_id = db.insert_article(data_list)
-chunker = WebChunker(data_list, doc_id=article_id)
-chunks = chunker.chunk_by_article()
-db.insert_chunks(article_id, chunks)
-
-
 
+from app.core.crawler import (
+    CRAWL_CONCURRENCY, CRAWL_DELAY_S, CRAWL_PER_HOST, CRAWL_STATE, Crawler, CrawlState,
+)
+from app.core.embedding_service import load_encoder
+from app.db.db_handler import PostgresHandler
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--seed", action="append", default=[], help="URL bắt đầu (lặp lại được)")
+    ap.add_argument("--state", default=CRAWL_STATE, help="file SQLite lưu frontier và metadata trang")
+    ap.add_argument("--allow", help="regex URL được crawl (mặc định: mọi URL cùng host với seed)")
+    ap.add_argument("--max-depth", type=int, default=2)
+    ap.add_argument("--max-pages", type=int, help="dừng sau N trang (phần còn lại giữ pending)")
+    ap.add_argument("--concurrency", type=int, default=CRAWL_CONCURRENCY)
+    ap.add_argument("--per-host", type=int, default=CRAWL_PER_HOST)
+    ap.add_argument("--delay", type=float, default=CRAWL_DELAY_S, help="giây tối thiểu giữa hai request tới một host")
+    ap.add_argument("--refresh", action="store_true", help="đưa mọi trang đã crawl về pending")
+    ap.add_argument("--ignore-robots", action="store_true")
+    args = ap.parse_args(argv)
+
+    state = CrawlState(args.state)
+    if args.refresh:
+        state.requeue()
+    if not args.seed and not state.pending():
+        ap.error("cần --seed hoặc state còn URL pending")
+
+    db = PostgresHandler()
+    try:
+        crawler = Crawler(
+            db, load_encoder(), state, args.seed, allow=args.allow, max_depth=args.max_depth,
+            max_pages=args.max_pages, concurrency=args.concurrency, per_host=args.per_host,
+            delay=args.delay, respect_robots=not args.ignore_robots,
+        )
+        stats = asyncio.run(crawler.run())
+    finally:
+        db.close()
+        state.close()
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""
+Tạo cột/chỉ mục tìm kiếm cho SEARCH_BACKEND=postgres (xem app.core.pg_search), chạy một lần trước khi khởi động API.
+
+    python -m scripts.pg_search_migrate                    # PG_VECTOR, PG_VECTOR_DIM, PG_HNSW_* lấy từ .env
+    python -m scripts.pg_search_migrate --dim 1024 --vector on
+
+ALTER TABLE ghi lại toàn bộ bảng chunks và dựng HNSW có thể mất vài phút; chạy lại thì chỉ tạo phần còn thiếu.
+--dim phải bằng số chiều của model embedding.
+"""
+import argparse
+import json
+import sys
+
+from app.core.pg_search import PG_VECTOR, PG_VECTOR_DIM, migrate_search_schema
+from app.core.search import KEYWORD_FOLD_DIACRITICS
+from app.db.db_handler import PostgresHandler
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--vector", default=PG_VECTOR, choices=("auto", "on", "off"), help="tạo cột embedding + HNSW (pgvector)")
+    ap.add_argument("--dim", type=int, default=PG_VECTOR_DIM, help="số chiều cột embedding")
+    ap.add_argument("--no-fold", action="store_true", help="không tạo cột tsv_folded (KEYWORD_FOLD_DIACRITICS=false)")
+    args = ap.parse_args(argv)
+
+    db = PostgresHandler()
+    try:
+        db.create_articles_table()
+        db.create_chunks_table()
+        use_pgvector = migrate_search_schema(
+            db, args.vector, fold=KEYWORD_FOLD_DIACRITICS and not args.no_fold, dim=args.dim
+        )
+    finally:
+        db.close()
+    print(json.dumps({"pgvector": use_pgvector, "dim": args.dim if use_pgvector else None}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())